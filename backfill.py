@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+backfill.py
+~~~~~~~~~~~
+Возобновляемая историческая загрузка: произвольный диапазон дат × набор игроков.
+
+Работа режется на единицы (игрок, день); прогресс после каждой единицы пишется
+в JSON-чекпоинт. Повторный запуск с тем же чекпоинтом пропускает готовые единицы
+и повторяет упавшие. Исчерпание лимита Riot (RateLimitExhausted) сохраняет
+прогресс и завершает процесс с кодом 75 — либо ждёт --cooldown и продолжает.
+
+    python backfill.py --start 2024-01-01 --end 2024-03-31 --players "Monty Gard#RU1" "2pilka#RU1"
+    python backfill.py --resume data/backfill/2024-01-01_2024-03-31.json
+"""
+
+from __future__ import annotations
+import argparse
+import datetime as dt
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import load
+
+EXIT_RATE_LIMITED = 75  # EX_TEMPFAIL: запустить позже с тем же чекпоинтом
+CHECKPOINT_DIR = Path(os.getenv("BACKFILL_DIR", "data/backfill"))
+
+Unit = Tuple[str, dt.date]
+
+
+def unit_key(riot_id: str, day: dt.date) -> str:
+    return f"{riot_id}|{day.isoformat()}"
+
+
+def plan_units(players: List[str], start: dt.date, end: dt.date) -> Iterator[Unit]:
+    """День за днём, внутри дня — по игрокам: прогресс равномерен по ростеру."""
+    for i in range((end - start).days + 1):
+        day = start + dt.timedelta(days=i)
+        for riot_id in players:
+            yield riot_id, day
+
+
+class Checkpoint:
+    """JSON-файл {plan, units: {"riot|day": {status, s3_key, at, error}}}; запись атомарная."""
+
+    def __init__(self, path: Path, plan: Dict):
+        self.path = path
+        self.plan = plan
+        self.units: Dict[str, Dict] = {}
+
+    @classmethod
+    def open(cls, path: Path, plan: Optional[Dict] = None) -> "Checkpoint":
+        if path.exists():
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            if plan and raw.get("plan") != plan:
+                raise SystemExit(f"Чекпоинт {path} относится к другому плану: {raw.get('plan')}")
+            cp = cls(path, raw["plan"])
+            cp.units = raw.get("units", {})
+            return cp
+        if plan is None:
+            raise SystemExit(f"Чекпоинт {path} не найден")
+        return cls(path, plan)
+
+    def status(self, key: str) -> Optional[str]:
+        return self.units.get(key, {}).get("status")
+
+    def mark(self, key: str, status: str, **extra) -> None:
+        self.units[key] = {"status": status, "at": dt.datetime.now().isoformat(timespec="seconds"), **extra}
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(
+            json.dumps({"plan": self.plan, "units": self.units}, ensure_ascii=False, indent=1),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+
+    def summary(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for u in self.units.values():
+            out[u["status"]] = out.get(u["status"], 0) + 1
+        return out
+
+
+def run_backfill(
+    cp: Checkpoint,
+    *,
+    rate_delay: float,
+    unit_sleep: float,
+    cooldown: float,
+    max_cooldowns: int,
+    workers: int = 0,
+    max_units: Optional[int] = None,
+    chunk_days: int = 0,
+) -> int:
+    plan = cp.plan
+    start, end = dt.date.fromisoformat(plan["start"]), dt.date.fromisoformat(plan["end"])
+    units = [u for u in plan_units(plan["players"], start, end) if cp.status(unit_key(*u)) != "done"]
+    total = (end - start).days + 1
+    logging.info("📋 Backfill %s..%s: %d players × %d days, %d units left",
+                 start, end, len(plan["players"]), total, len(units))
+    if max_units is not None:
+        units = units[:max_units]
+
+    pool = load.NormalizePool(workers) if workers > 0 else None
+    if chunk_days > 0:
+        try:
+            return _run_windows(cp, units, rate_delay=rate_delay, unit_sleep=unit_sleep, cooldown=cooldown,
+                                max_cooldowns=max_cooldowns, chunk_days=chunk_days, pool=pool)
+        finally:
+            if pool:
+                pool.close()
+            logging.info("🏁 Backfill progress: %s", cp.summary())
+
+    cooldowns = 0
+    try:
+        i = 0
+        while i < len(units):
+            riot_id, day = units[i]
+            key = unit_key(riot_id, day)
+
+            def _on_done(obj_key: Optional[str], key=key) -> None:
+                cp.mark(key, "done", s3_key=obj_key)
+
+            try:
+                load.fetch_matches_once_per_day(
+                    riot_id, day, rate_delay=rate_delay, pool=pool, on_uploaded=_on_done,
+                )
+                if cp.status(key) != "done":
+                    cp.mark(key, "pending")  # в пуле; станет done после выгрузки
+            except load.RateLimitExhausted as exc:
+                cp.mark(key, "failed", error=str(exc))
+                if cooldowns >= max_cooldowns:
+                    logging.warning("⏸️  Rate limit exhausted — progress saved to %s, resume later", cp.path)
+                    return EXIT_RATE_LIMITED
+                cooldowns += 1
+                wait = max(cooldown, exc.retry_after)
+                logging.warning("⏸️  Rate limit exhausted — cooling down %.0fs (%d/%d)", wait, cooldowns, max_cooldowns)
+                time.sleep(wait)
+                continue  # повторяем ту же единицу
+            except Exception as exc:
+                logging.exception("💥 Critical error on %s for %s", day, riot_id)
+                cp.mark(key, "failed", error=str(exc))
+            i += 1
+            time.sleep(unit_sleep)
+    finally:
+        if pool:
+            pool.close()
+    logging.info("🏁 Backfill progress: %s", cp.summary())
+    return 0 if all(cp.status(unit_key(*u)) == "done" for u in units) else 1
+
+
+def _run_windows(
+    cp: Checkpoint,
+    units: List[Unit],
+    *,
+    rate_delay: float,
+    unit_sleep: float,
+    cooldown: float,
+    max_cooldowns: int,
+    chunk_days: int,
+    pool: Optional[load.NormalizePool],
+) -> int:
+    """Оставшиеся единицы кусками по chunk_days через load.load_window:
+    match-id листаются постранично по окну, общие матчи качаются один раз."""
+    if not units:
+        return 0
+    days = sorted({day for _, day in units})
+    chunks: List[List[dt.date]] = []
+    for day in days:
+        if chunks and (day - chunks[-1][0]).days < chunk_days:
+            chunks[-1].append(day)
+        else:
+            chunks.append([day])
+
+    # load_window сообщает Riot ID без @платформы — возвращаемся к записи плана
+    entries = {load.split_player(r)[0]: r for r, _ in units}
+
+    def _on_done(riot_id: str, day: dt.date, obj_key: Optional[str]) -> None:
+        cp.mark(unit_key(entries.get(riot_id, riot_id), day), "done", s3_key=obj_key)
+
+    cooldowns = 0
+    i = 0
+    while i < len(chunks):
+        first, last = chunks[i][0], chunks[i][-1]
+        players = sorted({r for r, d in units if first <= d <= last and cp.status(unit_key(r, d)) != "done"})
+        try:
+            load.load_window(players, first, last, rate_delay=rate_delay, chunk_days=0,
+                             pool=pool, on_unit_done=_on_done)
+        except load.RateLimitExhausted as exc:
+            for r, d in units:
+                if first <= d <= last and cp.status(unit_key(r, d)) not in ("done", "pending"):
+                    cp.mark(unit_key(r, d), "failed", error=str(exc))
+            if cooldowns >= max_cooldowns:
+                logging.warning("⏸️  Rate limit exhausted — progress saved to %s, resume later", cp.path)
+                return EXIT_RATE_LIMITED
+            cooldowns += 1
+            wait = max(cooldown, exc.retry_after)
+            logging.warning("⏸️  Rate limit exhausted — cooling down %.0fs (%d/%d)", wait, cooldowns, max_cooldowns)
+            time.sleep(wait)
+            continue  # тот же кусок; готовые единицы load_window пропустит по S3
+        except Exception as exc:
+            logging.exception("💥 Critical error on %s..%s", first, last)
+            for r, d in units:
+                if first <= d <= last and cp.status(unit_key(r, d)) != "done":
+                    cp.mark(unit_key(r, d), "failed", error=str(exc))
+        if pool:
+            pool.drain()
+        i += 1
+        time.sleep(unit_sleep)
+    return 0 if all(cp.status(unit_key(*u)) == "done" for u in units) else 1
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Возобновляемый бэкфилл матчей Riot")
+    p.add_argument("--start", type=dt.date.fromisoformat, help="первый день (YYYY-MM-DD)")
+    p.add_argument("--end", type=dt.date.fromisoformat, help="последний день включительно")
+    p.add_argument("--players", nargs="+", default=None, help="Riot ID вида Name#TAG[@платформа]")
+    p.add_argument("--players-file", type=Path, default=None, help="файл с Riot ID, по одному в строке")
+    p.add_argument("--checkpoint", type=Path, default=None,
+                   help="файл прогресса (по умолчанию data/backfill/<start>_<end>.json)")
+    p.add_argument("--resume", type=Path, default=None, help="продолжить по существующему чекпоинту")
+    p.add_argument("--rate-delay", type=float, default=1.2, help="пауза между матчами, сек")
+    p.add_argument("--unit-sleep", type=float, default=2.0, help="пауза между (игрок, день), сек")
+    p.add_argument("--cooldown", type=float, default=0.0,
+                   help="ждать N сек при исчерпании лимита вместо выхода")
+    p.add_argument("--max-cooldowns", type=int, default=3)
+    p.add_argument("--workers", type=int, default=0, help="см. load.py --workers")
+    p.add_argument("--max-units", type=int, default=None, help="обработать не больше N единиц за запуск")
+    p.add_argument("--chunk-days", type=int, default=0,
+                   help="грузить окнами по N дней через общую очередь матчей (0 — по (игрок, день))")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.resume:
+        cp = Checkpoint.open(args.resume)
+    else:
+        if not (args.start and args.end):
+            raise SystemExit("Нужны --start и --end (или --resume)")
+        if args.end < args.start:
+            raise SystemExit("--end раньше --start")
+        players = list(args.players or [])
+        if args.players_file:
+            players += [ln.strip() for ln in args.players_file.read_text(encoding="utf-8").splitlines()
+                        if ln.strip() and not ln.startswith("#")]
+        if not players:
+            raise SystemExit("Нужен хотя бы один игрок (--players / --players-file)")
+        plan = {"start": args.start.isoformat(), "end": args.end.isoformat(), "players": players}
+        path = args.checkpoint or CHECKPOINT_DIR / f"{args.start}_{args.end}.json"
+        cp = Checkpoint.open(path, plan)
+
+    return run_backfill(
+        cp,
+        rate_delay=args.rate_delay,
+        unit_sleep=args.unit_sleep,
+        cooldown=args.cooldown,
+        max_cooldowns=args.max_cooldowns if args.cooldown > 0 else 0,
+        workers=args.workers,
+        max_units=args.max_units,
+        chunk_days=args.chunk_days,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+import_time.py
+~~~~~~~~~~~~~~
+Стоимость холодного старта: `python -X importtime -c "import <module>"` в чистом
+подпроцессе, N повторов, медиана суммарного времени и самые дорогие модули.
+
+    python -m benchmarks.import_time                       # mybot.main и все модули mybot
+    python -m benchmarks.import_time --module mybot.dialogs --top 15
+    python -m benchmarks.import_time --compare benchmarks/results/<old>.json
+"""
+
+from __future__ import annotations
+import argparse
+import datetime as dt
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .run import _DUMMY_ENV, _git_rev, ROOT, RESULTS_DIR
+
+DEFAULT_MODULES = (
+    "mybot.main",
+    "mybot.dialogs",
+    "mybot.handlers",
+    "mybot.cache",
+    "mybot.trino_client",
+    "mybot.artifact",
+)
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_once(module: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """(суммарно, с; [(модуль, собственное время, с)]) для одного холодного импорта."""
+    env = {**os.environ, **_DUMMY_ENV, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    total = 0.0
+    selfs: List[Tuple[str, float]] = []
+    for line in out.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, name = int(m[1]), int(m[2]), m[3], m[4]
+        selfs.append((name, self_us / 1e6))
+        if len(indent) == 1:  # модули верхнего уровня — сумма = весь импорт
+            total += cum_us / 1e6
+    return total, selfs
+
+
+def measure(module: str, repeat: int, top: int) -> Dict[str, Any]:
+    totals: List[float] = []
+    worst: Dict[str, float] = {}
+    count = 0
+    for _ in range(repeat):
+        total, selfs = measure_once(module)
+        totals.append(total)
+        count = len(selfs)
+        for name, sec in selfs:
+            worst[name] = max(worst.get(name, 0.0), sec)
+    heavy = sorted(worst.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "seconds_median": statistics.median(totals),
+        "seconds_min": min(totals),
+        "modules_imported": count,
+        "top_self_s": {name: round(sec, 6) for name, sec in heavy},
+    }
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Время импорта модулей бота (-X importtime)")
+    p.add_argument("--module", action="append", default=None, help="модуль (можно несколько)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--top", type=int, default=10, help="сколько самых дорогих модулей показать")
+    p.add_argument("--out", type=Path, default=None)
+    p.add_argument("--compare", type=Path, default=None, help="JSON прошлого прогона")
+    p.add_argument("--threshold", type=float, default=0.20, help="допустимое замедление (доля)")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    modules = args.module or list(DEFAULT_MODULES)
+    result = {
+        "meta": {
+            "created_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "repeat": args.repeat,
+        },
+        "stages": {f"import.{m}": measure(m, args.repeat, args.top) for m in modules},
+    }
+    out = args.out or RESULTS_DIR / f"import-{dt.datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for name, st in result["stages"].items():
+        print(f"{name:<28} {st['seconds_median']:>8.3f}s  {st['modules_imported']:>5} modules")
+        for mod, sec in list(st["top_self_s"].items())[:args.top]:
+            print(f"    {mod:<40} {sec * 1000:>8.1f} ms")
+    print(f"→ {out}")
+
+    if args.compare:
+        from .run import compare
+
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        result["meta"]["scale"] = baseline.get("meta", {}).get("scale")
+        if compare(result, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+mock_riot.py
+~~~~~~~~~~~~
+Локальный стенд Riot API (aiohttp) для нагрузочного тестирования load.py без ключа.
+
+Отдаёт account-v1 / match-v5 (ids, match) из синтетики или из записанных ответов,
+соблюдает лимиты приложения и метода в формате Riot ("20:1,100:120"),
+на превышение отвечает 429 с Retry-After и X-Rate-Limit-Type, добавляет задержку.
+
+    # только сервер — load.py направляется сюда через RIOT_API_BASE
+    python -m benchmarks.mock_riot serve --port 8089
+    RIOT_API_BASE=http://127.0.0.1:8089 python load.py
+
+    # бенчмарк: поднимает стенд и гоняет через него load.fetch_day_rows
+    python -m benchmarks.mock_riot bench --players 6 --days 7 --matches 10
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import bisect
+import datetime as dt
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from . import synthetic
+
+log = logging.getLogger("mock-riot")
+
+# Лимиты персонального ключа Riot по умолчанию
+DEFAULT_APP_LIMITS = "20:1,100:120"
+DEFAULT_METHOD_LIMITS = {
+    "account": "1000:60",
+    "match_ids": "2000:10",
+    "match": "2000:10",
+}
+
+
+def parse_limits(spec: str) -> List[Tuple[int, float]]:
+    """'20:1,100:120' → [(20, 1.0), (100, 120.0)]."""
+    out: List[Tuple[int, float]] = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        count, window = part.split(":", 1)
+        out.append((int(count), float(window)))
+    return out
+
+
+class SlidingWindowLimiter:
+    """Набор скользящих окон вида N запросов за T секунд — как считает Riot."""
+
+    def __init__(self, limits: List[Tuple[int, float]]):
+        self.limits = limits
+        self._hits: List[Deque[float]] = [deque() for _ in limits]
+
+    def try_acquire(self, now: float) -> Optional[float]:
+        """None — запрос пропущен; иначе сколько секунд ждать до освобождения окна."""
+        wait = 0.0
+        for (count, window), hits in zip(self.limits, self._hits):
+            while hits and now - hits[0] >= window:
+                hits.popleft()
+            if len(hits) >= count:
+                wait = max(wait, window - (now - hits[0]))
+        if wait > 0:
+            return wait
+        for hits in self._hits:
+            hits.append(now)
+        return None
+
+    def header(self) -> str:
+        return ",".join(f"{c}:{int(w)}" for c, w in self.limits)
+
+    def count_header(self) -> str:
+        return ",".join(f"{len(h)}:{int(w)}" for (_, w), h in zip(self.limits, self._hits))
+
+
+class MatchStore:
+    """Ответы стенда: riot_id → puuid, puuid → [(gameCreation, matchId)], matchId → JSON."""
+
+    def __init__(self):
+        self.accounts: Dict[str, str] = {}
+        self.by_puuid: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        self.matches: Dict[str, Dict[str, Any]] = {}
+
+    def add_match(self, match: Dict[str, Any]) -> None:
+        mid = match["metadata"]["matchId"]
+        self.matches[mid] = match
+        created = int(match["info"]["gameCreation"])
+        for p in match["info"]["participants"]:
+            bisect.insort(self.by_puuid[p["puuid"]], (created, mid))
+
+    @classmethod
+    def synthetic(cls, players: int, days: int, matches: int, seed: int,
+                  start: dt.date) -> "MatchStore":
+        store = cls()
+        for riot_id in synthetic.make_riot_ids(players):
+            store.accounts[riot_id.lower()] = synthetic.puuid_for(riot_id)
+        for _, _, match in synthetic.iter_matches(players, days, matches, seed=seed, start=start):
+            store.add_match(match)
+        return store
+
+    @classmethod
+    def replay(cls, directory: Path) -> "MatchStore":
+        """Записанные ответы: accounts.json ({riot_id: puuid}) + matches/*.json (match-v5)."""
+        store = cls()
+        accounts = json.loads((directory / "accounts.json").read_text(encoding="utf-8"))
+        store.accounts = {k.lower(): v for k, v in accounts.items()}
+        for path in sorted((directory / "matches").glob("*.json")):
+            store.add_match(json.loads(path.read_text(encoding="utf-8")))
+        return store
+
+    def match_ids(self, puuid: str, start_time: Optional[int], end_time: Optional[int],
+                  start: int, count: int) -> List[str]:
+        games = self.by_puuid.get(puuid, [])
+        lo_ms = start_time * 1000 if start_time is not None else None
+        hi_ms = end_time * 1000 if end_time is not None else None
+        # match-v5 отдаёт свежие матчи первыми
+        ids = [mid for created, mid in reversed(games)
+               if (lo_ms is None or created >= lo_ms) and (hi_ms is None or created <= hi_ms)]
+        return ids[start:start + count]
+
+
+class MockRiot:
+    def __init__(
+        self,
+        store: MatchStore,
+        *,
+        app_limits: str = DEFAULT_APP_LIMITS,
+        method_limits: Optional[Dict[str, str]] = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        seed: int = 0,
+    ):
+        self.store = store
+        self.app_limiter = SlidingWindowLimiter(parse_limits(app_limits))
+        limits = {**DEFAULT_METHOD_LIMITS, **(method_limits or {})}
+        self.method_limiters = {m: SlidingWindowLimiter(parse_limits(s)) for m, s in limits.items()}
+        self.latency_s = latency_ms / 1000
+        self.jitter_s = jitter_ms / 1000
+        self._rng = random.Random(seed)
+        self.requests: Counter = Counter()
+        self.throttled: Counter = Counter()
+        self.started_at: Optional[float] = None
+
+    # ── rate limiting + latency ──
+    async def _gate(self, request: web.Request, method: str) -> Optional[web.Response]:
+        self.requests[method] += 1
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        if not request.headers.get("X-Riot-Token"):
+            return web.json_response({"status": {"message": "Unauthorized", "status_code": 401}},
+                                     status=401)
+        if self.latency_s or self.jitter_s:
+            await asyncio.sleep(max(0.0, self.latency_s + self._rng.uniform(-1, 1) * self.jitter_s))
+
+        now = time.monotonic()
+        method_limiter = self.method_limiters[method]
+        limit_type, wait = None, self.app_limiter.try_acquire(now)
+        if wait is not None:
+            limit_type = "application"
+        else:
+            wait = method_limiter.try_acquire(now)
+            if wait is not None:
+                limit_type = "method"
+        if limit_type is None:
+            return None
+
+        self.throttled[method] += 1
+        return web.json_response(
+            {"status": {"message": "Rate limit exceeded", "status_code": 429}},
+            status=429,
+            headers={
+                "Retry-After": str(max(1, int(wait + 0.999))),
+                "X-Rate-Limit-Type": limit_type,
+                "X-App-Rate-Limit": self.app_limiter.header(),
+                "X-App-Rate-Limit-Count": self.app_limiter.count_header(),
+                "X-Method-Rate-Limit": method_limiter.header(),
+                "X-Method-Rate-Limit-Count": method_limiter.count_header(),
+            },
+        )
+
+    # ── handlers ──
+    async def account(self, request: web.Request) -> web.Response:
+        if (resp := await self._gate(request, "account")) is not None:
+            return resp
+        name, tag = request.match_info["name"], request.match_info["tag"]
+        puuid = self.store.accounts.get(f"{name}#{tag}".lower())
+        if not puuid:
+            return web.json_response({"status": {"message": "Data not found", "status_code": 404}},
+                                     status=404)
+        return web.json_response({"puuid": puuid, "gameName": name, "tagLine": tag})
+
+    async def match_ids(self, request: web.Request) -> web.Response:
+        if (resp := await self._gate(request, "match_ids")) is not None:
+            return resp
+        q = request.query
+        ids = self.store.match_ids(
+            request.match_info["puuid"],
+            int(q["startTime"]) if "startTime" in q else None,
+            int(q["endTime"]) if "endTime" in q else None,
+            int(q.get("start", 0)),
+            min(int(q.get("count", 20)), 100),
+        )
+        return web.json_response(ids)
+
+    async def match(self, request: web.Request) -> web.Response:
+        if (resp := await self._gate(request, "match")) is not None:
+            return resp
+        m = self.store.matches.get(request.match_info["match_id"])
+        if m is None:
+            return web.json_response({"status": {"message": "Data not found", "status_code": 404}},
+                                     status=404)
+        return web.json_response(m)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.get("/riot/account/v1/accounts/by-riot-id/{name}/{tag}", self.account),
+            web.get("/lol/match/v5/matches/by-puuid/{puuid}/ids", self.match_ids),
+            web.get("/lol/match/v5/matches/{match_id}", self.match),
+        ])
+        return app
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.requests.values())
+        throttled = sum(self.throttled.values())
+        return {
+            "requests": total,
+            "throttled_429": throttled,
+            "rate_429": throttled / total if total else 0.0,
+            "by_method": {m: {"requests": self.requests[m], "throttled_429": self.throttled[m]}
+                          for m in self.requests},
+        }
+
+
+class ServerThread:
+    """Стенд в фоновом потоке со своим event loop — load.py остаётся синхронным."""
+
+    def __init__(self, mock: MockRiot, host: str = "127.0.0.1", port: int = 0):
+        self.mock, self.host, self.port = mock, host, port
+        self._loop = asyncio.new_event_loop()
+        self._runner: Optional[web.AppRunner] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mock-riot", daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.mock.app(), access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self) -> "ServerThread":
+        self._thread.start()
+        self._ready.wait(timeout=10)
+        return self
+
+    def __exit__(self, *exc):
+        fut = asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop)
+        fut.result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+
+
+# ────────────────── CLI ──────────────────
+
+def _build_mock(args) -> MockRiot:
+    start = dt.date.fromisoformat(args.start)
+    store = (MatchStore.replay(args.replay) if args.replay
+             else MatchStore.synthetic(args.players, args.days, args.matches, args.seed, start))
+    method_limits = dict(kv.split("=", 1) for kv in args.method_limit)
+    return MockRiot(
+        store,
+        app_limits=args.app_limits,
+        method_limits=method_limits,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        seed=args.seed,
+    )
+
+
+def bench(args) -> Dict[str, Any]:
+    """Прогоняет load.fetch_day_rows по всем (игрок, день) через стенд."""
+    import tempfile
+    from .run import _prepare_env
+
+    mock = _build_mock(args)
+    riot_ids = sorted(k for k in mock.store.accounts) if args.replay else synthetic.make_riot_ids(args.players)
+    start = dt.date.fromisoformat(args.start)
+
+    with ServerThread(mock) as server:
+        _prepare_env(Path(tempfile.mkdtemp(prefix="modernde-mock-")))
+        import load
+        load.RIOT_API_BASE = server.base_url
+        headers = {"X-Riot-Token": "mock"}
+
+        rows = failed_units = 0
+        t0 = time.perf_counter()
+        for riot_id in riot_ids:
+            for d in range(args.days):
+                try:
+                    rows += len(load.fetch_day_rows(riot_id, start + dt.timedelta(days=d), headers,
+                                                    rate_delay=args.rate_delay))
+                except load.RiotFetchError:
+                    failed_units += 1
+        elapsed = time.perf_counter() - t0
+
+    stats = mock.stats()
+    return {
+        "created_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "scale": {"players": len(riot_ids), "days": args.days, "matches_per_day": args.matches},
+        "app_limits": args.app_limits,
+        "latency_ms": args.latency_ms,
+        "rate_delay": args.rate_delay,
+        "total_seconds": elapsed,
+        "requests_per_s": stats["requests"] / elapsed if elapsed else None,
+        "rows": rows,
+        "failed_units": failed_units,
+        **stats,
+    }
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Локальный стенд Riot API")
+    p.add_argument("mode", choices=["serve", "bench"])
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8089)
+    p.add_argument("--players", type=int, default=6)
+    p.add_argument("--days", type=int, default=7)
+    p.add_argument("--matches", type=int, default=10, help="матчей на игрока в день")
+    p.add_argument("--start", default="2024-01-01", help="первый день синтетики")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--replay", type=Path, default=None,
+                   help="каталог с accounts.json и matches/*.json вместо синтетики")
+    p.add_argument("--app-limits", default=DEFAULT_APP_LIMITS)
+    p.add_argument("--method-limit", action="append", default=[],
+                   help="method=spec, например match=500:10 (account|match_ids|match)")
+    p.add_argument("--latency-ms", type=float, default=20.0)
+    p.add_argument("--jitter-ms", type=float, default=5.0)
+    p.add_argument("--rate-delay", type=float, default=0.0,
+                   help="пауза load.py между матчами (в проде 1.2)")
+    p.add_argument("--out", type=Path, default=None, help="куда записать JSON результата bench")
+    return p.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)-8s  %(message)s")
+    args = parse_args()
+    if args.mode == "serve":
+        web.run_app(_build_mock(args).app(), host=args.host, port=args.port)
+        return
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = bench(args)
+    print(
+        f"requests: {result['requests']}  429: {result['throttled_429']} "
+        f"({result['rate_429']:.1%})  {result['requests_per_s']:.1f} req/s  "
+        f"total {result['total_seconds']:.1f}s"
+    )
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+run.py
+~~~~~~
+Бенчмарк горячих путей ingestion → record → message:
+
+* load.normalize   — flatten_match + build_frame (load.py)
+* load.parquet     — to_parquet_buffer (load.py)
+* load.encode_pool — то же через load.NormalizePool (--workers процессов)
+* cache.read       — mybot.cache.load_data (чтение parquet-снимка)
+* messages.build   — mybot.messages.build_messages
+* splash.lookup    — mybot.splash.pick_random_splash (холодный manifest)
+* local.records    — mybot.local_engine: рекорды в DuckDB по сырым parquet (если duckdb установлен)
+
+Данные синтетические (benchmarks/synthetic.py), Riot/Trino/S3 не трогаются.
+Результат — JSON с медианой времени, пропускной способностью и пиком памяти.
+
+    python -m benchmarks.run --players 6 --days 7 --matches 10
+    python -m benchmarks.run --compare benchmarks/results/<old>.json
+"""
+
+from __future__ import annotations
+import argparse
+import datetime as dt
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from . import synthetic
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# load.py и mybot проверяют окружение при импорте — даём фиктивные значения,
+# сетевые клиенты в бенчмарке не создаются.
+_DUMMY_ENV = {
+    "RIOT_API_KEY": "bench",
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "S3_BUCKET_NAME": "bench",
+    "TRINO_HOST": "localhost",
+    "TRINO_PORT": "8443",
+    "TRINO_USER": "bench",
+    "TRINO_PASSWORD": "bench",
+    "TRINO_CATALOG": "iceberg",
+    "TRINO_SCHEMA": "lol_raw",
+    "TRINO_TABLE": "data_api_mining",
+    "BOT_TOKEN": "0:bench",
+}
+
+
+def _prepare_env(workdir: Path) -> None:
+    for k, v in _DUMMY_ENV.items():
+        os.environ.setdefault(k, v)
+    # каталоги данных всегда временные, чтобы не затереть настоящий кэш бота
+    os.environ["DATA_DIR"] = str(workdir / "data")
+    os.environ["SPLASH_DIR"] = str(workdir / "splashes")
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+
+
+def _measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Медиана/минимум по repeat прогонам + пик Python-кучи отдельным прогоном под tracemalloc
+    (буферы Arrow вне аллокатора Python — их покрывает max_rss_mb в meta)."""
+    times: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds_median": statistics.median(times),
+        "seconds_min": min(times),
+        "peak_py_mem_mb": peak / 2**20,
+    }
+
+
+def _git_rev() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, timeout=10,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(players: int, days: int, matches: int, repeat: int, seed: int,
+        workers: int = 0) -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix="modernde-bench-"))
+    _prepare_env(workdir)
+
+    import load
+    from mybot import cache, config, messages, splash
+    cfg = config.configure(setup_logging=False)
+
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    # ── ingestion: normalize ──
+    groups: Dict[Tuple[str, dt.date], List[dict]] = defaultdict(list)
+    for riot_id, day, match in synthetic.iter_matches(players, days, matches, seed=seed):
+        groups[(riot_id, day)].append(match)
+    n_matches = sum(len(v) for v in groups.values())
+
+    def normalize():
+        frames = []
+        for (riot_id, _), ms in groups.items():
+            parts: List[dict] = []
+            for m in ms:
+                parts.extend(load.flatten_match(m) or [])
+            frames.append(load.build_frame(parts, riot_id))
+        return frames
+
+    frames = normalize()
+    n_rows = sum(len(f) for f in frames)
+    stages["load.normalize"] = {**_measure(normalize, repeat), "items": n_matches, "unit": "matches"}
+
+    # ── ingestion: parquet ──
+    def encode():
+        return [load.to_parquet_buffer(f).getbuffer().nbytes for f in frames]
+
+    parquet_bytes = sum(encode())
+    stages["load.parquet"] = {
+        **_measure(encode, repeat), "items": n_rows, "unit": "rows", "bytes": parquet_bytes,
+    }
+    # та же раскладка, что в S3: <день>/<игрок>/*.parquet — вход для local.records
+    raw_dir = workdir / "raw"
+    for ((riot_id, day), _), frame in zip(groups.items(), frames):
+        safe_riot_id, _ = load.unit_folder(riot_id, day)
+        (raw_dir / day.isoformat() / safe_riot_id).mkdir(parents=True, exist_ok=True)
+        frame.to_parquet(raw_dir / day.isoformat() / safe_riot_id / "part.parquet", index=False)
+    del frames
+
+    # ── ingestion: normalize + parquet в пуле процессов ──
+    if workers > 0:
+        with load.NormalizePool(workers) as pool:
+            def encode_pool():
+                for (riot_id, _), ms in groups.items():
+                    pool.submit(ms, riot_id, lambda *_: None)
+                pool.drain()
+
+            stages["load.encode_pool"] = {
+                **_measure(encode_pool, repeat), "items": n_matches, "unit": "matches",
+                "workers": workers,
+            }
+
+    # ── bot: parquet cache read ──
+    if messages.METRIC_COLS:
+        metrics = tuple(messages.METRIC_COLS)
+    else:
+        # mybot/templates.py в репозитории — заготовка; подставляем шаблоны для синтетики
+        metrics = synthetic.SYNTHETIC_METRICS
+        messages.TEMPLATES = {
+            m: f"{{nickname}}: {m} = {{value}} в {{matchId}} на {{champion}}" for m in metrics
+        }
+        messages.METRIC_COLS = list(metrics)
+    record_df = synthetic.make_record_frame(players, days, seed=seed, metrics=metrics)
+    record_df.to_parquet(cfg.parquet_file, engine="pyarrow", index=False)
+    stages["cache.read"] = {
+        **_measure(lambda: cache.load_data(), repeat),
+        "items": len(record_df), "unit": "rows",
+        "bytes": cfg.parquet_file.stat().st_size,
+    }
+
+    # ── bot: build_messages ──
+    df = cache.load_data()
+    msgs = messages.build_messages(df)
+    stages["messages.build"] = {
+        **_measure(lambda: messages.build_messages(df), repeat),
+        "items": len(df), "unit": "rows", "messages": len(msgs),
+    }
+
+    # ── bot: splash lookup (manifest читается заново на каждом прогоне) ──
+    synthetic.write_splash_manifest(cfg.splash_dir)
+    champions = [m["champion"] for m in msgs] or list(synthetic.CHAMPIONS)
+
+    def lookup():
+        splash._manifest_map.cache_clear()
+        return [splash.pick_random_splash(c) for c in champions]
+
+    stages["splash.lookup"] = {**_measure(lookup, repeat), "items": len(champions), "unit": "lookups"}
+
+    # ── bot без Trino: рекорды в DuckDB ──
+    try:
+        from mybot.local_engine import LocalEngine
+        eng = LocalEngine(str(raw_dir))
+    except RuntimeError:
+        eng = None  # duckdb не установлен
+    if eng is not None:
+        today = max(day for _, day in groups) + dt.timedelta(days=1)
+        riot_ids = synthetic.make_riot_ids(players)
+        stages["local.records"] = {
+            **_measure(lambda: eng.records(today, nicknames=riot_ids), repeat),
+            "items": n_rows, "unit": "rows",
+        }
+
+    for st in stages.values():
+        st["items_per_s"] = st["items"] / st["seconds_median"] if st["seconds_median"] else None
+
+    return {
+        "meta": {
+            "created_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": {"players": players, "days": days, "matches_per_day": matches},
+            "repeat": repeat,
+            "seed": seed,
+            "workers": workers,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "stages": stages,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Печатает сравнение с прошлым результатом; True — если есть регрессии."""
+    regressed = False
+    print(f"{'stage':<18} {'base, s':>10} {'now, s':>10} {'ratio':>7}")
+    for name, st in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            print(f"{name:<18} {'—':>10} {st['seconds_median']:>10.4f} {'new':>7}")
+            continue
+        ratio = st["seconds_median"] / base["seconds_median"] if base["seconds_median"] else float("inf")
+        flag = "  ⚠️" if ratio > 1 + threshold else ""
+        regressed |= bool(flag)
+        print(f"{name:<18} {base['seconds_median']:>10.4f} {st['seconds_median']:>10.4f} {ratio:>7.2f}{flag}")
+    if baseline.get("meta", {}).get("scale") != current["meta"]["scale"]:
+        print("ℹ️  масштаб отличается от базового — сравнение приблизительное")
+    return regressed
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Бенчмарк ingestion → record → message")
+    p.add_argument("--players", type=int, default=6)
+    p.add_argument("--days", type=int, default=7)
+    p.add_argument("--matches", type=int, default=10, help="матчей на игрока в день")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                   help="процессов для load.encode_pool (0 — пропустить стадию)")
+    p.add_argument("--out", type=Path, default=None, help="путь к JSON (по умолчанию benchmarks/results/)")
+    p.add_argument("--compare", type=Path, default=None, help="JSON прошлого прогона для сравнения")
+    p.add_argument("--threshold", type=float, default=0.10, help="допустимое замедление (доля)")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    logging.disable(logging.INFO)  # логи load/mybot не должны влиять на замеры
+    result = run(args.players, args.days, args.matches, args.repeat, args.seed, args.workers)
+
+    out = args.out or RESULTS_DIR / f"bench-{dt.datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for name, st in result["stages"].items():
+        print(
+            f"{name:<18} {st['seconds_median']:>9.4f}s  "
+            f"{st['items_per_s'] or 0:>12.1f} {st['unit']}/s  "
+            f"peak {st['peak_py_mem_mb']:>8.1f} MB"
+        )
+    print(f"→ {out}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if compare(result, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+synthetic.py
+~~~~~~~~~~~~
+Синтетические данные для бенчмарков: ответы Riot API (account, match-ids, match),
+снимок concat_record и manifest.json сплэшей.
+Генерация детерминирована по seed — один и тот же масштаб даёт одни и те же байты.
+"""
+
+from __future__ import annotations
+import datetime as dt
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Поля участника в той же форме, что отдаёт match-v5 (см. init.sql)
+INT_FIELDS: Tuple[str, ...] = tuple("""
+    PlayerScore0 PlayerScore1 PlayerScore10 PlayerScore11 PlayerScore2 PlayerScore3 PlayerScore4
+    PlayerScore5 PlayerScore6 PlayerScore7 PlayerScore8 PlayerScore9 allInPings assistMePings
+    assists baronKills basicPings champExperience champLevel championId championSkinId
+    championTransform commandPings consumablesPurchased damageDealtToBuildings
+    damageDealtToObjectives damageDealtToTurrets damageSelfMitigated dangerPings deaths
+    detectorWardsPlaced doubleKills dragonKills enemyMissingPings enemyVisionPings getBackPings
+    goldEarned goldSpent holdPings inhibitorKills inhibitorTakedowns inhibitorsLost item0 item1
+    item2 item3 item4 item5 item6 itemsPurchased killingSprees kills largestCriticalStrike
+    largestKillingSpree largestMultiKill longestTimeSpentLiving magicDamageDealt
+    magicDamageDealtToChampions magicDamageTaken needVisionPings neutralMinionsKilled nexusKills
+    nexusLost nexusTakedowns objectivesStolen objectivesStolenAssists onMyWayPings participantId
+    pentaKills physicalDamageDealt physicalDamageDealtToChampions physicalDamageTaken placement
+    playerAugment1 playerAugment2 playerAugment3 playerAugment4 playerAugment5 playerAugment6
+    playerSubteamId profileIcon pushPings quadraKills retreatPings sightWardsBoughtInGame
+    spell1Casts spell2Casts spell3Casts spell4Casts subteamPlacement summoner1Casts summoner1Id
+    summoner2Casts summoner2Id summonerLevel teamId timeCCingOthers timePlayed
+    totalAllyJungleMinionsKilled totalDamageDealt totalDamageDealtToChampions
+    totalDamageShieldedOnTeammates totalDamageTaken totalEnemyJungleMinionsKilled totalHeal
+    totalHealsOnTeammates totalMinionsKilled totalTimeCCDealt totalTimeSpentDead totalUnitsHealed
+    tripleKills trueDamageDealt trueDamageDealtToChampions trueDamageTaken turretKills
+    turretTakedowns turretsLost unrealKills visionClearedPings visionScore visionWardsBoughtInGame
+    wardsKilled wardsPlaced
+""".split())
+
+BOOL_FIELDS: Tuple[str, ...] = (
+    "eligibleForProgression", "firstBloodAssist", "firstBloodKill", "firstTowerAssist",
+    "firstTowerKill", "gameEndedInEarlySurrender", "gameEndedInSurrender",
+    "teamEarlySurrendered", "win",
+)
+
+POSITIONS: Tuple[str, ...] = ("TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY")
+
+CHAMPIONS: Tuple[str, ...] = (
+    "Ahri", "Akali", "Ashe", "Caitlyn", "Darius", "Draven", "Ezreal", "Garen", "Jinx",
+    "Kaisa", "LeeSin", "Lux", "MissFortune", "Nautilus", "Pyke", "Sett", "Teemo",
+    "Thresh", "Vayne", "Yasuo", "Yone", "Zed", "Leona", "Morgana", "KhaZix",
+)
+
+# ~120 ключей challenges — как в реальных ответах match-v5
+CHALLENGE_KEYS: Tuple[str, ...] = tuple(f"challenge{i:03d}" for i in range(120))
+
+SYNTHETIC_METRICS: Tuple[str, ...] = (
+    "dmg_to_champs", "dmg_total", "gold_earned", "kills", "assists", "cs",
+    "vision_score", "cc_time", "triple_kills", "penta_kills", "dpm", "undying_ratio",
+)
+
+
+def make_riot_ids(n_players: int) -> List[str]:
+    return [f"Player{i:03d}#RU1" for i in range(n_players)]
+
+
+def _participant(rng: random.Random, pid: int, name: str, tag: str, puuid: str) -> Dict[str, Any]:
+    p: Dict[str, Any] = {f: rng.randint(0, 30_000) for f in INT_FIELDS}
+    p.update({f: rng.random() < 0.5 for f in BOOL_FIELDS})
+    position = POSITIONS[pid % len(POSITIONS)]
+    p.update({
+        "participantId": pid + 1,
+        "teamId": 100 if pid < 5 else 200,
+        "championName": rng.choice(CHAMPIONS),
+        "individualPosition": position,
+        "teamPosition": position,
+        "lane": position,
+        "role": "SOLO",
+        "puuid": puuid,
+        "riotIdGameName": name,
+        "riotIdTagline": tag,
+        "summonerId": f"sid-{puuid[:12]}",
+        "summonerName": "",
+        "challenges": {k: round(rng.random() * 100, 3) for k in CHALLENGE_KEYS},
+        "missions": {f"playerScore{i}": rng.randint(0, 100) for i in range(12)},
+        "perks": {
+            "statPerks": {"offense": 5008, "flex": 5008, "defense": 5002},
+            "styles": [
+                {
+                    "style": 8000 + 100 * s,
+                    "description": "primaryStyle" if s == 0 else "subStyle",
+                    "selections": [
+                        {"perk": 8000 + i, "var1": rng.randint(0, 999), "var2": 0, "var3": 0}
+                        for i in range(4 if s == 0 else 2)
+                    ],
+                }
+                for s in range(2)
+            ],
+        },
+    })
+    return p
+
+
+def make_match(
+    match_id: str,
+    game_creation_ms: int,
+    tracked: List[Tuple[str, str]],
+    rng: random.Random,
+) -> Dict[str, Any]:
+    """Один матч match-v5. tracked — (riot_id, puuid) отслеживаемых игроков в этом матче."""
+    slots: List[Tuple[str, str, str]] = []
+    for riot_id, puuid in tracked[:10]:
+        name, tag = riot_id.split("#", 1)
+        slots.append((name, tag, puuid))
+    while len(slots) < 10:
+        n = len(slots)
+        slots.append((f"Random{rng.randint(0, 10**6)}", "EUW", f"puuid-rnd-{match_id}-{n}"))
+    rng.shuffle(slots)
+    participants = [_participant(rng, i, *slot) for i, slot in enumerate(slots)]
+    return {
+        "metadata": {
+            "dataVersion": "2",
+            "matchId": match_id,
+            "participants": [p["puuid"] for p in participants],
+        },
+        "info": {
+            "gameCreation": game_creation_ms,
+            "gameDuration": rng.randint(900, 2700),
+            "gameMode": "CLASSIC",
+            "queueId": 420,
+            "gameVersion": "14.12.585.9999",
+            "participants": participants,
+        },
+    }
+
+
+def puuid_for(riot_id: str) -> str:
+    return "puuid-" + riot_id.replace("#", "-").lower()
+
+
+def iter_matches(
+    n_players: int,
+    n_days: int,
+    matches_per_day: int,
+    *,
+    seed: int = 42,
+    start: dt.date = dt.date(2024, 1, 1),
+) -> Iterator[Tuple[str, dt.date, Dict[str, Any]]]:
+    """Генерирует (riot_id, day, match) для масштаба игроки × дни × матчи."""
+    rng = random.Random(seed)
+    riot_ids = make_riot_ids(n_players)
+    seq = 0
+    for d in range(n_days):
+        day = start + dt.timedelta(days=d)
+        day_ts = int(dt.datetime.combine(day, dt.time()).timestamp())
+        for riot_id in riot_ids:
+            for _ in range(matches_per_day):
+                seq += 1
+                ts_ms = (day_ts + rng.randint(0, 86_399)) * 1000
+                match = make_match(f"RU_{seq:010d}", ts_ms, [(riot_id, puuid_for(riot_id))], rng)
+                yield riot_id, day, match
+
+
+def make_record_frame(n_players: int, n_days: int, *, seed: int = 42,
+                      metrics: Tuple[str, ...] = SYNTHETIC_METRICS):
+    """Снимок concat_record: строка на (игрок, день), ~20% метрик — рекорды."""
+    import pandas as pd
+
+    rng = random.Random(seed)
+    rows = []
+    seq = 0
+    for _ in range(n_days):
+        for riot_id in make_riot_ids(n_players):
+            row: Dict[str, Any] = {"source_nickname": riot_id}
+            for m in metrics:
+                seq += 1
+                if rng.random() < 0.2:
+                    row[m] = float(rng.randint(1, 50_000))
+                    row[f"{m}_meta"] = f"RU_{seq:010d}-_-{rng.choice(CHAMPIONS)}"
+                else:
+                    row[m] = None
+                    row[f"{m}_meta"] = None
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def write_splash_manifest(splash_dir: Path, skins_per_champion: int = 8) -> Path:
+    """manifest.json в формате bot/splashes.py: champion → [относительные пути]."""
+    splash_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        champ: [f"{champ}/{champ}_{i}.jpg" for i in range(skins_per_champion)]
+        for champ in CHAMPIONS
+    }
+    path = splash_dir / "manifest.json"
+    path.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    return path
@@ -208,7 +208,8 @@ CREATE OR REPLACE TABLE iceberg.lol_raw.data_api_mining (
     "participant.wardsKilled"                     BIGINT,
     "participant.wardsPlaced"                     BIGINT,
     "participant.win"                             BOOLEAN,
-    "source_nickname"                             VARCHAR     
+    "source_nickname"                             VARCHAR,
+    "region"                                      VARCHAR
 )
 WITH (
     format = 'PARQUET'
@@ -1,22 +1,34 @@
 #!/usr/bin/env python3
 
+import argparse
+import cProfile
 import io
 import logging
 import os
 import re
+import threading
 import time
 import datetime as dt
 import urllib.parse
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import boto3
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests
 import urllib3
 from dotenv import load_dotenv
 from trino import dbapi
 from trino.auth import BasicAuthentication
 
+import load_profile as prof
+import raw_archive
+import schema_registry
+
 # ───────────── настройка логирования ─────────────
 logging.basicConfig(
     level=logging.INFO,
@@ -56,6 +68,8 @@ AWS_ACCESS_KEY_ID = os.environ["AWS_ACCESS_KEY_ID"]
 AWS_SECRET_ACCESS_KEY = os.environ["AWS_SECRET_ACCESS_KEY"]
 S3_BUCKET_NAME = os.environ["S3_BUCKET_NAME"]
 S3_PREFIX = os.getenv("S3_PREFIX", "stage_load_raw_data")
+# Архив сырых JSON матчей (raw_archive.py): каталог или s3://bucket/prefix; пусто — выключен
+RAW_ARCHIVE = os.getenv("RAW_ARCHIVE", "")
 
 # Trino
 TRINO_HOST = os.environ["TRINO_HOST"]
@@ -66,9 +80,43 @@ TRINO_CATALOG = os.environ["TRINO_CATALOG"]
 TRINO_SCHEMA = os.environ["TRINO_SCHEMA"]
 TRINO_TABLE = os.environ["TRINO_TABLE"]
 
-# Riot routing defaults
+# Riot routing defaults: платформа игроков без явной @платформы в Riot ID
+# и кластер для платформ, которых нет в PLATFORM_REGIONS
 PLATFORM_ROUTING = os.getenv("PLATFORM_ROUTING", "ru1")
 REGIONAL_ROUTING = os.getenv("REGIONAL_ROUTING", "europe")
+# Базовый URL Riot API; {routing} — региональный кластер игрока или матча.
+# Для нагрузочных тестов указывает на локальный стенд (benchmarks/mock_riot.py).
+RIOT_API_BASE = os.getenv("RIOT_API_BASE", "https://{routing}.api.riotgames.com")
+
+# Максимум match-v5 для by-puuid/ids за один запрос
+MATCH_IDS_PAGE = 100
+
+# Бюджет ключа Riot API в формате заголовка X-App-Rate-Limit: "запросов:секунд,…".
+# Riot считает его отдельно в каждом кластере; RIOT_RATE_LIMIT_<КЛАСТЕР> — свой бюджет кластера.
+RIOT_RATE_LIMIT = os.getenv("RIOT_RATE_LIMIT", "20:1,100:120")
+# Параллельных загрузок матчей в кластере; REGION_CONCURRENCY_<КЛАСТЕР> — для одного кластера
+REGION_CONCURRENCY = int(os.getenv("REGION_CONCURRENCY", "1"))
+
+# Платформа Riot → региональный кластер: через него идут account-v1 и match-v5
+PLATFORM_REGIONS: Dict[str, str] = {
+    "br1": "americas", "la1": "americas", "la2": "americas", "na1": "americas",
+    "eun1": "europe", "euw1": "europe", "me1": "europe", "ru": "europe", "tr1": "europe",
+    "jp1": "asia", "kr": "asia",
+    "oc1": "sea", "ph2": "sea", "sg2": "sea", "th2": "sea", "tw2": "sea", "vn2": "sea",
+}
+REGIONAL_CLUSTERS: List[str] = sorted(set(PLATFORM_REGIONS.values()))
+# Старое значение PLATFORM_ROUTING; платформа в match-id Riot — RU_…
+_PLATFORM_ALIASES = {"ru1": "ru"}
+
+# Игроки: "Name#TAG" — платформа PLATFORM_ROUTING, "Name#TAG@euw1" — явная платформа
+RIOT_IDS: List[str] = [
+    "Monty Gard#RU1",
+    "Breaksthesilence#RU1",
+    "2pilka#RU1",
+    "Gruntq#RU1",
+    "Шaзам#RU1",
+    "Prooaknor#RU1",
+]
 
 META_COLS: List[str] = [
     "metadata.matchId",
@@ -79,6 +127,105 @@ META_COLS: List[str] = [
     "info.gameVersion",
 ]
 
+# ────────────────── regions ──────────────────
+
+def platform_id(platform: str) -> str:
+    """"EUW1", "ru1" → "euw1", "ru" — как в PLATFORM_REGIONS и match-id."""
+    platform = platform.strip().lower()
+    return _PLATFORM_ALIASES.get(platform, platform)
+
+
+def split_player(entry: str) -> Tuple[str, str]:
+    """"Name#TAG@euw1" → ("Name#TAG", "euw1"); без @ — платформа PLATFORM_ROUTING."""
+    riot_id, _, platform = clean_riot_id(entry).partition("@")
+    return riot_id.strip(), platform_id(platform or PLATFORM_ROUTING)
+
+
+def regional_routing(platform: str) -> str:
+    """Кластер платформы; неизвестная платформа — REGIONAL_ROUTING."""
+    return PLATFORM_REGIONS.get(platform_id(platform), REGIONAL_ROUTING)
+
+
+def match_platform(match_id: str) -> Optional[str]:
+    """Платформа матча по префиксу match-id (EUW1_123 → euw1); без префикса — None."""
+    platform, sep, _ = match_id.partition("_")
+    return platform_id(platform) if sep else None
+
+
+def match_routing(match_id: str) -> str:
+    """Кластер матча по префиксу match-id (EUW1_123 → europe)."""
+    platform = match_platform(match_id)
+    return regional_routing(platform) if platform else REGIONAL_ROUTING
+
+
+def group_by_routing(riot_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Игроки по кластерам — у каждого кластера свой бюджет запросов."""
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for entry in riot_ids:
+        groups[regional_routing(split_player(entry)[1])].append(entry)
+    return dict(groups)
+
+
+def region_setting(name: str, routing: str, default: str) -> str:
+    """NAME_<КЛАСТЕР> либо общий NAME."""
+    return os.getenv(f"{name}_{routing.upper()}") or os.getenv(name) or default
+
+# ────────────────── errors ──────────────────
+
+class RiotFetchError(RuntimeError):
+    """Riot API не ответил на обязательный запрос (PUUID / список матчей / матч)."""
+
+
+class RateLimitExhausted(RiotFetchError):
+    """429 не прошёл после всех повторов; retry_after — рекомендованная пауза, сек."""
+
+    def __init__(self, url: str, retry_after: int):
+        super().__init__(f"{url} — rate limit exhausted (Retry-After {retry_after}s)")
+        self.retry_after = retry_after
+
+# ────────────────── rate limits ──────────────────
+
+class RateLimiter:
+    """Скользящие окна запросов одного ключа ("20:1,100:120"); потокобезопасный."""
+
+    def __init__(self, spec: str = RIOT_RATE_LIMIT):
+        self.windows: List[Tuple[int, float]] = []
+        for part in spec.split(","):
+            if part.strip():
+                count, seconds = part.split(":")
+                self.windows.append((int(count), float(seconds)))
+        self._sent: Deque[float] = deque()
+        self._horizon = max((s for _, s in self.windows), default=0.0)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0] >= self._horizon:
+                    self._sent.popleft()
+                wait = 0.0
+                for count, seconds in self.windows:
+                    inside = [t for t in self._sent if now - t < seconds]
+                    if len(inside) >= count:
+                        wait = max(wait, inside[-count] + seconds - now)
+                if wait <= 0:
+                    self._sent.append(now)
+                    return
+            time.sleep(wait)
+
+
+# (X-Riot-Token, кластер) → лимитер; safe_get ждёт бюджет ключа в кластере перед каждым запросом
+RATE_LIMITERS: Dict[Tuple[str, str], RateLimiter] = {}
+
+
+def enable_rate_limit(token: str, routings: Optional[Iterable[str]] = None) -> None:
+    """Лимитеры ключа в кластерах (по умолчанию во всех) по RIOT_RATE_LIMIT[_<КЛАСТЕР>]."""
+    for routing in routings or REGIONAL_CLUSTERS:
+        if (token, routing) not in RATE_LIMITERS:
+            RATE_LIMITERS[(token, routing)] = RateLimiter(
+                region_setting("RIOT_RATE_LIMIT", routing, RIOT_RATE_LIMIT))
+
 # ────────────────── helpers ──────────────────
 
 def safe_get(
@@ -87,12 +234,20 @@ def safe_get(
     *,
     max_retries: int = 3,
     backoff: float = 0.5,
+    routing: Optional[str] = None,
 ) -> Optional[Dict[str, Any]]:
     """GET с JSON‑ответом и автоматическим повтором при 429 / 5xx.
-    Возвращает dict либо None после исчерпания попыток."""
+    Возвращает dict либо None после исчерпания попыток;
+    если последней была 429 — бросает RateLimitExhausted.
+    routing — кластер запроса: по нему выбирается лимитер ключа."""
+    limiter = RATE_LIMITERS.get((headers.get("X-Riot-Token", ""), routing or REGIONAL_ROUTING))
     for attempt in range(max_retries):
+        if limiter is not None:
+            limiter.acquire()
         try:
-            r = requests.get(url, headers=headers, timeout=10)
+            prof.count("requests")
+            with prof.stage("riot_http"):
+                r = requests.get(url, headers=headers, timeout=10)
         except requests.RequestException as exc:
             logging.error("💥 %s — network error: %s", url, exc)
             return None
@@ -102,15 +257,37 @@ def safe_get(
             except ValueError:
                 logging.error("💥 %s — invalid JSON: %.120s", url, r.text)
                 return None
-        if r.status_code == 429 and attempt < max_retries - 1:
+        if r.status_code == 429:
+            prof.count("http_429")
             retry_after = int(r.headers.get("Retry-After", 1))
-            time.sleep(retry_after + backoff)
-            continue
+            if attempt < max_retries - 1:
+                time.sleep(retry_after + backoff)
+                continue
+            logging.error("💥 %s — HTTP 429 after %d attempts", url, max_retries)
+            raise RateLimitExhausted(url, retry_after)
         logging.error("💥 %s — HTTP %s: %.120s", url, r.status_code, r.text)
         return None
     return None
 
 
+def riot_url(path: str, routing: Optional[str] = None) -> str:
+    """Полный URL Riot API для пути вида /lol/match/v5/... в кластере routing."""
+    return RIOT_API_BASE.format(routing=routing or REGIONAL_ROUTING) + path
+
+
+def _trino_conn():
+    return dbapi.connect(
+        host=TRINO_HOST,
+        port=TRINO_PORT,
+        user=TRINO_USER,
+        catalog=TRINO_CATALOG,
+        schema=TRINO_SCHEMA,
+        http_scheme="https",
+        auth=BasicAuthentication(TRINO_USER, TRINO_PASSWORD),
+        verify=False,
+    )
+
+
 def register_partition(location: str) -> None:
     """Регистрирует партицию Iceberg для заданного S3(location)"""
     sql = f"""
@@ -121,16 +298,7 @@ def register_partition(location: str) -> None:
         )
     """
     try:
-        with dbapi.connect(
-            host=TRINO_HOST,
-            port=TRINO_PORT,
-            user=TRINO_USER,
-            catalog=TRINO_CATALOG,
-            schema=TRINO_SCHEMA,
-            http_scheme="https",
-            auth=BasicAuthentication(TRINO_USER, TRINO_PASSWORD),
-            verify=False,
-        ) as conn:
+        with prof.stage("trino_add_files"), _trino_conn() as conn:
             cur = conn.cursor()
             cur.execute(sql.strip())
             cur.fetchall()
@@ -140,123 +308,781 @@ def register_partition(location: str) -> None:
             logging.info("ℹ️  Partition already registered")
         else:
             logging.exception("💥 Failed to register partition at %s: %s", location, exc)
+
+def flatten_match(m: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Разворачивает JSON матча в строки участников (метаданные матча + participant.*).
+    Возвращает None, если в матче нет обязательных META_COLS."""
+    with prof.stage("normalize"):
+        df_m = pd.json_normalize(m)
+    if not all(col in df_m.columns for col in META_COLS):
+        return None
+    base = {c: df_m.at[0, c] for c in META_COLS}
+    return [
+        {**base, **{f"participant.{k}": v for k, v in p.items()}}
+        for p in m["info"]["participants"]
+    ]
+
+
+def build_frame(parts: List[Dict[str, Any]], riot_id_clean: str,
+                region: Optional[str] = None) -> pd.DataFrame:
+    """Собирает DataFrame сырой таблицы из строк участников одного игрока.
+    region — платформа игрока (euw1, ru, …), по умолчанию PLATFORM_ROUTING."""
+    with prof.stage("frame"):
+        df = pd.DataFrame(parts)
+        df["source_nickname"] = riot_id_clean
+        df["region"] = platform_id(region or PLATFORM_ROUTING)
+    return df
+
+
+def align_frame(df: pd.DataFrame, schema: Optional[pa.Schema]) -> Tuple[Any, Dict[str, str]]:
+    """Батч → pa.Table по схеме Iceberg (см. schema_registry.align) + новые колонки.
+    Без схемы (Trino недоступен) DataFrame уходит как есть."""
+    if schema is None:
+        return df, {}
+    with prof.stage("align"):
+        return schema_registry.align(df, schema)
+
+
+def to_parquet_buffer(data: Any) -> io.BytesIO:
+    """Сериализует DataFrame или pa.Table в parquet (snappy) в памяти, буфер перемотан в начало."""
+    buf = io.BytesIO()
+    with prof.stage("parquet"):
+        if isinstance(data, pa.Table):
+            pq.write_table(data, buf, compression="snappy")
+        else:
+            data.to_parquet(buf, index=False, compression="snappy")
+    buf.seek(0)
+    return buf
+
 # ────────────────── core ──────────────────
 
-def fetch_matches_once_per_day(
-    riot_id: str,
+def resolve_puuid(riot_id_clean: str, headers: Dict[str, str], routing: Optional[str] = None) -> str:
+    """Riot ID (Name#TAG) → PUUID через account-v1 кластера routing."""
+    try:
+        game_name, tagline = riot_id_clean.split("#", 1)
+    except ValueError:
+        raise ValueError("riot_id must be in format GameName#Tagline")
+    acct_url = riot_url(
+        f"/riot/account/v1/accounts/by-riot-id/"
+        f"{urllib.parse.quote(game_name)}/{urllib.parse.quote(tagline)}",
+        routing,
+    )
+    acct_resp = safe_get(acct_url, headers, routing=routing)
+    puuid = acct_resp.get("puuid") if acct_resp else None
+    if not puuid:
+        raise RiotFetchError(f"Failed to get PUUID for {riot_id_clean}")
+    return puuid
+
+
+def day_bounds(first: dt.date, last: Optional[dt.date] = None) -> Tuple[int, int]:
+    """[начало first, начало дня после last) в unix-секундах (локальное время, как раньше)."""
+    last = last or first
+    start_ts = int(dt.datetime.combine(first, dt.time()).timestamp())
+    end_ts = int(dt.datetime.combine(last + dt.timedelta(days=1), dt.time()).timestamp())
+    return start_ts, end_ts
+
+
+def iter_match_ids(
+    puuid: str,
+    start_ts: int,
+    end_ts: int,
+    headers: Dict[str, str],
+    *,
+    page_size: int = MATCH_IDS_PAGE,
+    routing: Optional[str] = None,
+) -> Iterator[str]:
+    """Все match-id игрока за окно [start_ts, end_ts): страницы start/count до неполной.
+    Число запросов — ceil(матчей / page_size), от длины окна не зависит."""
+    start = 0
+    while True:
+        page: Optional[List[str]] = safe_get(
+            riot_url(
+                f"/lol/match/v5/matches/by-puuid/{puuid}/ids"
+                f"?startTime={start_ts}&endTime={end_ts}&start={start}&count={page_size}",
+                routing,
+            ),
+            headers,
+            routing=routing,
+        )
+        if page is None:
+            raise RiotFetchError(f"Failed to list matches for {puuid} (start={start})")
+        yield from page
+        if len(page) < page_size:
+            return
+        start += page_size
+
+
+def fetch_match(mid: str, headers: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """JSON матча либо None, если ответ пустой или без metadata/info.
+    Кластер берётся из префикса match-id."""
+    routing = match_routing(mid)
+    m = safe_get(riot_url(f"/lol/match/v5/matches/{mid}", routing), headers, routing=routing)
+    if not (m and "metadata" in m and "info" in m):
+        logging.warning("⚠️ %s: empty/bad match — skip", mid)
+        return None
+    prof.count("matches")
+    return m
+
+
+def fetch_day_matches(
+    riot_id_clean: str,
     load_date: dt.date,
+    headers: Dict[str, str],
     *,
     rate_delay: float = 1.2,
-) -> Optional[str]:
-    """Возвращает ключ S3 либо None."""
+    routing: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Riot API: PUUID → match-ids за день → сырые JSON матчей (только с metadata/info).
+    Ошибка PUUID или списка матчей — RiotFetchError: день нельзя считать загруженным."""
+    folder_date = load_date.isoformat()
+    puuid = resolve_puuid(riot_id_clean, headers, routing)
 
-    # S3 session
+    match_ids = list(iter_match_ids(puuid, *day_bounds(load_date), headers, routing=routing))
+    if not match_ids:
+        logging.info("ℹ️  %s: no matches for %s.", folder_date, riot_id_clean)
+        return
+
+    for mid in match_ids:
+        m = fetch_match(mid, headers)
+        if m is None:
+            continue
+        yield m
+        time.sleep(rate_delay)
+
+
+def match_rows(matches: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Строки участников по всем матчам; матчи с неполной схемой пропускаются."""
+    parts: List[Dict[str, Any]] = []
+    for m in matches:
+        rows = flatten_match(m)
+        if rows is None:
+            logging.warning("⚠️ %s: incomplete schema — skip", m["metadata"].get("matchId"))
+            continue
+        parts.extend(rows)
+    return parts
+
+
+def fetch_day_rows(
+    riot_id_clean: str,
+    load_date: dt.date,
+    headers: Dict[str, str],
+    *,
+    rate_delay: float = 1.2,
+    routing: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Riot API: PUUID → match-ids за день → строки участников.
+    Пустой список, если матчей нет или запросы не удались."""
+    parts = match_rows(fetch_day_matches(riot_id_clean, load_date, headers,
+                                         rate_delay=rate_delay, routing=routing))
+    if not parts:
+        logging.info("ℹ️  %s: all matches discarded.", load_date.isoformat())
+    return parts
+
+
+def encode_day(
+    matches: List[Dict[str, Any]],
+    riot_id_clean: str,
+    schema: Optional[pa.Schema] = None,
+    region: Optional[str] = None,
+) -> Tuple[Optional[bytes], int, Dict[str, float], Dict[str, str]]:
+    """Воркер NormalizePool: flatten → DataFrame → [align] → parquet для одного (игрок, день).
+    Возвращает (parquet-байты | None, число строк, время стадий, новые колонки) — всё пиклится."""
+    times: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    parts = match_rows(matches)
+    times["normalize"] = time.perf_counter() - t0
+    if not parts:
+        return None, 0, times, {}
+    t0 = time.perf_counter()
+    df = build_frame(parts, riot_id_clean, region)
+    times["frame"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    table, new_columns = align_frame(df, schema)
+    times["align"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    data = to_parquet_buffer(table).getvalue()
+    times["parquet"] = time.perf_counter() - t0
+    return data, len(df), times, new_columns
+
+
+class NormalizePool:
+    """Пул процессов для CPU-части загрузки (json_normalize, DataFrame, parquet).
+
+    Основной поток только качает матчи и отдаёт сырые JSON дня в пул; пока воркеры
+    разворачивают их, сеть занята следующим днём. Очередь ограничена max_pending:
+    если воркеры не успевают, submit() дожидается самого старого дня и выгружает его
+    (upload + add_files) — это и есть backpressure.
+    """
+
+    def __init__(self, workers: int, max_pending: Optional[int] = None):
+        self.workers = workers
+        self.max_pending = max_pending or 2 * workers
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._pending: Deque[Tuple[Future, Callable[..., Any], str]] = deque()
+
+    def submit(
+        self,
+        matches: List[Dict[str, Any]],
+        riot_id_clean: str,
+        on_done: Callable[[Optional[bytes], int, Dict[str, float], Dict[str, str]], Any],
+        schema: Optional[pa.Schema] = None,
+        region: Optional[str] = None,
+        label: str = "",
+    ) -> None:
+        """label — чем подписать ошибку задания в логе (по умолчанию riot_id)."""
+        while len(self._pending) >= self.max_pending:
+            self._complete_oldest()
+        fut = self._executor.submit(encode_day, matches, riot_id_clean, schema, region)
+        self._pending.append((fut, on_done, label or riot_id_clean))
+        # заодно выгружаем всё, что уже готово, не дожидаясь заполнения очереди
+        while self._pending and self._pending[0][0].done():
+            self._complete_oldest()
+
+    def _complete_oldest(self) -> None:
+        """Ошибка разбора или выгрузки дня логируется здесь: она не должна
+        сорвать submit() следующего дня и приписаться ему."""
+        fut, on_done, label = self._pending.popleft()
+        try:
+            on_done(*fut.result())
+        except Exception:
+            logging.exception("💥 Normalize job %s failed — retry next run", label)
+
+    def drain(self) -> None:
+        while self._pending:
+            self._complete_oldest()
+
+    def close(self) -> None:
+        self.drain()
+        self._executor.shutdown()
+
+    def __enter__(self) -> "NormalizePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def clean_riot_id(riot_id: str) -> str:
+    """Убирает невидимые bidi-символы (U+2066..U+2069), которые попадают из копипаста."""
+    return re.sub(r"[\u2066-\u2069]", "", riot_id)
+
+
+def unit_folder(riot_id_clean: str, load_date: dt.date) -> Tuple[str, str]:
+    """(safe_riot_id, префикс S3) партиции (день, игрок)."""
+    safe_riot_id = riot_id_clean.replace("#", "_")
+    return safe_riot_id, f"{S3_PREFIX}/{load_date.isoformat()}/{safe_riot_id}/"
+
+
+def _s3_resource():
     session = boto3.session.Session(
         aws_access_key_id=AWS_ACCESS_KEY_ID,
         aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
         region_name="ru-central1",
     )
-    s3 = session.resource("s3", endpoint_url="https://storage.yandexcloud.net")
+    return session.resource("s3", endpoint_url="https://storage.yandexcloud.net")
+
+
+_archive: Optional[raw_archive.RawArchive] = None
+_registry: Optional[schema_registry.SchemaRegistry] = None
+_schema_retry_at = 0.0
+SCHEMA_RETRY_S = 300.0
+
+
+def table_schema() -> Optional[pa.Schema]:
+    """Текущая схема сырой таблицы (читается один раз за процесс); None — Trino недоступен,
+    следующая попытка не раньше чем через SCHEMA_RETRY_S."""
+    global _registry, _schema_retry_at
+    if _registry is None:
+        _registry = schema_registry.SchemaRegistry(_trino_conn, TRINO_CATALOG, TRINO_SCHEMA, TRINO_TABLE)
+    if _registry.schema is None and time.monotonic() >= _schema_retry_at:
+        try:
+            with prof.stage("schema_evolve"):
+                _registry.load_schema()
+        except Exception as exc:
+            _schema_retry_at = time.monotonic() + SCHEMA_RETRY_S
+            logging.warning("⚠️  schema of %s unavailable — writing batches as is: %s", _registry.fqn, exc)
+    return _registry.schema
+
+
+def evolve_schema(new_columns: Dict[str, str]) -> None:
+    """Новые колонки батча — в таблицу до add_files, иначе они молча отбросятся."""
+    if not new_columns or _registry is None:
+        return
+    try:
+        with prof.stage("schema_evolve"):
+            _registry.evolve(new_columns)
+    except Exception:
+        logging.exception("💥 Failed to evolve %s with %s", _registry.fqn, sorted(new_columns))
+
+
+def archive_raw(riot_id_clean: str, load_date: dt.date, matches: List[Dict[str, Any]]) -> None:
+    """Сырые матчи в append-only архив; сбой архива не останавливает загрузку."""
+    global _archive
+    if not RAW_ARCHIVE or not matches:
+        return
+    try:
+        if _archive is None:
+            _archive = raw_archive.RawArchive.from_uri(RAW_ARCHIVE, _s3_resource)
+        with prof.stage("archive"):
+            _archive.append(riot_id_clean, load_date, matches)
+    except Exception:
+        logging.exception("⚠️  raw archive write failed for %s %s", load_date, riot_id_clean)
+
+
+def _upload_day(s3, s3_folder: str, safe_riot_id: str, load_date: dt.date,
+                buf: io.BytesIO, rows: int) -> str:
+    """Загружает parquet дня в S3 и регистрирует партицию. Возвращает ключ S3."""
+    folder_date = load_date.isoformat()
+    object_key = f"{s3_folder}{safe_riot_id}_{load_date}_{load_date}.parquet"
+    size = buf.getbuffer().nbytes
+    with prof.stage("s3_upload"):
+        s3.Object(S3_BUCKET_NAME, object_key).upload_fileobj(buf)
+    prof.count("rows", rows)
+    prof.count("bytes_uploaded", size)
+    logging.info("✅ %s: uploaded %s rows → %s", folder_date, rows, object_key)
+
+    # Регистрируем новую партицию
+    location = f"s3://{S3_BUCKET_NAME}/{s3_folder.rstrip('/')}"
+    register_partition(location)
+    return object_key
+
+
+def store_day(
+    s3,
+    riot_id_clean: str,
+    load_date: dt.date,
+    matches: List[Dict[str, Any]],
+    *,
+    pool: Optional[NormalizePool] = None,
+    on_uploaded: Optional[Callable[[Optional[str]], None]] = None,
+    keep_raw: bool = True,
+    region: Optional[str] = None,
+    version: Optional[str] = None,
+) -> Optional[str]:
+    """Сырые матчи одного (игрок, день) → [архив] → parquet → S3 → add_files.
+    С pool кодирование уходит в пул, возвращается ключ, который будет записан;
+    on_uploaded(ключ | None) вызывается после фактической выгрузки.
+    keep_raw=False — не дописывать архив (replay из него же).
+    region — платформа игрока для колонки region.
+    version — подкаталог партиции для повторной выгрузки (replay): новый файл
+    не перезаписывает уже зарегистрированный в Iceberg ключ."""
+    done = on_uploaded or (lambda _key: None)
+    if keep_raw:
+        archive_raw(riot_id_clean, load_date, matches)
+    folder_date = load_date.isoformat()
+    safe_riot_id, s3_folder = unit_folder(riot_id_clean, load_date)
+    if version:
+        s3_folder = f"{s3_folder}{version}/"
+
+    if pool is not None:
+        def _on_encoded(data: Optional[bytes], rows: int, times: Dict[str, float],
+                        new_columns: Dict[str, str]) -> None:
+            prof.set_unit(riot_id_clean, load_date)
+            for stage_name, seconds in times.items():
+                prof.add_time(stage_name, seconds)
+            key = None
+            if data is None:
+                logging.info("ℹ️  %s: all matches discarded.", folder_date)
+            else:
+                evolve_schema(new_columns)
+                key = _upload_day(s3, s3_folder, safe_riot_id, load_date, io.BytesIO(data), rows)
+            done(key)
+
+        pool.submit(matches, riot_id_clean, _on_encoded, schema=table_schema(), region=region,
+                    label=f"{riot_id_clean} {folder_date}")
+        return f"{s3_folder}{safe_riot_id}_{load_date}_{load_date}.parquet"
+
+    prof.set_unit(riot_id_clean, load_date)
+    parts = match_rows(matches)
+    if not parts:
+        logging.info("ℹ️  %s: all matches discarded.", folder_date)
+        done(None)
+        return None
+    df = build_frame(parts, riot_id_clean, region)
+    table, new_columns = align_frame(df, table_schema())
+    buf = to_parquet_buffer(table)
+    evolve_schema(new_columns)
+    key = _upload_day(s3, s3_folder, safe_riot_id, load_date, buf, len(df))
+    done(key)
+    return key
+
+
+def fetch_matches_once_per_day(
+    riot_id: str,
+    load_date: dt.date,
+    *,
+    rate_delay: float = 1.2,
+    pool: Optional[NormalizePool] = None,
+    on_uploaded: Optional[Callable[[Optional[str]], None]] = None,
+    api_key: Optional[str] = None,
+) -> Optional[str]:
+    """Возвращает ключ S3 либо None.
+    С pool разбор и parquet уходят в пул процессов, а загрузка в S3 выполняется
+    по готовности — тогда возвращается ключ, который будет записан.
+    on_uploaded(ключ | None) вызывается ровно один раз, когда день действительно
+    завершён (в режиме pool — после выгрузки из пула).
+    api_key — свой ключ Riot API (воркеры load_workers.py), по умолчанию RIOT_API_KEY.
+    riot_id может нести платформу: "Name#TAG@euw1" (см. split_player)."""
+    done = on_uploaded or (lambda _key: None)
+
+    # S3 session
+    s3 = _s3_resource()
     bucket = s3.Bucket(S3_BUCKET_NAME)
 
     folder_date = load_date.isoformat()
-    riot_id_clean = re.sub(r"[\u2066-\u2069]", "", riot_id)
-    safe_riot_id = riot_id_clean.replace("#", "_")
-    s3_folder = f"{S3_PREFIX}/{folder_date}/{safe_riot_id}/"
+    riot_id_clean, platform = split_player(riot_id)
+    _, s3_folder = unit_folder(riot_id_clean, load_date)
+    prof.set_unit(riot_id_clean, load_date)
 
     # Если найдены существующие parquet-файлы — регистрируем их и выходим
-    existing = [obj.key for obj in bucket.objects.filter(Prefix=s3_folder) if obj.key.endswith('.parquet')]
+    with prof.stage("s3_list"):
+        existing = [obj.key for obj in bucket.objects.filter(Prefix=s3_folder) if obj.key.endswith('.parquet')]
     if existing:
         logging.info("🔁 %s: found existing parquet files: %s", folder_date, existing)
         location = f"s3://{S3_BUCKET_NAME}/{s3_folder.rstrip('/')}"
         register_partition(location)
+        done(existing[0])
         return existing[0]
 
-    headers = {"X-Riot-Token": RIOT_API_KEY}
+    headers = {"X-Riot-Token": api_key or RIOT_API_KEY}
 
-    # Получаем PUUID
-    try:
-        game_name, tagline = riot_id_clean.split("#", 1)
-    except ValueError:
-        raise ValueError("riot_id must be in format GameName#Tagline")
-    acct_url = (
-        f"https://{REGIONAL_ROUTING}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/"
-        f"{urllib.parse.quote(game_name)}/{urllib.parse.quote(tagline)}"
-    )
-    acct_resp = safe_get(acct_url, headers)
-    puuid = acct_resp.get("puuid") if acct_resp else None
-    if not puuid:
-        logging.error("💥 Failed to get PUUID for %s", riot_id)
+    matches = list(fetch_day_matches(riot_id_clean, load_date, headers, rate_delay=rate_delay,
+                                     routing=regional_routing(platform)))
+    if not matches:
+        done(None)
         return None
+    return store_day(s3, riot_id_clean, load_date, matches, pool=pool, on_uploaded=done, region=platform)
 
-    # Временной диапазон дня
-    start_ts = int(dt.datetime.combine(load_date, dt.time()).timestamp())
-    end_ts = start_ts + 86400
-    ids_url = (
-        f"https://{REGIONAL_ROUTING}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
-        f"?startTime={start_ts}&endTime={end_ts}&count=100"
-    )
-    match_ids: List[str] = safe_get(ids_url, headers) or []
-    if not match_ids:
-        logging.info("ℹ️  %s: no matches for %s.", folder_date, riot_id)
-        return None
 
-    parts: List[Dict[str, Any]] = []
-    for mid in match_ids:
-        m = safe_get(
-            f"https://{REGIONAL_ROUTING}.api.riotgames.com/lol/match/v5/matches/{mid}",
-            headers,
-        )
-        if not (m and "metadata" in m and "info" in m):
-            logging.warning("⚠️ %s: empty/bad match — skip", mid)
-            continue
-        df_m = pd.json_normalize(m)
-        if not all(col in df_m.columns for col in META_COLS):
-            logging.warning("⚠️ %s: incomplete schema — skip", mid)
-            continue
-        base = {c: df_m.at[0, c] for c in META_COLS}
-        for p in m["info"]["participants"]:
-            parts.append({**base, **{f"participant.{k}": v for k, v in p.items()}})
-        time.sleep(rate_delay)
-    if not parts:
-        logging.info("ℹ️  %s: all matches discarded.", folder_date)
-        return None
+def existing_units(bucket, days: List[dt.date]) -> Set[Tuple[str, dt.date]]:
+    """(safe_riot_id, день), для которых в S3 уже лежит parquet — один листинг на день."""
+    found: Set[Tuple[str, dt.date]] = set()
+    for day in days:
+        prefix = f"{S3_PREFIX}/{day.isoformat()}/"
+        with prof.stage("s3_list"):
+            for obj in bucket.objects.filter(Prefix=prefix):
+                if obj.key.endswith(".parquet"):
+                    found.add((obj.key[len(prefix):].split("/", 1)[0], day))
+    return found
 
-    # Сохраняем и загружаем новый parquet
-    df = pd.DataFrame(parts)
-    df["source_nickname"] = riot_id_clean
-    buf = io.BytesIO()
-    df.to_parquet(buf, index=False, compression="snappy")
-    buf.seek(0)
-    object_key = f"{s3_folder}{safe_riot_id}_{load_date}_{load_date}.parquet"
-    s3.Object(S3_BUCKET_NAME, object_key).upload_fileobj(buf)
-    logging.info("✅ %s: uploaded %s rows → %s", folder_date, len(df), object_key)
 
-    # Регистрируем новую партицию
-    location = f"s3://{S3_BUCKET_NAME}/{s3_folder.rstrip('/')}"
-    register_partition(location)
+def contiguous_ranges(days: List[dt.date]) -> List[Tuple[dt.date, dt.date]]:
+    """[1, 2, 3, 5, 6] → [(1, 3), (5, 6)] — окна для постраничного листинга."""
+    ranges: List[Tuple[dt.date, dt.date]] = []
+    for day in sorted(days):
+        if ranges and day - ranges[-1][1] == dt.timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def match_day(m: Dict[str, Any]) -> dt.date:
+    """Локальная дата старта матча — по ней Riot фильтрует startTime/endTime."""
+    info = m["info"]
+    ts_ms = info.get("gameStartTimestamp") or info["gameCreation"]
+    return dt.datetime.fromtimestamp(ts_ms / 1000).date()
+
+
+def load_window(
+    riot_ids: List[str],
+    start: dt.date,
+    end: dt.date,
+    *,
+    rate_delay: float = 1.2,
+    chunk_days: int = 7,
+    pool: Optional[NormalizePool] = None,
+    on_unit_done: Optional[Callable[[str, dt.date, Optional[str]], None]] = None,
+    concurrency: int = 1,
+) -> Dict[Tuple[str, dt.date], Optional[str]]:
+    """Загрузка окна дат для набора игроков через одну общую очередь матчей.
+
+    Для каждого игрока match-id перечисляются постранично по непрерывным диапазонам
+    ещё не загруженных дней (число list-запросов зависит от числа матчей, а не дней),
+    затем id сливаются и дедуплицируются между игроками: общий матч качается один раз
+    и раскладывается в партиции всех отслеживаемых участников.
+    Окно режется на куски по chunk_days (0 — целиком), чтобы ограничить память.
+    Уже существующие в S3 партиции пропускаются без повторной регистрации.
+    on_unit_done(riot_id, день, ключ | None) вызывается для каждой завершённой единицы.
+    Игроки — "Name#TAG[@платформа]": PUUID и список матчей идут через кластер игрока,
+    матч — через кластер из префикса его match-id.
+    concurrency > 1 — матчи качаются в столько потоков, паузы задаёт лимитер ключа
+    (enable_rate_limit), rate_delay не используется.
+    Ошибка PUUID/списка матчей игрока, загрузки матча или выгрузки дня логируется и
+    не останавливает остальных; такие единицы не отмечаются и догружаются следующим
+    запуском. Если был исчерпан rate limit, RateLimitExhausted поднимается в конце
+    окна — после выгрузки всего, что удалось скачать (backfill.py уходит на паузу).
+    В профиле список матчей игрока относится к его первому недостающему дню, загрузка
+    матча — к первому владельцу и началу его диапазона, выгрузка — к (игрок, день).
+    """
+    done = on_unit_done or (lambda *_: None)
+    results: Dict[Tuple[str, dt.date], Optional[str]] = {}
+    s3 = _s3_resource()
+    bucket = s3.Bucket(S3_BUCKET_NAME)
+    headers = {"X-Riot-Token": RIOT_API_KEY}
+    platforms = dict(split_player(r) for r in riot_ids)
+    players = list(platforms)
+    puuids: Dict[str, str] = {}
+    rate_limited: Optional[RateLimitExhausted] = None
+
+    total_days = (end - start).days + 1
+    step = chunk_days if chunk_days > 0 else total_days
+    for offset in range(0, total_days, step):
+        first = start + dt.timedelta(days=offset)
+        last = min(end, first + dt.timedelta(days=step - 1))
+        days = [first + dt.timedelta(days=i) for i in range((last - first).days + 1)]
+        existing = existing_units(bucket, days)
+
+        # 1. перечисляем match-id по недостающим дням каждого игрока
+        missing: Dict[str, Set[dt.date]] = {}
+        owners: Dict[str, Dict[str, Tuple[dt.date, dt.date]]] = defaultdict(dict)
+        list_calls = 0
+        for riot_id in players:
+            safe_riot_id, _ = unit_folder(riot_id, first)
+            need = [d for d in days if (safe_riot_id, d) not in existing]
+            missing[riot_id] = set(need)
+            if not need:
+                continue
+            routing = regional_routing(platforms[riot_id])
+            prof.set_unit(riot_id, need[0])
+            try:
+                if riot_id not in puuids:
+                    puuids[riot_id] = resolve_puuid(riot_id, headers, routing)
+                for r0, r1 in contiguous_ranges(need):
+                    ids = list(iter_match_ids(puuids[riot_id], *day_bounds(r0, r1), headers, routing=routing))
+                    list_calls += len(ids) // MATCH_IDS_PAGE + 1
+                    for mid in ids:
+                        owners[mid][riot_id] = (r0, r1)
+            except Exception as exc:
+                logging.exception("💥 %s..%s: failed to list matches for %s — retry next run", first, last, riot_id)
+                if isinstance(exc, RateLimitExhausted):
+                    rate_limited = exc
+                missing[riot_id] = set()
+                for mid in [m for m, o in owners.items() if riot_id in o]:
+                    del owners[mid][riot_id]
+                    if not owners[mid]:
+                        del owners[mid]
+
+        # 2. общая очередь уникальных матчей
+        queue = sorted(owners)
+        logging.info("📥 %s..%s: %d unique matches for %d players (%d list calls)",
+                     first, last, len(queue), len(players), list_calls)
+        buckets: Dict[Tuple[str, dt.date], List[Dict[str, Any]]] = defaultdict(list)
+        failed: Set[Tuple[str, dt.date]] = set()
+        def _owner(mid: str) -> Tuple[str, dt.date]:
+            # день матча до загрузки неизвестен — начало диапазона первого владельца
+            riot_id, (r0, _) = next(iter(owners[mid].items()))
+            return riot_id, r0
+
+        for mid, m in _fetch_queue(queue, headers, rate_delay, concurrency, unit=_owner):
+            if isinstance(m, RateLimitExhausted):
+                # день матча неизвестен — неполными считаем все дни диапазона
+                rate_limited = m
+                for riot_id, (r0, r1) in owners[mid].items():
+                    failed.update((riot_id, r0 + dt.timedelta(days=i)) for i in range((r1 - r0).days + 1))
+                continue
+            if m is not None:
+                day = match_day(m)
+                for riot_id, (r0, r1) in owners[mid].items():
+                    buckets[(riot_id, min(max(day, r0), r1))].append(m)
+
+        # 3. партиции (игрок, день)
+        for riot_id in players:
+            for day in sorted(missing[riot_id]):
+                matches = buckets.pop((riot_id, day), None)
+                if (riot_id, day) in failed:
+                    logging.warning("⚠️  %s: %s incomplete (rate limit) — retry next run", day.isoformat(), riot_id)
+                    continue
+                if not matches:
+                    logging.info("ℹ️  %s: no matches for %s.", day.isoformat(), riot_id)
+                    results[(riot_id, day)] = None
+                    done(riot_id, day, None)
+                    continue
+
+                def _on_uploaded(key: Optional[str], riot_id=riot_id, day=day) -> None:
+                    results[(riot_id, day)] = key
+                    done(riot_id, day, key)
+
+                try:
+                    store_day(s3, riot_id, day, matches, pool=pool, on_uploaded=_on_uploaded,
+                              region=platforms[riot_id])
+                except Exception:
+                    logging.exception("💥 %s: failed to store %s — retry next run", day.isoformat(), riot_id)
+    if rate_limited is not None:
+        raise rate_limited
+    return results
+
+
+def _fetch_queue(
+    queue: List[str],
+    headers: Dict[str, str],
+    rate_delay: float,
+    concurrency: int,
+    unit: Optional[Callable[[str], Tuple[str, dt.date]]] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """(match-id, JSON | None | RateLimitExhausted) в порядке очереди: по одному
+    с паузой rate_delay либо в concurrency потоков под лимитером ключа.
+    unit(match-id) → (игрок, день), к которому профиль относит загрузку матча."""
+    def _get(mid: str) -> Any:
+        if unit:
+            prof.set_unit(*unit(mid))
+        try:
+            return fetch_match(mid, headers)
+        except RateLimitExhausted as exc:
+            logging.error("💥 %s: %s", mid, exc)
+            return exc
+
+    if concurrency <= 1:
+        for mid in queue:
+            yield mid, _get(mid)
+            time.sleep(rate_delay)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="match") as ex:
+        yield from zip(queue, ex.map(_get, queue))
+
+
+def load_regions(
+    riot_ids: List[str],
+    start: dt.date,
+    end: dt.date,
+    *,
+    chunk_days: int = 7,
+    workers: int = 0,
+    max_pending: Optional[int] = None,
+    on_unit_done: Optional[Callable[[str, dt.date, Optional[str]], None]] = None,
+) -> Dict[Tuple[str, dt.date], Optional[str]]:
+    """load_window параллельно по региональным кластерам игроков.
+
+    У каждого кластера свой поток, свой лимитер ключа (RIOT_RATE_LIMIT[_<КЛАСТЕР>]),
+    своя параллельность загрузки матчей (REGION_CONCURRENCY[_<КЛАСТЕР>]) и, при
+    workers > 0, свой NormalizePool — медленный или упёршийся в 429 регион
+    не задерживает остальные. Ошибка кластера логируется, остальные доезжают.
+    """
+    groups = group_by_routing(riot_ids)
+    enable_rate_limit(RIOT_API_KEY, groups)
+    lock = threading.Lock()
+
+    def _done(riot_id: str, day: dt.date, key: Optional[str]) -> None:
+        if on_unit_done:
+            with lock:
+                on_unit_done(riot_id, day, key)
+
+    def _run(routing: str, players: List[str]) -> Dict[Tuple[str, dt.date], Optional[str]]:
+        concurrency = int(region_setting("REGION_CONCURRENCY", routing, str(REGION_CONCURRENCY)))
+        logging.info("🌍 %s: %d players, %d parallel match fetches", routing, len(players), concurrency)
+        pool = NormalizePool(workers, max_pending) if workers > 0 else None
+        try:
+            # паузы между запросами задаёт лимитер кластера, а не rate_delay
+            return load_window(players, start, end, rate_delay=0, chunk_days=chunk_days,
+                               pool=pool, on_unit_done=_done, concurrency=concurrency)
+        finally:
+            if pool:
+                pool.close()
+
+    results: Dict[Tuple[str, dt.date], Optional[str]] = {}
+    with ThreadPoolExecutor(max_workers=len(groups) or 1, thread_name_prefix="region") as ex:
+        futures = {routing: ex.submit(_run, routing, players) for routing, players in groups.items()}
+        for routing, fut in futures.items():
+            try:
+                results.update(fut.result())
+            except Exception:
+                logging.exception("💥 Region %s failed", routing)
+    return results
+
+class LandedEvents:
+    """События «данные легли» для pipeline_runner.py: одно на каждый новый parquet (игрок, день).
+    Публикация идёт в фоне через одно соединение NATS и не тормозит загрузку."""
+
+    def __init__(self):
+        from nats_trigger import BackgroundPublisher
+
+        self.subject = os.getenv("LANDED_SUBJECT", "pipeline.landed")
+        self._pub = BackgroundPublisher(stream=os.getenv("LANDED_STREAM", "PIPELINE"), name="loader")
+        self._lock = threading.Lock()  # вызывается из потоков регионов
+        self.sent = 0
+
+    def __call__(self, riot_id: str, day: dt.date, key: Optional[str]) -> None:
+        if key is None:
+            return
+        payload = {"riot_id": riot_id, "day": day.isoformat(), "s3_key": key}
+        with self._lock:
+            self._pub.publish(self.subject, payload, msg_id=f"landed:{riot_id}:{day}:{key}")
+            self.sent += 1
+
+    def close(self) -> None:
+        failed = self._pub.close()
+        logging.info("📣 landed events: %d sent, %d failed", self.sent, failed)
 
-    return object_key
 
 # ───────────── пример использования ─────────────
-if __name__ == "__main__":
+def parse_args():
+    p = argparse.ArgumentParser(description="Загрузка матчей Riot → S3 parquet → Iceberg")
+    p.add_argument("--profile", action="store_true",
+                   help="замерить стадии по (игрок, день) и вывести сводную таблицу")
+    p.add_argument("--profile-out", type=Path, default=None,
+                   help="куда сохранить профиль (.txt — таблица, .json — полный отчёт)")
+    p.add_argument("--pstats", type=Path, default=None,
+                   help="дамп cProfile для `python -m pstats` / snakeviz")
+    p.add_argument("--workers", type=int, default=0,
+                   help="процессов для разбора матчей и parquet на регион (0 — в потоке региона)")
+    p.add_argument("--max-pending", type=int, default=None,
+                   help="сколько дней может ждать разбора (по умолчанию 2 × workers)")
+    p.add_argument("--chunk-days", type=int, default=7,
+                   help="дней в одном куске общей очереди матчей (0 — всё окно сразу)")
+    p.add_argument("--events", action="store_true",
+                   help="публиковать в NATS события «данные легли» для pipeline_runner.py")
+    p.add_argument("--per-day", action="store_true",
+                   help="старый режим: отдельный листинг на каждый (игрок, день)")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    profile = prof.enable() if (args.profile or args.profile_out) else None
+    profiler = cProfile.Profile() if args.pstats else None
+
     today = dt.date.today()
     start = today - dt.timedelta(weeks=1)
     end = today - dt.timedelta(days=1)
-    total_days = (end - start).days + 1
-    riot_ids = [
-        "Monty Gard#RU1",
-        "Breaksthesilence#RU1",
-        "2pilka#RU1",
-        "Gruntq#RU1",
-        "Шaзам#RU1",
-        "Prooaknor#RU1",
-    ]
-    for riot in riot_ids:
-        for i in range(total_days):
-            day = start + dt.timedelta(days=i)
-            try:
-                fetch_matches_once_per_day(riot_id=riot, load_date=day)
-            except Exception:
-                logging.exception("💥 Critical error on %s for %s", day, riot)
-            time.sleep(2)
+    riot_ids = RIOT_IDS
+    pool = NormalizePool(args.workers, args.max_pending) if args.workers > 0 and args.per_day else None
+    events = LandedEvents() if args.events else None
+    if profiler:
+        profiler.enable()
+    try:
+        if args.per_day:
+            for riot in riot_ids:
+                for i in range((end - start).days + 1):
+                    day = start + dt.timedelta(days=i)
+                    try:
+                        fetch_matches_once_per_day(
+                            riot_id=riot, load_date=day, pool=pool,
+                            on_uploaded=(lambda key, r=riot, d=day: events(r, d, key)) if events else None,
+                        )
+                    except Exception:
+                        logging.exception("💥 Critical error on %s for %s", day, riot)
+                    time.sleep(2)
+        else:
+            load_regions(riot_ids, start, end, chunk_days=args.chunk_days, workers=args.workers,
+                         max_pending=args.max_pending, on_unit_done=events)
+    finally:
+        # дни, ещё ждущие в пуле, выгружаются и при ошибке; события — после них
+        if pool:
+            pool.close()
+        if events:
+            events.close()
+        if profiler:
+            profiler.disable()
+            args.pstats.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(args.pstats)
+            logging.info("📊 cProfile → %s", args.pstats)
+        if profile:
+            profile.finish()
+            logging.info("📊 Load profile:\n%s", profile.table())
+            if args.profile_out:
+                profile.write(args.profile_out)
+                logging.info("📊 Profile → %s", args.profile_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+load_profile.py
+~~~~~~~~~~~~~~~
+Профиль прогона load.py: время по стадиям, число запросов, байты и строки
+в разрезе (игрок, день). Включается флагом `python load.py --profile`.
+
+Стадии: riot_http, archive, normalize, frame, align, parquet, s3_list, s3_upload,
+schema_evolve, trino_add_files.
+Пока профиль не включён, `stage()` отдаёт общий nullcontext, `count()` — один if.
+"""
+
+from __future__ import annotations
+import datetime as dt
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+STAGES = ("riot_http", "archive", "normalize", "frame", "align", "parquet",
+          "s3_list", "s3_upload", "schema_evolve", "trino_add_files")
+COUNTERS = ("requests", "http_429", "matches", "rows", "bytes_uploaded")
+
+Unit = Tuple[str, str]  # (riot_id, day)
+_NO_UNIT: Unit = ("—", "—")
+
+
+class LoadProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall: Optional[float] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.times: Dict[Unit, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.counts: Dict[Unit, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    # ── текущая единица работы (свой у каждого потока) ──
+    def set_unit(self, riot_id: str, day: dt.date) -> None:
+        self._local.unit = (riot_id, day.isoformat())
+
+    @property
+    def unit(self) -> Unit:
+        return getattr(self._local, "unit", _NO_UNIT)
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.times[self.unit][name] += elapsed
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Время стадии, замеренное вне текущего процесса (воркеры NormalizePool)."""
+        with self._lock:
+            self.times[self.unit][name] += seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[self.unit][name] += n
+
+    def finish(self) -> None:
+        self.wall = time.perf_counter() - self.started
+
+    # ── отчёт ──
+    def rows(self):
+        units = sorted(set(self.times) | set(self.counts))
+        for u in units:
+            t, c = self.times.get(u, {}), self.counts.get(u, {})
+            yield u, {s: t.get(s, 0.0) for s in STAGES}, {k: c.get(k, 0) for k in COUNTERS}
+
+    def table(self) -> str:
+        head = ["player", "day", *STAGES, "total_s", *COUNTERS]
+        lines = [head]
+        tot_t: Dict[str, float] = defaultdict(float)
+        tot_c: Dict[str, int] = defaultdict(int)
+        for (player, day), t, c in self.rows():
+            for k, v in t.items():
+                tot_t[k] += v
+            for k, v in c.items():
+                tot_c[k] += v
+            lines.append([player, day, *(f"{t[s]:.3f}" for s in STAGES),
+                          f"{sum(t.values()):.3f}", *(str(c[k]) for k in COUNTERS)])
+        lines.append(["TOTAL", "", *(f"{tot_t[s]:.3f}" for s in STAGES),
+                      f"{sum(tot_t.values()):.3f}", *(str(tot_c[k]) for k in COUNTERS)])
+        widths = [max(len(row[i]) for row in lines) for i in range(len(head))]
+        out = ["  ".join(cell.ljust(w) if i < 2 else cell.rjust(w)
+                         for i, (cell, w) in enumerate(zip(row, widths))) for row in lines]
+        if self.wall is not None:
+            out.append(f"wall time: {self.wall:.3f}s")
+        return "\n".join(out)
+
+    def to_dict(self) -> Dict:
+        return {
+            "wall_s": self.wall,
+            "units": [
+                {"player": p, "day": d, "stages_s": t, **c}
+                for (p, d), t, c in self.rows()
+            ],
+        }
+
+    def write(self, path: Path) -> None:
+        """Таблица в .txt либо полный отчёт в .json — по расширению."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".json":
+            path.write_text(json.dumps(self.to_dict(), indent=2, ensure_ascii=False), encoding="utf-8")
+        else:
+            path.write_text(self.table() + "\n", encoding="utf-8")
+
+
+# ────────────────── активный профиль ──────────────────
+_active: Optional[LoadProfile] = None
+_NULL = nullcontext()
+
+
+def enable() -> LoadProfile:
+    global _active
+    _active = LoadProfile()
+    return _active
+
+
+def active() -> Optional[LoadProfile]:
+    return _active
+
+
+def set_unit(riot_id: str, day: dt.date) -> None:
+    if _active is not None:
+        _active.set_unit(riot_id, day)
+
+
+def stage(name: str):
+    return _active.stage(name) if _active is not None else _NULL
+
+
+def add_time(name: str, seconds: float) -> None:
+    if _active is not None:
+        _active.add_time(name, seconds)
+
+
+def count(name: str, n: int = 1) -> None:
+    if _active is not None:
+        _active.count(name, n)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+load_workers.py
+~~~~~~~~~~~~~~~
+Распределённая загрузка через очередь JetStream вместо одного процесса load.py.
+
+plan   — планировщик: недостающие в S3 единицы (игрок, день) публикуются в
+         work-queue stream (INGEST_STREAM), по сообщению на единицу, в subject
+         своего регионального кластера: INGEST_SUBJECT.<europe|americas|asia|sea>.
+work   — воркер: у каждого кластера свой durable pull-consumer (INGEST_DURABLE-<кластер>),
+         единицы грузятся через load.fetch_matches_once_per_day, ack — только после
+         выгрузки в S3. Ошибка → nak с задержкой, 429 → задержка Retry-After.
+         Слоты заводятся на каждую пару (ключ Riot API, кластер), у пары свой
+         лимитер RIOT_RATE_LIMIT[_<КЛАСТЕР>] — регионы не делят бюджет и не ждут
+         друг друга, пропускная способность растёт с числом воркеров и ключей.
+
+Stream, созданный раньше с одним subject INGEST_SUBJECT, ensure_stream дополняет
+шаблоном INGEST_SUBJECT.>; единицы, оставшиеся в старом subject, никто не читает —
+их заново публикует следующий plan.
+
+    python load_workers.py plan --days 7 --players "Monty Gard#RU1,Faker#KR1@kr"
+    RIOT_API_KEYS=key1,key2 python load_workers.py work --regions europe,asia --events
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import datetime as dt
+import json
+import logging
+import os
+from typing import List, Optional
+
+import load
+from nats_trigger import NatsPublisher, ensure_consumer, ensure_stream
+
+log = logging.getLogger("load-workers")
+
+INGEST_STREAM = os.getenv("INGEST_STREAM", "INGEST")
+INGEST_SUBJECT = os.getenv("INGEST_SUBJECT", "ingest.units")
+INGEST_DURABLE = os.getenv("INGEST_DURABLE", "loader")
+
+
+# ────────────────── planner ──────────────────
+def plan_units(riot_ids: List[str], start: dt.date, end: dt.date) -> List[dict]:
+    """Единицы окна, которых ещё нет в S3 (один листинг на день).
+    riot_ids — "Name#TAG[@платформа]", платформа уходит в единицу."""
+    days = [start + dt.timedelta(days=i) for i in range((end - start).days + 1)]
+    bucket = load._s3_resource().Bucket(load.S3_BUCKET_NAME)
+    existing = load.existing_units(bucket, days)
+    units = []
+    for entry in riot_ids:
+        riot_id, platform = load.split_player(entry)
+        for day in days:
+            safe_riot_id, _ = load.unit_folder(riot_id, day)
+            if (safe_riot_id, day) not in existing:
+                units.append({"riot_id": riot_id, "platform": platform, "day": day.isoformat()})
+    return units
+
+
+async def publish_plan(units: List[dict], nats_url: str) -> int:
+    # msg_id с датой плана: повторный plan в тот же день не задвоит очередь
+    planned = dt.date.today().isoformat()
+    items = [(f"{INGEST_SUBJECT}.{load.regional_routing(u['platform'])}", u,
+              f"unit:{u['riot_id']}:{u['day']}:{planned}") for u in units]
+    async with NatsPublisher(nats_url=nats_url, stream=INGEST_STREAM, name="ingest-planner") as pub:
+        await ensure_stream(pub.js, INGEST_STREAM, f"{INGEST_SUBJECT}.>")
+        acks = await pub.publish_many(items)
+    failed = [a for a in acks if isinstance(a, Exception)]
+    for e in failed[:5]:
+        log.error("💥 publish failed: %s", e)
+    new = sum(1 for a in acks if not isinstance(a, Exception) and not getattr(a, "duplicate", False))
+    log.info("📤 %d units planned, %d new, %d failed", len(items), new, len(failed))
+    return len(failed)
+
+
+# ────────────────── worker ──────────────────
+class Worker:
+    """Слоты по парам (ключ Riot API, кластер): каждый слот берёт одну единицу
+    своего кластера и грузит её в потоке."""
+
+    def __init__(self, api_keys: List[str], nats_url: str, *, regions: Optional[List[str]] = None,
+                 slots_per_key: int = 1, ack_wait_s: int = 900, max_deliver: int = 5,
+                 nak_delay_s: int = 60, events: Optional[load.LandedEvents] = None):
+        self.api_keys = api_keys
+        self.nats_url = nats_url
+        self.regions = regions or load.REGIONAL_CLUSTERS
+        self.slots_per_key = slots_per_key
+        self.ack_wait_s = ack_wait_s
+        self.max_deliver = max_deliver
+        self.nak_delay_s = nak_delay_s
+        self.events = events
+        self.done = 0
+        self.failed = 0
+        for key in api_keys:
+            load.enable_rate_limit(key, self.regions)
+
+    def _load_unit(self, unit: dict, api_key: str) -> Optional[str]:
+        riot_id, day = unit["riot_id"], dt.date.fromisoformat(unit["day"])
+        platform = unit.get("platform") or load.PLATFORM_ROUTING
+        on_uploaded = (lambda key: self.events(riot_id, day, key)) if self.events else None
+        # паузы между запросами задаёт лимитер ключа в кластере, а не rate_delay
+        return load.fetch_matches_once_per_day(f"{riot_id}@{platform}", day, rate_delay=0,
+                                               on_uploaded=on_uploaded, api_key=api_key)
+
+    async def _heartbeat(self, msg) -> None:
+        """Длинная единица не должна уйти другому воркеру по ack_wait."""
+        while True:
+            await asyncio.sleep(self.ack_wait_s / 3)
+            await msg.in_progress()
+
+    async def _handle(self, msg, api_key: str) -> None:
+        try:
+            unit = json.loads(msg.data)
+        except ValueError:
+            log.error("💥 bad unit %r — term", msg.data[:200])
+            await msg.term()
+            return
+        beat = asyncio.create_task(self._heartbeat(msg))
+        try:
+            key = await asyncio.to_thread(self._load_unit, unit, api_key)
+        except load.RateLimitExhausted as e:
+            self.failed += 1
+            log.warning("⏳ %s %s: rate limit, retry in %ss", unit["day"], unit["riot_id"], e.retry_after)
+            await msg.nak(delay=e.retry_after + 1)
+        except Exception:
+            self.failed += 1
+            log.exception("💥 %s %s failed — nak", unit.get("day"), unit.get("riot_id"))
+            await msg.nak(delay=self.nak_delay_s)
+        else:
+            self.done += 1
+            await msg.ack()
+            log.info("✅ %s %s → %s", unit["day"], unit["riot_id"], key or "no matches")
+        finally:
+            beat.cancel()
+
+    async def _slot(self, psub, api_key: str, idle_exit: bool) -> None:
+        import nats.errors
+
+        while True:
+            try:
+                msgs = await psub.fetch(1, timeout=5)
+            except (asyncio.TimeoutError, nats.errors.TimeoutError):
+                if idle_exit:
+                    return
+                continue
+            for msg in msgs:
+                await self._handle(msg, api_key)
+
+    async def run(self, idle_exit: bool = False) -> None:
+        import nats
+
+        nc = await nats.connect(self.nats_url, name="ingest-worker")
+        try:
+            js = nc.jetstream()
+            await ensure_stream(js, INGEST_STREAM, f"{INGEST_SUBJECT}.>")
+            slots = []
+            for routing in self.regions:
+                durable = f"{INGEST_DURABLE}-{routing}"
+                await ensure_consumer(js, INGEST_STREAM, durable, self.ack_wait_s, self.max_deliver,
+                                      filter_subject=f"{INGEST_SUBJECT}.{routing}")
+                psub = await js.pull_subscribe_bind(durable=durable, stream=INGEST_STREAM)
+                slots += [self._slot(psub, key, idle_exit)
+                          for key in self.api_keys for _ in range(self.slots_per_key)]
+            log.info("👷 %d keys × %d regions × %d slots on %s", len(self.api_keys), len(self.regions),
+                     self.slots_per_key, INGEST_STREAM)
+            await asyncio.gather(*slots)
+        finally:
+            await nc.drain()
+            log.info("👷 done: %d units, %d failed", self.done, self.failed)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Распределённая загрузка (игрок, день) через NATS JetStream")
+    p.add_argument("--nats", dest="nats_url", default=os.getenv("NATS_URL", "nats://localhost:4222"))
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    plan = sub.add_parser("plan", help="опубликовать недостающие единицы")
+    plan.add_argument("--days", type=int, default=7, help="окно: последние N дней до вчера")
+    plan.add_argument("--start", type=dt.date.fromisoformat, default=None)
+    plan.add_argument("--end", type=dt.date.fromisoformat, default=None)
+    plan.add_argument("--players", default="",
+                      help="Riot ID через запятую, Name#TAG[@платформа] (по умолчанию load.RIOT_IDS)")
+
+    work = sub.add_parser("work", help="обрабатывать единицы из очереди")
+    work.add_argument("--keys", default=os.getenv("RIOT_API_KEYS", "") or load.RIOT_API_KEY,
+                      help="ключи Riot API через запятую, у каждого свой бюджет")
+    work.add_argument("--regions", default=os.getenv("INGEST_REGIONS", ",".join(load.REGIONAL_CLUSTERS)),
+                      help="региональные кластеры через запятую")
+    work.add_argument("--slots-per-key", type=int, default=1, help="слотов на ключ в каждом кластере")
+    work.add_argument("--ack-wait", type=int, default=int(os.getenv("INGEST_ACK_WAIT", "900")))
+    work.add_argument("--events", action="store_true",
+                      help="публиковать «данные легли» для pipeline_runner.py")
+    work.add_argument("--exit-when-idle", action="store_true",
+                      help="завершиться, когда очередь пуста (batch-запуск)")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.cmd == "plan":
+        end = args.end or dt.date.today() - dt.timedelta(days=1)
+        start = args.start or end - dt.timedelta(days=args.days - 1)
+        players = [x.strip() for x in args.players.split(",") if x.strip()] or load.RIOT_IDS
+        units = plan_units(players, start, end)
+        return 1 if asyncio.run(publish_plan(units, args.nats_url)) else 0
+
+    keys = [k.strip() for k in args.keys.split(",") if k.strip()]
+    events = load.LandedEvents() if args.events else None
+    regions = [r.strip() for r in args.regions.split(",") if r.strip()]
+    worker = Worker(keys, args.nats_url, regions=regions, slots_per_key=args.slots_per_key,
+                    ack_wait_s=args.ack_wait, events=events)
+    try:
+        asyncio.run(worker.run(idle_exit=args.exit_when_idle))
+    finally:
+        if events:
+            events.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)-8s  %(message)s")
+    raise SystemExit(main())
@@ -0,0 +1,52 @@
+{#
+    Список метрик для детекции рекордов.
+    agg = 'max' — рекорд, если значение выше исторического,
+    agg = 'min' — рекорд, если значение ниже.
+#}
+{% macro record_metrics() %}
+    {{ return([
+        {'name': 'dmg_to_champs',  'agg': 'max'},
+        {'name': 'dmg_total',      'agg': 'max'},
+        {'name': 'dmg_turrets',    'agg': 'max'},
+        {'name': 'dmg_objectives', 'agg': 'max'},
+        {'name': 'gold_earned',    'agg': 'max'},
+        {'name': 'kills',          'agg': 'max'},
+        {'name': 'assists',        'agg': 'max'},
+        {'name': 'cs',             'agg': 'max'},
+        {'name': 'jungle_kills',   'agg': 'max'},
+        {'name': 'turret_kills',   'agg': 'max'},
+        {'name': 'inhib_kills',    'agg': 'max'},
+        {'name': 'pinks',          'agg': 'max'},
+        {'name': 'vision_score',   'agg': 'max'},
+        {'name': 'cc_time',        'agg': 'max'},
+        {'name': 'dmg_mitigated',  'agg': 'max'},
+        {'name': 'first_blood_kill','agg': 'max'},
+        {'name': 'immortal',       'agg': 'max'},
+        {'name': 'triple_kills',   'agg': 'max'},
+        {'name': 'quadra_kills',   'agg': 'max'},
+        {'name': 'penta_kills',    'agg': 'max'},
+        {'name': 'heals_team',     'agg': 'max'},
+        {'name': 'shields_team',   'agg': 'max'},
+        {'name': 'longest_life',   'agg': 'max'},
+        {'name': 'cspm',           'agg': 'max'},
+        {'name': 'interceptor',    'agg': 'max'},
+        {'name': 'wards_killed',   'agg': 'max'},
+        {'name': 'wards_placed',   'agg': 'max'},
+        {'name': 'dpm',            'agg': 'max'},
+        {'name': 'gpm',            'agg': 'max'},
+        {'name': 'enemy_jungle',   'agg': 'max'},
+        {'name': 'neutral_kills',  'agg': 'max'},
+        {'name': 'phys_dmg',       'agg': 'max'},
+        {'name': 'magic_dmg',      'agg': 'max'},
+        {'name': 'true_dmg',       'agg': 'max'},
+        {'name': 'dmg_taken',      'agg': 'max'},
+        {'name': 'largest_crit',   'agg': 'max'},
+        {'name': 'double_kills',   'agg': 'max'},
+        {'name': 'sprees',         'agg': 'max'},
+        {'name': 'gold_unspent',   'agg': 'max'},
+        {'name': 'flash_casts',    'agg': 'max'},
+        {'name': 'undying_ratio',  'agg': 'min'},
+        {'name': 'champ_level',    'agg': 'max'},
+        {'name': 'guard_angel',    'agg': 'max'}
+    ]) }}
+{% endmacro %}
@@ -0,0 +1,135 @@
+{{ config(materialized='table') }}
+
+-- History of Records – все игроки, все игровые дни за один проход.
+-- Для каждой пары (игрок, игровой день) и каждой метрики:
+--   <metric>        – значение дня, если побит лучший результат за предыдущие 30 дней, иначе NULL
+--   <metric>_meta   – "matchId-_-championName" при срабатывании, иначе NULL
+-- Окно [game_date - 31d, game_date - 1d] совпадает с historical_best в <nick>_record,
+-- поэтому строка за current_date - 1 равна результату ежедневной модели.
+-- Бэкфилл за месяц — один скан вместо 30 прогонов с разным current_date.
+{% set names = [
+        "Monty Gard#RU1",
+        "Breaksthesilence#RU1",
+        "2pilka#RU1",
+        "Gruntq#RU1",
+        "Шaзам#RU1",
+        "Prooaknor#RU1",
+    ] %}
+{% set metrics = record_metrics() %}
+
+-- === Base rows ===
+WITH base AS (
+    SELECT
+        "metadata.matchid"                                         AS match_id,
+        source_nickname,
+        "participant.championname"                                 AS champion_name,
+        -- raw metrics
+        "participant.totaldamagedealttochampions"                  AS dmg_to_champs,
+        "participant.totaldamagedealt"                             AS dmg_total,
+        "participant.damagedealttoturrets"                         AS dmg_turrets,
+        "participant.damagedealttoobjectives"                      AS dmg_objectives,
+        "participant.goldearned"                                   AS gold_earned,
+        "participant.goldspent"                                    AS gold_spent,
+        "participant.kills"                                        AS kills,
+        "participant.assists"                                      AS assists,
+        "participant.deaths"                                       AS deaths,
+        "participant.totalminionskilled"                           AS cs,
+        "participant.dragonkills"                                  AS dragon_kills,
+        "participant.baronkills"                                   AS baron_kills,
+        "participant.turretkills"                                  AS turret_kills,
+        "participant.inhibitorkills"                               AS inhib_kills,
+        "participant.visionwardsboughtingame"                      AS pinks,
+        "participant.visionscore"                                  AS vision_score,
+        "participant.timeccingothers"                              AS cc_time,
+        "participant.damageselfmitigated"                          AS dmg_mitigated,
+        "participant.firstbloodkill"                               AS first_blood_kill,
+        "participant.triplekills"                                  AS triple_kills,
+        "participant.quadrakills"                                  AS quadra_kills,
+        "participant.pentakills"                                   AS penta_kills,
+        "participant.totalhealsonteammates"                        AS heals_team,
+        "participant.totaldamageshieldedonteammates"               AS shields_team,
+        "participant.longesttimespentliving"                       AS longest_life,
+        "info.gameduration"                                        AS game_duration,
+        "participant.objectivesstolen"                             AS obj_stolen,
+        "participant.objectivesstolenassists"                      AS obj_stolen_ast,
+        "participant.wardskilled"                                  AS wards_killed,
+        "participant.wardsplaced"                                  AS wards_placed,
+        "participant.neutralminionskilled"                         AS neutral_kills,
+        "participant.physicaldamagedealttochampions"               AS phys_dmg,
+        "participant.magicdamagedealttochampions"                  AS magic_dmg,
+        "participant.truedamagedealttochampions"                   AS true_dmg,
+        "participant.totaldamagetaken"                             AS dmg_taken,
+        "participant.largestcriticalstrike"                        AS largest_crit,
+        "participant.doublekills"                                  AS double_kills,
+        "participant.killingsprees"                                AS sprees,
+        "participant.totalenemyjungleminionskilled"                AS enemy_jungle,
+        (CASE WHEN "participant.summoner1id" = 4 THEN "participant.summoner1casts" ELSE 0 END +
+         CASE WHEN "participant.summoner2id" = 4 THEN "participant.summoner2casts" ELSE 0 END) AS flash_casts,
+        "participant.totaltimespentdead"                           AS time_dead,
+        "participant.champlevel"                                   AS champ_level,
+        "info.gamecreation"                                        AS game_creation_ts
+    FROM {{ source('lol_raw','data_api_mining') }}
+    WHERE source_nickname IN (
+        {% for n in names %}'{{ n }}'{% if not loop.last %}, {% endif %}{% endfor %}
+    )
+    AND CONCAT("participant.riotidgamename", "participant.riotidtagline") = replace(source_nickname, '#', '')
+),
+
+aggregated AS (
+    SELECT
+        *,
+        (gold_earned - gold_spent)                                   AS gold_unspent,
+        (dragon_kills + baron_kills)                                 AS jungle_kills,
+        (obj_stolen + obj_stolen_ast)                                AS interceptor,
+        (heals_team + shields_team)                                  AS guard_angel,
+        (cs * 60.0 / NULLIF(game_duration,0))                        AS cspm,
+        (dmg_total / NULLIF(game_duration,0))                        AS dpm,
+        (gold_earned / NULLIF(game_duration,0))                      AS gpm,
+        (time_dead / NULLIF(game_duration,0))                        AS undying_ratio,
+        CASE WHEN deaths = 0 AND (kills + assists) >= 10 THEN 1 ELSE 0 END AS immortal,
+        date(from_unixtime(game_creation_ts / 1000))                 AS game_date
+    FROM base
+),
+
+daily_metrics AS (                    -- лучший результат каждого игрового дня
+    SELECT
+        source_nickname,
+        game_date,
+        {% for m in metrics %}
+        {{ m['agg'] }}({{ m['name'] }}) AS {{ m['name'] }},
+        {{ m['agg'] }}_by(match_id, {{ m['name'] }}) AS {{ m['name'] }}_match_id,
+        {{ m['agg'] }}_by(champion_name, {{ m['name'] }}) AS {{ m['name'] }}_champion{% if not loop.last %},
+        {% endif %}
+        {% endfor %}
+    FROM aggregated
+    GROUP BY source_nickname, game_date
+),
+
+rolling_best AS (                     -- лучший результат за предыдущие 30 дней (без текущего)
+    SELECT
+        *,
+        {% for m in metrics %}
+        {{ m['agg'] }}({{ m['name'] }}) OVER prior_30d AS {{ m['name'] }}_prior_best{% if not loop.last %},
+        {% endif %}
+        {% endfor %}
+    FROM daily_metrics
+    WINDOW prior_30d AS (
+        PARTITION BY source_nickname
+        ORDER BY game_date
+        RANGE BETWEEN INTERVAL '31' DAY PRECEDING AND INTERVAL '1' DAY PRECEDING
+    )
+),
+
+comparison AS (
+    SELECT
+        source_nickname,
+        game_date,
+        {% for m in metrics %}
+        CASE WHEN {{ m['name'] }} {{ '>' if m['agg'] == 'max' else '<' }} {{ m['name'] }}_prior_best THEN {{ m['name'] }} END AS {{ m['name'] }},
+        CASE WHEN {{ m['name'] }} {{ '>' if m['agg'] == 'max' else '<' }} {{ m['name'] }}_prior_best THEN concat({{ m['name'] }}_match_id, '-_-', {{ m['name'] }}_champion) END AS {{ m['name'] }}_meta{% if not loop.last %},
+        {% endif %}
+        {% endfor %}
+    FROM rolling_best
+)
+
+SELECT * FROM comparison
@@ -0,0 +1,195 @@
+"""
+artifact.py
+~~~~~~~~~~~
+Готовый артефакт карусели: тексты, чемпионы и выбранные сплэши, отрендеренные
+один раз на стороне пайплайна (после dbt run). Бот читает его при старте и по
+NATS-триггеру — без обращения к Trino.
+
+    <root>/carousel-<version>.json   — неизменяемые версии
+    <root>/latest.json               — указатель {"version", "key"}
+
+root — каталог или s3://bucket/prefix (CAROUSEL_ARTIFACT). Публикация:
+
+    python -m mybot.artifact publish [--to s3://bucket/carousel]
+"""
+
+from __future__ import annotations
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import logger, settings
+
+FORMAT = 1
+LATEST = "latest.json"
+
+_current: Optional[Dict[str, Any]] = None
+
+
+# ────────────────── хранилище ──────────────────
+def _s3():
+    import boto3
+
+    session = boto3.session.Session(
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        region_name="ru-central1",
+    )
+    return session.resource("s3", endpoint_url=os.getenv("S3_ENDPOINT", "https://storage.yandexcloud.net"))
+
+
+def _split(uri: str):
+    bucket, _, prefix = uri[len("s3://"):].partition("/")
+    return bucket, prefix.strip("/")
+
+
+def _put(uri: str, name: str, data: bytes) -> None:
+    if uri.startswith("s3://"):
+        bucket, prefix = _split(uri)
+        key = f"{prefix}/{name}" if prefix else name
+        _s3().Bucket(bucket).put_object(Key=key, Body=data, ContentType="application/json")
+        return
+    path = Path(uri) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _get(uri: str, name: str) -> Optional[bytes]:
+    if uri.startswith("s3://"):
+        bucket, prefix = _split(uri)
+        key = f"{prefix}/{name}" if prefix else name
+        try:
+            return _s3().Object(bucket, key).get()["Body"].read()
+        except Exception as e:  # NoSuchKey / сеть
+            logger.warning("Артефакт %s/%s недоступен: %s", uri, key, e)
+            return None
+    path = Path(uri) / name
+    return path.read_bytes() if path.exists() else None
+
+
+# ────────────────── сборка / публикация ──────────────────
+def _pick_splash(champion: Optional[str]) -> Optional[str]:
+    """Случайный сплэш чемпиона — путь относительно SPLASH_DIR (у бота свой том)."""
+    from .splash import _manifest_map, _norm
+
+    files = _manifest_map().get(_norm(champion)) if champion else None
+    if not files:
+        return None
+    root = settings().splash_dir.resolve()
+    chosen = Path(random.choice(files))
+    try:
+        return chosen.relative_to(root).as_posix()
+    except ValueError:
+        return str(chosen)
+
+
+def build(messages: List[Dict], source: str) -> Dict[str, Any]:
+    items = [
+        {"text": m["text"], "champion": m.get("champion"), "splash": _pick_splash(m.get("champion")),
+         "nickname": m.get("nickname"), "metric": m.get("metric"), "region": m.get("region")}
+        for m in messages
+    ]
+    digest = hashlib.sha256(json.dumps(items, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+    now = dt.datetime.now(dt.timezone.utc)
+    return {
+        "format": FORMAT,
+        "version": f"{now:%Y%m%dT%H%M%S}-{digest[:8]}",
+        "created_at": now.isoformat(timespec="seconds"),
+        "source": source,
+        "messages": items,
+    }
+
+
+def publish(art: Dict[str, Any], uri: str = "") -> str:
+    """Пишет версию, затем указатель latest.json — читатель не увидит полузаписанный файл."""
+    uri = uri or settings().carousel_artifact
+    if not uri:
+        raise RuntimeError("CAROUSEL_ARTIFACT не задан")
+    key = f"carousel-{art['version']}.json"
+    _put(uri, key, json.dumps(art, ensure_ascii=False).encode("utf-8"))
+    _put(uri, LATEST, json.dumps({"version": art["version"], "key": key}).encode("utf-8"))
+    logger.info("Артефакт карусели %s: %d сообщений → %s", art["version"], len(art["messages"]), uri)
+    return art["version"]
+
+
+# ────────────────── чтение ботом ──────────────────
+def _resolve(items: List[Dict]) -> List[Dict]:
+    out = []
+    for m in items:
+        splash = m.get("splash")
+        if splash:
+            path = Path(splash) if Path(splash).is_absolute() else settings().splash_dir / splash
+            splash = str(path.resolve()) if path.exists() else None
+        out.append({"text": m["text"], "champion": m.get("champion"), "splash": splash,
+                    "nickname": m.get("nickname"), "metric": m.get("metric"),
+                    "region": m.get("region")})
+    return out
+
+
+def load(uri: str = "") -> Optional[Dict[str, Any]]:
+    """Последняя версия артефакта (тексты + абсолютные пути сплэшей) либо None."""
+    global _current
+    uri = uri or settings().carousel_artifact
+    if not uri:
+        return None
+    raw = _get(uri, LATEST)
+    if raw is None:
+        return None
+    pointer = json.loads(raw)
+    if _current is not None and _current["version"] == pointer["version"]:
+        return _current
+    body = _get(uri, pointer["key"])
+    if body is None:
+        return None
+    art = json.loads(body)
+    if art.get("format") != FORMAT:
+        logger.warning("Артефакт %s: формат %s не поддерживается", art.get("version"), art.get("format"))
+        return None
+    art["messages"] = _resolve(art["messages"])
+    _current = art
+    logger.info("Загружен артефакт карусели %s (%d сообщений)", art["version"], len(art["messages"]))
+    return art
+
+
+def version() -> Optional[str]:
+    """Версия загруженного артефакта (None — артефакт не загружен)."""
+    return _current["version"] if _current else None
+
+
+def messages(reload: bool = False) -> Optional[List[Dict]]:
+    """Сообщения текущего артефакта; reload — перечитать указатель (по триггеру)."""
+    art = _current
+    if reload or art is None:
+        try:
+            art = load()
+        except Exception:
+            logger.exception("Не удалось прочитать артефакт карусели")
+            art = _current
+    return art["messages"] if art else None
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Публикация артефакта карусели")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    pub = sub.add_parser("publish", help="собрать из Trino и опубликовать")
+    pub.add_argument("--to", default="", help="каталог или s3://bucket/prefix (по умолчанию CAROUSEL_ARTIFACT)")
+    args = p.parse_args()
+
+    from .cache import fetch_and_cache
+    from .config import configure
+    from .messages import build_messages
+
+    cfg = configure()
+    art = build(build_messages(fetch_and_cache()), source=cfg.trino_table)
+    print(publish(art, args.to))
+
+
+if __name__ == "__main__":
+    main()
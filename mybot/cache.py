@@ -1,25 +1,142 @@
 from __future__ import annotations
 import asyncio
+import os
+import tempfile
 from datetime import datetime
-import pandas as pd
+from typing import TYPE_CHECKING, Iterable, List, Optional
 
-from .config import PARQUET_FILE, TRINO_TABLE, STALE_AFTER, logger
-from .db import fetch_columns
+from .config import logger, settings
+from .metrics import inc, timed
 from .templates import METRIC_COLS
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 ALL_COLUMNS = ["source_nickname"] + METRIC_COLS + [f"{m}_meta" for m in METRIC_COLS]
 
+
+def _dictionary_columns(columns: Iterable[str]) -> List[str]:
+    """Ник и *_meta ("matchId-_-champion") повторяются — словарное кодирование."""
+    return [c for c in columns if c == "source_nickname" or c.endswith("_meta")]
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """Ник/meta → category, числа → самый узкий тип без потери значений."""
+    import numpy as np
+    import pandas as pd
+
+    for col in df.columns:
+        s = df[col]
+        if col == "source_nickname" or col.endswith("_meta"):
+            df[col] = s.astype("category")
+        elif pd.api.types.is_integer_dtype(s):
+            df[col] = pd.to_numeric(s, downcast="integer")
+        elif pd.api.types.is_float_dtype(s):
+            narrow = s.astype(np.float32)
+            if ((narrow.astype(np.float64) == s) | s.isna()).all():
+                df[col] = narrow
+    return df
+
+
+def _write_atomic(df: pd.DataFrame, path) -> None:
+    """Уникальный tmp в том же каталоге + os.replace: читатель видит либо старый,
+    либо новый файл целиком, параллельные обновления не пишут в один tmp."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(
+            table,
+            tmp,
+            compression="zstd",
+            use_dictionary=_dictionary_columns(table.column_names),
+        )
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@timed("cache_refresh_seconds")
 def fetch_and_cache() -> pd.DataFrame:
-    df = fetch_columns(ALL_COLUMNS, TRINO_TABLE)
+    from .db import fetch_records
+
+    cfg = settings()
+    df = fetch_records(ALL_COLUMNS)
     df = df.loc[:, ~df.columns.duplicated()]
-    df.to_parquet(PARQUET_FILE, engine="pyarrow", index=False)
+    _write_atomic(df, cfg.parquet_file)
     logger.info("Saved %d rows", len(df))
-    return df
+    return compact(df)
+
+
+def _read(path, columns: Optional[List[str]], players: Optional[List[str]],
+          non_null: Optional[List[str]]) -> pd.DataFrame:
+    """pyarrow.dataset: читаются только нужные колонки, фильтры применяются при сканировании."""
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format="parquet")
+    names = dataset.schema.names
+    if columns is not None:
+        columns = [c for c in dict.fromkeys(["source_nickname", *columns]) if c in names]
+    flt = None
+    if players:
+        flt = pc.field("source_nickname").isin(players)
+    if non_null:
+        any_set = None
+        for m in non_null:
+            if m in names:
+                cond = pc.field(m).is_valid()
+                any_set = cond if any_set is None else (any_set | cond)
+        if any_set is not None:
+            flt = any_set if flt is None else (flt & any_set)
+    return compact(dataset.to_table(columns=columns, filter=flt).to_pandas())
+
+
+_refresh: Optional[asyncio.Future] = None
+
+
+def _refresh_in_background() -> None:
+    """Одно фоновое обновление за раз: пока файл не обновлён, он остаётся
+    устаревшим, и каждый load_data запускал бы ещё одно."""
+    global _refresh
+    if _refresh is not None and not _refresh.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:  # вызов вне event loop (скрипты, бенчмарк)
+        return
+    # fetch_and_cache синхронный — обновляем в пуле потоков, не блокируя бота
+    _refresh = loop.run_in_executor(None, fetch_and_cache)
+    _refresh.add_done_callback(_log_refresh)
+
+
+def _log_refresh(fut: asyncio.Future) -> None:
+    if not fut.cancelled() and fut.exception() is not None:
+        logger.error("Фоновое обновление кэша не удалось", exc_info=fut.exception())
+
 
-def load_data(force: bool = False) -> pd.DataFrame:
-    if force or not PARQUET_FILE.exists():
-        return fetch_and_cache()
-    mtime = datetime.utcfromtimestamp(PARQUET_FILE.stat().st_mtime)
-    if datetime.utcnow() - mtime > STALE_AFTER:
-        asyncio.create_task(fetch_and_cache())
-    return pd.read_parquet(PARQUET_FILE, engine="pyarrow")
\ No newline at end of file
+@timed("cache_load_seconds")
+def load_data(
+    force: bool = False,
+    columns: Optional[List[str]] = None,
+    players: Optional[List[str]] = None,
+    non_null: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Снимок рекордов.
+    columns — только эти метрики/колонки (ник добавляется всегда);
+    players — только эти source_nickname; non_null — строки, где задана хотя бы одна из метрик."""
+    cfg = settings()
+    if force or not cfg.parquet_file.exists():
+        df = fetch_and_cache()
+        if columns is None and players is None and non_null is None:
+            return df
+        return _read(cfg.parquet_file, columns, players, non_null)
+    mtime = datetime.utcfromtimestamp(cfg.parquet_file.stat().st_mtime)
+    if datetime.utcnow() - mtime > cfg.stale_after:
+        inc("cache_stale_total")
+        _refresh_in_background()
+    return _read(cfg.parquet_file, columns, players, non_null)
@@ -1,28 +1,107 @@
-import os
+"""
+config.py
+~~~~~~~~~
+Настройки бота. Импорт модуля ничего не делает: .env, каталоги и логирование
+поднимаются одним явным шагом `configure()` в точке входа. `settings()`
+возвращает уже собранные настройки (и вызывает configure() сам, если модуль
+запущен отдельно). Старые имена (`config.SPLASH_DIR`, …) читаются через них же.
+"""
+
+from __future__ import annotations
 import logging
+import os
+from dataclasses import dataclass
 from datetime import timedelta
 from pathlib import Path
-from dotenv import load_dotenv
-
-load_dotenv()
-
-BOT_TOKEN = os.environ["BOT_TOKEN"].strip()
-SPLASH_DIR = Path(os.getenv("SPLASH_DIR", "data/splashes"))
-TRINO_TABLE = os.getenv("RECORDS_TABLE", "iceberg.dbt_model.concat_record")
-DATA_DIR = Path(os.getenv("DATA_DIR", "data"))
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-PARQUET_FILE = DATA_DIR / "concat_record.parquet"
-STALE_AFTER = timedelta(hours=int(os.getenv("STALE_HOURS", "6")))
+from typing import Dict, Optional
 
-logging.basicConfig(level=logging.INFO,
-                    format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
 
-NICKNAMES = [
+# Ростер в формате load.RIOT_IDS: "Name#TAG" или "Name#TAG@euw1" (явная платформа)
+PLAYERS = [
     "Monty Gard#RU1",
     "Breaksthesilence#RU1",
     "2pilka#RU1",
     "Gruntq#RU1",
     "Шaзам#RU1",
     "Prooaknor#RU1",
-]
\ No newline at end of file
+]
+NICKNAMES = [p.partition("@")[0] for p in PLAYERS]
+# Платформа из ростера; регион из снимка (mybot/regions.py) важнее
+NICK_PLATFORMS: Dict[str, str] = {n: pl.lower() for n, _, pl in (p.partition("@") for p in PLAYERS) if pl}
+# Как PLATFORM_ROUTING загрузчика по умолчанию (ru1 → ru)
+DEFAULT_PLATFORM = "ru"
+
+
+@dataclass(frozen=True)
+class Settings:
+    bot_token: str
+    splash_dir: Path
+    trino_table: str
+    data_dir: Path
+    stale_after: timedelta
+    # Готовый артефакт карусели от пайплайна (mybot/artifact.py): каталог или s3://bucket/prefix
+    carousel_artifact: str
+    # trino | duckdb — откуда брать рекорды и KDA (duckdb: mybot/local_engine.py)
+    query_engine: str
+    # Локальная копия сырых parquet для duckdb: каталог или glob
+    raw_parquet: str
+    kda_table: str
+
+    @property
+    def parquet_file(self) -> Path:
+        return self.data_dir / "concat_record.parquet"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            bot_token=os.getenv("BOT_TOKEN", "").strip(),
+            splash_dir=Path(os.getenv("SPLASH_DIR", "data/splashes")),
+            trino_table=os.getenv("RECORDS_TABLE", "iceberg.dbt_model.concat_record"),
+            data_dir=Path(os.getenv("DATA_DIR", "data")),
+            stale_after=timedelta(hours=int(os.getenv("STALE_HOURS", "6"))),
+            carousel_artifact=os.getenv("CAROUSEL_ARTIFACT", ""),
+            query_engine=os.getenv("QUERY_ENGINE", "trino").strip().lower(),
+            raw_parquet=os.getenv("RAW_PARQUET", "data/raw"),
+            kda_table=os.getenv("KDA_TABLE", "iceberg.dbt_model.avg_weekly_kda"),
+        )
+
+
+_settings: Optional[Settings] = None
+
+
+def configure(env_file: Optional[str] = None, *, setup_logging: bool = True) -> Settings:
+    """.env → переменные окружения → каталоги → логирование. Повторный вызов перечитывает."""
+    global _settings
+    from dotenv import load_dotenv
+
+    load_dotenv(env_file)
+    s = Settings.from_env()
+    s.data_dir.mkdir(parents=True, exist_ok=True)
+    if setup_logging:
+        logging.basicConfig(level=logging.INFO,
+                            format="%(asctime)s [%(levelname)s] %(message)s")
+    _settings = s
+    return s
+
+
+def settings() -> Settings:
+    return _settings if _settings is not None else configure()
+
+
+_LEGACY = {
+    "BOT_TOKEN": "bot_token",
+    "SPLASH_DIR": "splash_dir",
+    "TRINO_TABLE": "trino_table",
+    "DATA_DIR": "data_dir",
+    "PARQUET_FILE": "parquet_file",
+    "STALE_AFTER": "stale_after",
+    "CAROUSEL_ARTIFACT": "carousel_artifact",
+    "QUERY_ENGINE": "query_engine",
+}
+
+
+def __getattr__(name: str):
+    if name in _LEGACY:
+        return getattr(settings(), _LEGACY[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,23 @@
 from .trino_client import query_df
-from .config import logger
+from .config import logger, settings
 
 def fetch_columns(columns: list[str], table: str):
     sql = f"SELECT {', '.join(columns)} FROM {table}"
     logger.info("SQL: %s", sql)
-    return query_df(sql)
\ No newline at end of file
+    return query_df(sql)
+
+def fetch_records(columns: list[str]):
+    """Снимок рекордов: concat_record из Trino или тот же расчёт в DuckDB (QUERY_ENGINE=duckdb)."""
+    cfg = settings()
+    if cfg.query_engine == "duckdb":
+        from .local_engine import engine
+        return engine().records().reindex(columns=columns)
+    return fetch_columns(columns, cfg.trino_table)
+
+def fetch_weekly_kda():
+    """source_nickname, week_start, avg_kda за 5 полных недель."""
+    cfg = settings()
+    if cfg.query_engine == "duckdb":
+        from .local_engine import engine
+        return engine().weekly_kda()
+    return fetch_columns(["source_nickname", "week_start", "avg_kda"], cfg.kda_table)
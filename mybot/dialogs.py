@@ -4,7 +4,6 @@ import json
 import random
 import re
 from functools import lru_cache
-from pathlib import Path
 
 from aiogram.enums import ContentType
 from aiogram.fsm.state import State, StatesGroup
@@ -13,14 +12,14 @@ from aiogram_dialog.api.entities import MediaAttachment
 from aiogram_dialog.widgets.media import DynamicMedia
 from aiogram_dialog.widgets.kbd import Row, Button, Url
 from aiogram_dialog.widgets.text import Format, Const
-from urllib.parse import quote
 
-from .config import NICKNAMES, SPLASH_DIR
+from .config import NICKNAMES, logger, settings
 from .messages import build_messages
 from .cache import load_data
-
-# хранение подготовленных сообщений по пользователям
-USER_MESSAGES: Dict[int, List[Dict]] = {}
+from .metrics import timer, timed
+from .regions import learn, summoner_url
+from .storage import carousel_store
+from . import artifact
 
 class RecSG(StatesGroup):
     show = State()
@@ -31,7 +30,8 @@ def _norm(name: str) -> str:
 
 @lru_cache(maxsize=1)
 def _manifest_map() -> Dict[str, List[str]]:
-    path = Path(SPLASH_DIR) / "manifest.json"
+    splash_dir = settings().splash_dir
+    path = splash_dir / "manifest.json"
     if not path.exists():
         return {}
     with open(path, "r", encoding="utf-8") as f:
@@ -42,10 +42,19 @@ def _manifest_map() -> Dict[str, List[str]]:
         if not isinstance(files, list):
             continue
         norm_key = _norm(str(champion))
-        abs_files = [str((Path(SPLASH_DIR) / fn).resolve()) for fn in files]
+        abs_files = [str((splash_dir / fn).resolve()) for fn in files]
         idx[norm_key] = abs_files
     return idx
 
+def current_messages(force: bool = False) -> List[Dict]:
+    """Сообщения карусели: из артефакта пайплайна, а без него — Trino/parquet-кэш."""
+    msgs = artifact.messages(reload=force)
+    if msgs is None:
+        msgs = build_messages(load_data(force=force))
+    learn(msgs)
+    return msgs
+
+@timed("splash_pick_seconds")
 def pick_random_splash(champion: str) -> Optional[str]:
     files = _manifest_map().get(_norm(champion))
     if not files:
@@ -58,7 +67,7 @@ async def on_left(c, button, dialog_manager: DialogManager):
         dialog_manager.dialog_data["idx"] -= 1
 
 async def on_right(c, button, dialog_manager: DialogManager):
-    msgs = USER_MESSAGES.get(dialog_manager.event.from_user.id, [])
+    msgs = await carousel_store().get(dialog_manager.event.from_user.id)
     idx = dialog_manager.dialog_data.get("idx", 0)
     if idx < len(msgs) - 1:
         dialog_manager.dialog_data["idx"] = idx + 1
@@ -66,15 +75,16 @@ async def on_right(c, button, dialog_manager: DialogManager):
 nick_buttons = [
     Url(
         Const(n.split("#", 1)[0]),
-        Const(f"https://www.leagueofgraphs.com/summoner/ru/{quote(n)}"),
+        Format(f"{{nick_url_{i}}}"),
     )
-    for n in NICKNAMES
+    for i, n in enumerate(NICKNAMES)
 ]
 
 # ---------- данные окна ----------
 async def getter(dialog_manager: DialogManager, **kwargs):
     user_id = dialog_manager.event.from_user.id
-    msgs = USER_MESSAGES.get(user_id, [])
+    msgs = await carousel_store().get(user_id)
+    learn(msgs)  # карусель могла собрать другая реплика
     idx = dialog_manager.start_data.get("idx") if "idx" in dialog_manager.start_data else dialog_manager.dialog_data.get("idx", 0)
     idx = max(0, min(idx if isinstance(idx, int) else 0, max(len(msgs) - 1, 0)))
     dialog_manager.dialog_data["idx"] = idx
@@ -86,11 +96,12 @@ async def getter(dialog_manager: DialogManager, **kwargs):
         current = msgs[idx]
         text = current.get("text", "")
         champion = current.get("champion")
-        img_path = pick_random_splash(champion) if champion else None
+        img_path = current.get("splash") or (pick_random_splash(champion) if champion else None)
         if img_path:
             media = MediaAttachment(ContentType.PHOTO, path=img_path)
 
     return {
+        **{f"nick_url_{i}": summoner_url(n) for i, n in enumerate(NICKNAMES)},
         "text": text,
         "media": media,
         "disable_left": idx <= 0,
@@ -113,10 +124,12 @@ view = Window(
 dialog = Dialog(view, launch_mode=LaunchMode.ROOT)
 
 # ---------- ежедневный пуш карусели ----------
-async def push_daily_carousel(bot, registry, chat_id: int):
+async def push_daily_carousel(bot, registry, chat_id: int, data_version: Optional[str] = None):
     from aiogram_dialog import StartMode
 
-    df = load_data(force=True)
-    USER_MESSAGES[chat_id] = build_messages(df)
+    logger.info("Пуш карусели в %s (data_version=%s)", chat_id, data_version or "—")
+    await carousel_store().set(chat_id, current_messages(force=True))
     dm = registry.bg(bot=bot, user_id=chat_id, chat_id=chat_id)
-    await dm.start(RecSG.show, data={"idx": 0}, mode=StartMode.RESET_STACK)
+    # старт диалога рендерит первое окно — включая загрузку сплэша в Telegram
+    with timer("carousel_send_seconds"):
+        await dm.start(RecSG.show, data={"idx": 0}, mode=StartMode.RESET_STACK)
@@ -1,10 +1,16 @@
-from aiogram.filters import Command
+import asyncio
+
+from aiogram.filters import Command, CommandObject
 from aiogram import Router
 
-from .cache import fetch_and_cache, load_data
-from .messages import build_messages
-from .dialogs import USER_MESSAGES, RecSG
-from .config import logger
+from .cache import fetch_and_cache
+from .dialogs import RecSG, current_messages
+from .config import logger, settings
+from . import artifact
+from .metrics import timer
+from .record_index import record_index, snapshot_version
+from .storage import carousel_store
+from . import kda_chart
 
 router = Router()
 
@@ -12,21 +18,86 @@ router = Router()
 async def cmd_refresh(m):
     await m.answer("🔄 Обновляю данные…")
     try:
-        fetch_and_cache()
+        if settings().carousel_artifact:
+            artifact.messages(reload=True)
+        else:
+            fetch_and_cache()
         await m.answer("✅ Обновление завершено!")
     except Exception as e:
         logger.exception("Ошибка обновления")
         await m.answer(f"❌ Ошибка обновления: {e}")
 
+async def _answer_records(m, title: str, msgs):
+    """Тексты рекордов одним-несколькими сообщениями (лимит Telegram — 4096 символов)."""
+    chunk = title
+    for rec in msgs:
+        part = "\n\n" + rec["text"]
+        if len(chunk) + len(part) > 4096:
+            await m.answer(chunk, disable_web_page_preview=True)
+            chunk = part.lstrip()
+        else:
+            chunk += part
+    await m.answer(chunk, disable_web_page_preview=True)
+
+@router.message(Command("me"))
+async def cmd_me(m, command: CommandObject):
+    if not command.args:
+        await m.answer("Использование: /me <ник>, например /me Monty Gard")
+        return
+    index = await asyncio.to_thread(record_index)
+    nick, msgs = index.player(command.args)
+    if not msgs:
+        known = ", ".join(sorted(set(index.nicknames.values()))) or "—"
+        await m.answer(f"Для «{command.args}» рекордов нет. С рекордами: {known}")
+        return
+    await _answer_records(m, f"🏆 {nick}: {len(msgs)}", msgs)
+
+@router.message(Command("champ"))
+async def cmd_champ(m, command: CommandObject):
+    if not command.args:
+        await m.answer("Использование: /champ <чемпион>, например /champ Lee Sin")
+        return
+    index = await asyncio.to_thread(record_index)
+    msgs = index.champion(command.args)
+    if not msgs:
+        await m.answer(f"На «{command.args}» рекордов нет.")
+        return
+    await _answer_records(m, f"🏆 {msgs[0]['champion']}: {len(msgs)}", msgs)
+
+@router.message(Command("kda"))
+async def cmd_kda(m, command: CommandObject):
+    """/kda — все игроки; /kda Monty Gard, Gruntq — только перечисленные."""
+    from pathlib import Path
+    from aiogram.types import FSInputFile
+
+    players = [p.strip() for p in (command.args or "").split(",") if p.strip()]
+    charts = kda_chart.charts()
+    try:
+        key, photo, unknown = await charts.chart(snapshot_version(), players)
+    except Exception as e:
+        logger.exception("Ошибка графика KDA")
+        await m.answer(f"❌ Ошибка графика KDA: {e}")
+        return
+    if unknown:
+        await m.answer(f"Нет данных KDA для: {', '.join(unknown)}")
+        return
+    if key is None:
+        await m.answer("Нет данных KDA за последние недели.")
+        return
+    with timer("kda_send_seconds"):
+        sent = await m.answer_photo(FSInputFile(photo) if isinstance(photo, Path) else photo)
+    if isinstance(photo, Path) and sent.photo:
+        charts.remember(key, sent.photo[-1].file_id)
+
 @router.message(Command("check"))
 async def cmd_check(m, dialog_manager):
     try:
-        df = load_data()
-        msgs = build_messages(df)
+        msgs = current_messages()
     except Exception as e:
         logger.exception("Ошибка выборки")
         await m.answer(f"❌ Ошибка выборки: {e}")
         return
 
-    USER_MESSAGES[m.from_user.id] = msgs
-    await dialog_manager.start(RecSG.show, data={"idx": 0})
\ No newline at end of file
+    await carousel_store().set(m.from_user.id, msgs)
+    with timer("carousel_send_seconds"):
+        await dialog_manager.start(RecSG.show, data={"idx": 0})
\ No newline at end of file
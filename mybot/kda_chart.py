@@ -0,0 +1,189 @@
+"""
+kda_chart.py
+~~~~~~~~~~~~
+Графики недельного KDA (avg_weekly_kda) для /kda.
+
+* matplotlib рендерит PNG в пуле процессов (KDA_RENDER_WORKERS, по умолчанию 1) —
+  event loop aiogram не ждёт CPU;
+* PNG кэшируются на диске (DATA_DIR/kda_charts/<key>.png), ключ — хэш данных
+  графика + набор игроков: одинаковые данные дают один и тот же файл;
+* после первой отправки Telegram возвращает file_id — повторно шлём его,
+  без загрузки и без рендера (file_ids.json переживает рестарт);
+* (версия снимка, игроки) → ключ держится в памяти: повторный /kda на тех же
+  данных не читает Trino/DuckDB и не считает хэш.
+"""
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import logger, settings
+from .metrics import inc, timed
+from .splash import _norm
+
+Row = Tuple[str, str, float]  # (ник, начало недели ISO, avg_kda)
+
+
+def render_png(rows: List[Row], title: str) -> bytes:
+    """Линия на игрока по неделям. Выполняется в процессе пула."""
+    import io
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    series: Dict[str, List[Tuple[str, float]]] = {}
+    for nick, week, kda in sorted(rows, key=lambda r: (r[0], r[1])):
+        series.setdefault(nick, []).append((week, kda))
+
+    # общая ось недель: у игрока может не быть игр в какую-то неделю
+    weeks = sorted({r[1] for r in rows})
+    pos = {w: i for i, w in enumerate(weeks)}
+    fig, ax = plt.subplots(figsize=(8, 4.5), dpi=110)
+    for nick, points in series.items():
+        ax.plot([pos[w] for w, _ in points], [k for _, k in points], marker="o",
+                label=nick.split("#", 1)[0])
+    ax.set_xticks(range(len(weeks)), [w[5:] for w in weeks])  # MM-DD
+    ax.set_title(title)
+    ax.set_xlabel("неделя")
+    ax.set_ylabel("KDA")
+    ax.grid(alpha=0.3)
+    ax.legend(fontsize=8, loc="best")
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+class KdaCharts:
+    def __init__(self, directory: Path, workers: int = 1):
+        self.dir = directory
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._frame: Optional[Tuple[str, List[Row]]] = None  # (версия снимка, строки)
+        self._keys: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._ids_path = directory / "file_ids.json"
+        self._file_ids: Dict[str, str] = {}
+        if self._ids_path.exists():
+            try:
+                self._file_ids = json.loads(self._ids_path.read_text(encoding="utf-8"))
+            except ValueError:
+                logger.warning("Повреждён %s — file_id будут получены заново", self._ids_path)
+
+    # ── данные ──
+    def rows(self, version: str) -> List[Row]:
+        """Строки avg_weekly_kda; читаются заново только при смене версии снимка."""
+        if self._frame is None or self._frame[0] != version:
+            from .db import fetch_weekly_kda
+
+            df = fetch_weekly_kda()
+            rows = [
+                (str(n), str(w)[:10], float(k))
+                for n, w, k in zip(df["source_nickname"], df["week_start"], df["avg_kda"])
+                if k == k  # NaN
+            ]
+            self._frame = (version, rows)
+            self._keys.clear()  # ключи прошлой версии больше не понадобятся
+        return self._frame[1]
+
+    @staticmethod
+    def select(rows: List[Row], players: Sequence[str]) -> Tuple[List[Row], List[str]]:
+        """Строки выбранных игроков (ник целиком или без тега) и нераспознанные имена."""
+        nicks = {r[0] for r in rows}
+        if not players:
+            return rows, []
+        keys: Dict[str, str] = {}
+        for n in nicks:
+            keys[_norm(n)] = n
+            keys.setdefault(_norm(n.split("#", 1)[0]), n)
+        chosen, unknown = set(), []
+        for p in players:
+            n = keys.get(_norm(p))
+            if n is None:
+                unknown.append(p)
+            else:
+                chosen.add(n)
+        return [r for r in rows if r[0] in chosen], unknown
+
+    @staticmethod
+    def key(rows: List[Row]) -> str:
+        payload = json.dumps(sorted(rows), ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+    # ── рендер ──
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    @timed("kda_render_seconds")
+    async def _render(self, key: str, rows: List[Row]) -> Path:
+        path = self.dir / f"{key}.png"
+        fut = self._inflight.get(key)
+        if fut is None:  # одновременные /kda на одних данных — один рендер
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(self._pool(), render_png, rows, "Средний KDA по неделям")
+            self._inflight[key] = fut
+        try:
+            png = await fut
+        finally:
+            self._inflight.pop(key, None)
+        if not path.exists():
+            self.dir.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(png)
+            os.replace(tmp, path)
+        inc("kda_render_total")
+        return path
+
+    async def chart(self, version: str, players: Sequence[str]):
+        """(key, file_id или путь к PNG, нераспознанные имена); key=None — данных нет."""
+        players_key = tuple(sorted(_norm(p) for p in players))
+        key = self._keys.get((version, players_key))
+        rows: Optional[List[Row]] = None
+        if key is None:
+            rows, unknown = self.select(await asyncio.to_thread(self.rows, version), players)
+            if unknown or not rows:
+                return None, None, unknown
+            key = self.key(rows)
+            self._keys[(version, players_key)] = key
+        file_id = self._file_ids.get(key)
+        if file_id:
+            inc("kda_file_id_hit_total")
+            return key, file_id, []
+        path = self.dir / f"{key}.png"
+        if path.exists():
+            return key, path, []
+        if rows is None:  # ключ из кэша, а PNG удалён — данные читаем вне event loop
+            rows = self.select(await asyncio.to_thread(self.rows, version), players)[0]
+        return key, await self._render(key, rows), []
+
+    def remember(self, key: str, file_id: str) -> None:
+        """file_id загруженной картинки — следующая отправка без upload."""
+        self._file_ids[key] = file_id
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._ids_path.with_name(self._ids_path.name + ".tmp")
+        tmp.write_text(json.dumps(self._file_ids), encoding="utf-8")
+        os.replace(tmp, self._ids_path)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+
+_charts: Optional[KdaCharts] = None
+
+
+def charts() -> KdaCharts:
+    global _charts
+    if _charts is None:
+        _charts = KdaCharts(settings().data_dir / "kda_charts",
+                            workers=int(os.getenv("KDA_RENDER_WORKERS", "1")))
+    return _charts
@@ -0,0 +1,355 @@
+"""
+local_engine.py
+~~~~~~~~~~~~~~~
+Встроенный движок на DuckDB поверх сырых parquet (та же раскладка, что пишет
+load.py: <prefix>/<день>/<игрок>/*.parquet) — режим без Trino.
+
+QUERY_ENGINE=duckdb: снимок рекордов и недельный KDA считаются в процессе бота
+по локальной (или синхронизированной из S3) копии сырых файлов. Логика —
+та же, что в lol_dbt_project/models/*_record.sql и avg_weekly_kda.sql,
+только для всех игроков одним запросом (GROUP BY source_nickname).
+
+    python -m mybot.local_engine sync                 # S3 → RAW_PARQUET (только новые файлы)
+    python -m mybot.local_engine records [--today D]  # снимок рекордов в stdout
+    python -m mybot.local_engine kda [--today D]
+
+duckdb — необязательная зависимость: импортируется только в этом режиме.
+"""
+
+from __future__ import annotations
+import argparse
+import datetime as dt
+import os
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from .config import NICKNAMES, logger, settings
+from .metrics import timed
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Держать в синхроне с lol_dbt_project/models/*_record.sql
+BASE_COLUMNS: Dict[str, str] = {
+    "match_id": '"metadata.matchid"',
+    "champion_name": '"participant.championname"',
+    "dmg_to_champs": '"participant.totaldamagedealttochampions"',
+    "dmg_total": '"participant.totaldamagedealt"',
+    "dmg_turrets": '"participant.damagedealttoturrets"',
+    "dmg_objectives": '"participant.damagedealttoobjectives"',
+    "gold_earned": '"participant.goldearned"',
+    "gold_spent": '"participant.goldspent"',
+    "kills": '"participant.kills"',
+    "assists": '"participant.assists"',
+    "deaths": '"participant.deaths"',
+    "cs": '"participant.totalminionskilled"',
+    "dragon_kills": '"participant.dragonkills"',
+    "baron_kills": '"participant.baronkills"',
+    "turret_kills": '"participant.turretkills"',
+    "inhib_kills": '"participant.inhibitorkills"',
+    "pinks": '"participant.visionwardsboughtingame"',
+    "vision_score": '"participant.visionscore"',
+    "cc_time": '"participant.timeccingothers"',
+    "dmg_mitigated": '"participant.damageselfmitigated"',
+    "first_blood_kill": 'CAST("participant.firstbloodkill" AS INTEGER)',
+    "triple_kills": '"participant.triplekills"',
+    "quadra_kills": '"participant.quadrakills"',
+    "penta_kills": '"participant.pentakills"',
+    "heals_team": '"participant.totalhealsonteammates"',
+    "shields_team": '"participant.totaldamageshieldedonteammates"',
+    "longest_life": '"participant.longesttimespentliving"',
+    "game_duration": '"info.gameduration"',
+    "obj_stolen": '"participant.objectivesstolen"',
+    "obj_stolen_ast": '"participant.objectivesstolenassists"',
+    "wards_killed": '"participant.wardskilled"',
+    "wards_placed": '"participant.wardsplaced"',
+    "neutral_kills": '"participant.neutralminionskilled"',
+    "phys_dmg": '"participant.physicaldamagedealttochampions"',
+    "magic_dmg": '"participant.magicdamagedealttochampions"',
+    "true_dmg": '"participant.truedamagedealttochampions"',
+    "dmg_taken": '"participant.totaldamagetaken"',
+    "largest_crit": '"participant.largestcriticalstrike"',
+    "double_kills": '"participant.doublekills"',
+    "sprees": '"participant.killingsprees"',
+    "enemy_jungle": '"participant.totalenemyjungleminionskilled"',
+    "flash_casts": (
+        'CASE WHEN "participant.summoner1id" = 4 THEN "participant.summoner1casts" ELSE 0 END + '
+        'CASE WHEN "participant.summoner2id" = 4 THEN "participant.summoner2casts" ELSE 0 END'
+    ),
+    "time_dead": '"participant.totaltimespentdead"',
+    "champ_level": '"participant.champlevel"',
+    "game_creation_ts": '"info.gamecreation"',
+}
+
+DERIVED_COLUMNS: Dict[str, str] = {
+    "gold_unspent": "gold_earned - gold_spent",
+    "jungle_kills": "dragon_kills + baron_kills",
+    "interceptor": "obj_stolen + obj_stolen_ast",
+    "guard_angel": "heals_team + shields_team",
+    "cspm": "cs * 60.0 / NULLIF(game_duration, 0)",
+    "dpm": "dmg_total / NULLIF(game_duration, 0)",
+    "gpm": "gold_earned / NULLIF(game_duration, 0)",
+    "undying_ratio": "time_dead / NULLIF(game_duration, 0)",
+    "immortal": "CASE WHEN deaths = 0 AND (kills + assists) >= 10 THEN 1 ELSE 0 END",
+}
+
+# (метрика, агрегат): max — рекорд «больше», min — «меньше»
+RECORD_METRICS: List[Tuple[str, str]] = [
+    (m, "max") for m in (
+        "dmg_to_champs", "dmg_total", "dmg_turrets", "dmg_objectives", "gold_earned", "kills",
+        "assists", "cs", "jungle_kills", "turret_kills", "inhib_kills", "pinks", "vision_score",
+        "cc_time", "dmg_mitigated", "first_blood_kill", "immortal", "triple_kills",
+        "quadra_kills", "penta_kills", "heals_team", "shields_team", "longest_life", "cspm",
+        "interceptor", "wards_killed", "wards_placed", "dpm", "gpm", "enemy_jungle",
+        "neutral_kills", "phys_dmg", "magic_dmg", "true_dmg", "dmg_taken", "largest_crit",
+        "double_kills", "sprees", "gold_unspent", "flash_casts",
+    )
+] + [("undying_ratio", "min"), ("champ_level", "max"), ("guard_angel", "max")]
+
+# Пустой источник с колонками, которые читают запросы: окно без файлов даёт
+# пустой результат, а не скан всей истории и не ошибку read_parquet
+_TEXT_COLUMNS = {"metadata.matchid", "participant.championname",
+                 "participant.riotidgamename", "participant.riotidtagline"}
+_RAW_COLUMNS = sorted(
+    {c for expr in BASE_COLUMNS.values() for c in re.findall(r'"([^"]+)"', expr)} | _TEXT_COLUMNS
+)
+_EMPTY_SOURCE = "(SELECT NULL::VARCHAR AS source_nickname, " + ", ".join(
+    f'NULL::{"VARCHAR" if c in _TEXT_COLUMNS else "BIGINT"} AS "{c}"' for c in _RAW_COLUMNS
+) + " WHERE false)"
+
+# Trino: date(from_unixtime(ts / 1000)) — UTC-день матча
+_GAME_DATE = "CAST(make_timestamp(CAST(game_creation_ts AS BIGINT) * 1000) AS DATE)"
+
+
+def _records_sql(source: str, window_days: int = 32) -> str:
+    base = ",\n        ".join(f"{expr} AS {name}" for name, expr in BASE_COLUMNS.items())
+    derived = ",\n        ".join(f"({expr}) AS {name}" for name, expr in DERIVED_COLUMNS.items())
+    today_cols, hist_cols, cmp_cols = [], [], []
+    for m, agg in RECORD_METRICS:
+        op = ">" if agg == "max" else "<"
+        today_cols += [
+            f"{agg}({m}) AS {m}",
+            f"{agg}_by(match_id, {m}) AS {m}_match_id",
+            f"{agg}_by(champion_name, {m}) AS {m}_champion",
+        ]
+        hist_cols.append(f"{agg}({m}) AS {m}")
+        cond = f"t.{m} {op} h.{m}"
+        cmp_cols += [
+            f"CASE WHEN {cond} THEN t.{m} END AS {m}",
+            f"CASE WHEN {cond} THEN concat(t.{m}_match_id, '-_-', t.{m}_champion) END AS {m}_meta",
+        ]
+    return f"""
+WITH base AS (
+    SELECT
+        source_nickname,
+        {base}
+    FROM {source}
+    WHERE source_nickname IN (SELECT unnest($nicknames))
+      AND concat("participant.riotidgamename", "participant.riotidtagline")
+          = replace(source_nickname, '#', '')
+),
+aggregated AS (
+    SELECT *, {_GAME_DATE} AS game_date,
+        {derived}
+    FROM base
+),
+today_metrics AS (
+    SELECT source_nickname,
+        {", ".join(today_cols)}
+    FROM aggregated
+    WHERE game_date = $today - INTERVAL 1 DAY
+    GROUP BY source_nickname
+),
+historical_best AS (
+    SELECT source_nickname,
+        {", ".join(hist_cols)}
+    FROM aggregated
+    WHERE game_date BETWEEN $today - INTERVAL {window_days} DAY AND $today - INTERVAL 2 DAY
+    GROUP BY source_nickname
+)
+SELECT
+    {", ".join(cmp_cols)},
+    t.source_nickname
+FROM today_metrics t
+JOIN historical_best h USING (source_nickname)
+"""
+
+
+# Держать в синхроне с lol_dbt_project/models/avg_weekly_kda.sql
+_WEEKLY_KDA_SQL = """
+WITH per_game AS (
+    SELECT
+        source_nickname,
+        (("participant.kills" + "participant.assists") * 1.0)
+            / GREATEST("participant.deaths", 1) AS kda,
+        CAST(make_timestamp(CAST("info.gamecreation" AS BIGINT) * 1000) AS DATE) AS game_date
+    FROM {source}
+    WHERE source_nickname IN (SELECT unnest($nicknames))
+),
+filtered AS (
+    SELECT source_nickname, CAST(date_trunc('week', game_date) AS DATE) AS week_start, kda
+    FROM per_game
+    WHERE game_date < CAST(date_trunc('week', $today) AS DATE)
+      AND game_date >= CAST(date_trunc('week', $today) AS DATE) - to_days(CAST($weeks_days AS INTEGER))
+)
+SELECT source_nickname, week_start, ROUND(AVG(kda), 2) AS avg_kda
+FROM filtered
+GROUP BY source_nickname, week_start
+ORDER BY week_start DESC, source_nickname
+"""
+
+
+class LocalEngine:
+    """DuckDB in-memory поверх parquet под root.
+    view raw — все файлы (для ad-hoc запросов), создаётся при первом обращении,
+    когда файлы уже есть; records/weekly_kda читают только каталоги дней из своего
+    окна, поэтому стоимость не растёт с историей. Пустое окно — пустой результат."""
+
+    def __init__(self, root: str, threads: Optional[int] = None):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise RuntimeError("QUERY_ENGINE=duckdb требует пакет duckdb (pip install duckdb)") from e
+
+        self.root = root
+        self._con = duckdb.connect(":memory:")
+        if threads:
+            self._con.execute(f"SET threads = {int(threads)}")
+        # метаданные parquet кэшируются между запросами
+        self._con.execute("SET enable_object_cache = true")
+        self._lock = threading.Lock()
+        self._io_error = duckdb.IOException
+        self._raw_ready = False
+
+    def raw(self) -> Optional[str]:
+        """Имя view raw; None — файлов пока нет (свежий деплой до первого sync)."""
+        with self._lock:
+            if not self._raw_ready:
+                try:
+                    self._con.execute(
+                        "CREATE OR REPLACE VIEW raw AS SELECT * FROM read_parquet("
+                        f"'{self.pattern}', union_by_name = true, hive_partitioning = false)"
+                    )
+                except self._io_error as e:
+                    logger.warning("DuckDB: нет файлов в %s — пустой результат (%s)", self.pattern, e)
+                    return None
+                self._raw_ready = True
+        return "raw"
+
+    @property
+    def pattern(self) -> str:
+        if any(ch in self.root for ch in "*?["):
+            return self.root
+        return f"{self.root.rstrip('/')}/**/*.parquet"
+
+    def _source(self, since: dt.date, until: dt.date) -> str:
+        """read_parquet(...) по каталогам дней [since, until] (раскладка load.py: <root>/<день>/...).
+        Для glob или другой раскладки — все файлы; нет файлов — пустой источник."""
+        root = Path(self.root)
+        if self.pattern == self.root or not root.is_dir():
+            return self.raw() or _EMPTY_SOURCE
+        files = []
+        for day_dir in root.iterdir():
+            try:
+                day = dt.date.fromisoformat(day_dir.name)
+            except ValueError:
+                return self.raw() or _EMPTY_SOURCE
+            if since <= day <= until:
+                files += [str(p) for p in day_dir.rglob("*.parquet")]
+        if not files:
+            return _EMPTY_SOURCE
+        listed = ", ".join("'" + f.replace("'", "''") + "'" for f in sorted(files))
+        return f"read_parquet([{listed}], union_by_name = true, hive_partitioning = false)"
+
+    def query_df(self, sql: str, params: Optional[Dict] = None) -> "pd.DataFrame":
+        # отдельный курсор на запрос: соединение DuckDB не потокобезопасно
+        with self._lock:
+            cur = self._con.cursor()
+        try:
+            return cur.execute(sql, params or {}).df()
+        finally:
+            cur.close()
+
+    @timed("local_records_seconds")
+    def records(self, today: Optional[dt.date] = None,
+                nicknames: Sequence[str] = NICKNAMES) -> "pd.DataFrame":
+        """Аналог concat_record: строка на игрока, сыгравшего вчера; рекорд — значение, иначе NULL."""
+        today = today or dt.date.today()
+        # день партиции — день загрузки, он может быть на сутки позже дня матча
+        source = self._source(today - dt.timedelta(days=33), today)
+        return self.query_df(_records_sql(source), {
+            "today": today,
+            "nicknames": list(nicknames),
+        })
+
+    @timed("local_weekly_kda_seconds")
+    def weekly_kda(self, today: Optional[dt.date] = None, weeks: int = 5,
+                   nicknames: Sequence[str] = NICKNAMES) -> "pd.DataFrame":
+        """Аналог avg_weekly_kda: средний KDA за `weeks` полных недель до текущей."""
+        today = today or dt.date.today()
+        week_start = today - dt.timedelta(days=today.weekday())
+        source = self._source(week_start - dt.timedelta(days=7 * weeks + 1), today)
+        return self.query_df(_WEEKLY_KDA_SQL.replace("{source}", source), {
+            "today": today,
+            "weeks_days": 7 * weeks,
+            "nicknames": list(nicknames),
+        })
+
+
+@lru_cache(maxsize=1)
+def engine() -> LocalEngine:
+    cfg = settings()
+    logger.info("DuckDB поверх %s", cfg.raw_parquet)
+    return LocalEngine(cfg.raw_parquet, threads=int(os.getenv("DUCKDB_THREADS", "0")) or None)
+
+
+# ────────────────── синхронизация из S3 ──────────────────
+def sync(bucket: str, prefix: str, dest: Path) -> int:
+    """Скачивает отсутствующие (или изменившиеся по размеру) parquet из s3://bucket/prefix."""
+    from .artifact import _s3
+
+    n = 0
+    for obj in _s3().Bucket(bucket).objects.filter(Prefix=prefix.strip("/") + "/"):
+        if not obj.key.endswith(".parquet"):
+            continue
+        path = dest / obj.key[len(prefix.strip("/")) + 1:]
+        if path.exists() and path.stat().st_size == obj.size:
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        obj.Object().download_file(str(tmp))
+        os.replace(tmp, path)
+        n += 1
+    logger.info("Синхронизировано %d файлов s3://%s/%s → %s", n, bucket, prefix, dest)
+    return n
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="DuckDB поверх сырых parquet (без Trino)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("sync", help="докачать сырые parquet из S3 в RAW_PARQUET")
+    s.add_argument("--bucket", default=os.getenv("S3_BUCKET_NAME", ""))
+    s.add_argument("--prefix", default=os.getenv("S3_PREFIX", "stage_load_raw_data"))
+    for name in ("records", "kda"):
+        q = sub.add_parser(name)
+        q.add_argument("--today", type=dt.date.fromisoformat, default=None)
+    args = p.parse_args()
+
+    from .config import configure
+
+    cfg = configure()
+    if args.cmd == "sync":
+        if not args.bucket:
+            p.error("--bucket или S3_BUCKET_NAME")
+        sync(args.bucket, args.prefix, Path(cfg.raw_parquet))
+        return
+    eng = engine()
+    df = eng.records(args.today) if args.cmd == "records" else eng.weekly_kda(args.today)
+    print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,34 @@
 import asyncio
 import os
 
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram_dialog import setup_dialogs
-
-from .config import BOT_TOKEN
-from .dialogs import dialog
-from .handlers import router as handlers_router
-from .scheduler import setup_scheduler
+from .config import configure
 
 
 async def main():
-    bot = Bot(BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    dp = Dispatcher()
+    cfg = configure()
+    if not cfg.bot_token:
+        raise RuntimeError("BOT_TOKEN не задан (export или .env)")
+
+    # aiogram и остальное — после конфигурации: импорт модуля остаётся дешёвым
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.default import DefaultBotProperties
+    from aiogram.enums import ParseMode
+    from aiogram_dialog import setup_dialogs
+
+    from . import artifact
+    from .dialogs import dialog
+    from .handlers import router as handlers_router
+    from .metrics import start_exporter
+    from .scheduler import setup_scheduler
+    from .send_queue import SendQueue
+    from .storage import events_isolation, fsm_storage
+
+    bot = Bot(cfg.bot_token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # все исходящие вызовы Telegram — через лимиты 30/с на бота и 1/с на чат
+    bot.session.middleware(SendQueue.from_env())
+    # STORAGE_URL=redis://… — состояние диалогов общее для всех реплик
+    isolation = events_isolation()
+    dp = Dispatcher(storage=fsm_storage(), **({"events_isolation": isolation} if isolation else {}))
 
     registry = setup_dialogs(dp)
     dp.include_router(dialog)
@@ -31,7 +45,17 @@ async def main():
         chat_id=target_chat,
     )
 
-    await dp.start_polling(bot)
+    await start_exporter()
+    # артефакт карусели грузим заранее — первый /check и пуш без похода в Trino
+    await asyncio.to_thread(artifact.messages)
+    if os.getenv("BOT_MODE", "polling").strip().lower() == "webhook":
+        from .webhook import run_webhook
+
+        await run_webhook(dp, bot)
+    else:
+        # после webhook-режима getUpdates вернёт конфликт, пока webhook не снят
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
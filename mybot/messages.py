@@ -1,10 +1,14 @@
 from __future__ import annotations
 import math
-from typing import Dict, List, Tuple
-import pandas as pd
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
+from .metrics import timed
+from .regions import match_url, split_match_id
 from .templates import TEMPLATES, METRIC_COLS
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 def _split_meta(raw: str | None):
     if not raw or not isinstance(raw, str):
         return "<match>", "<champion>"
@@ -13,7 +17,10 @@ def _split_meta(raw: str | None):
         return match_id or "<match>", champ or "<champion>"
     return raw, "<champion>"
 
+@timed("build_messages_seconds")
 def build_messages(df: pd.DataFrame) -> List[Dict]:
+    import pandas as pd
+
     sent_pairs: set[Tuple[str, str, str]] = set()
     counts: Dict[str, int] = {}
     out: List[Dict] = []
@@ -27,6 +34,8 @@ def build_messages(df: pd.DataFrame) -> List[Dict]:
 
         for metric in METRIC_COLS:
             val = row.get(metric)
+            if hasattr(val, "item"):  # numpy-скаляр после compact() → int/float
+                val = val.item()
             if val in (None, "", "0") or (
                 isinstance(val, (int, float)) and (val == 0 or math.isnan(val))
             ):
@@ -45,15 +54,13 @@ def build_messages(df: pd.DataFrame) -> List[Dict]:
             if isinstance(val, float) and val.is_integer():
                 val = int(val)
 
-            num = match_id.removeprefix("RU_")
-            match_link = (
-                f'<a href="https://www.leagueofgraphs.com/match/ru/{num}">'
-                f'{match_id}</a>'
-            )
+            match_link = f'<a href="{match_url(match_id)}">{match_id}</a>'
 
             text = TEMPLATES[metric].format(
                 nickname=nick, matchId=match_link, champion=champion, value=val
             )
-            out.append({"text": text, "champion": champion})
+            region = split_match_id(match_id)[0] if match_id != "<match>" else None
+            out.append({"text": text, "champion": champion, "nickname": nick, "metric": metric,
+                        "region": region})
             counts[champion] = counts.get(champion, 0) + 1
     return out
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+metrics.py
+~~~~~~~~~~
+Лёгкие таймеры и счётчики для горячих путей бота.
+
+Включается переменной METRICS_ENABLED=1 (читается при импорте). Выключено —
+`timed` возвращает исходную функцию без обёртки, `timer` — общий nullcontext,
+`inc` — один if; накладных расходов практически нет.
+
+Экспорт:
+* METRICS_PORT=9108         — текстовый endpoint в формате Prometheus (/metrics)
+* METRICS_LOG_INTERVAL=60   — периодическая строка в лог с p50/p95/p99
+"""
+
+from __future__ import annotations
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Deque, Dict, Optional
+
+__all__ = ["ENABLED", "timed", "timer", "observe", "inc", "gauge", "snapshot", "render_prometheus", "start_exporter"]
+
+log = logging.getLogger("mybot.metrics")
+
+ENABLED = os.getenv("METRICS_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+_RESERVOIR = int(os.getenv("METRICS_RESERVOIR", "2048"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Последние N наблюдений + общие count/sum; квантили считаются по окну."""
+
+    __slots__ = ("count", "total", "_window")
+
+    def __init__(self, size: int = _RESERVOIR):
+        self.count = 0
+        self.total = 0.0
+        self._window: Deque[float] = deque(maxlen=size)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self._window.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        data = sorted(self._window)
+        if not data:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: data[min(len(data) - 1, int(q * len(data)))] for q in QUANTILES}
+
+
+_lock = threading.Lock()
+_histograms: Dict[str, Histogram] = {}
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, Callable[[], float]] = {}
+_background: set = set()
+
+
+def observe(name: str, value: float) -> None:
+    if not ENABLED:
+        return
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = Histogram()
+        h.observe(value)
+
+
+def inc(name: str, value: float = 1) -> None:
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def gauge(name: str, fn: Callable[[], float]) -> None:
+    """Регистрирует gauge — значение читается в момент экспорта."""
+    if ENABLED:
+        _gauges[name] = fn
+
+
+@contextmanager
+def _timer(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0)
+
+
+_NULL = nullcontext()
+
+
+def timer(name: str):
+    """with timer("x_seconds"): ... — время блока в гистограмму name."""
+    return _timer(name) if ENABLED else _NULL
+
+
+def timed(name: str):
+    """Декоратор для sync/async функций. При выключенных метриках — no-op."""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    observe(name, time.perf_counter() - t0)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+
+# ────────────────── export ──────────────────
+def snapshot() -> Dict[str, Dict]:
+    with _lock:
+        hist = {
+            name: {
+                "count": h.count,
+                "sum": round(h.total, 6),
+                **{f"p{int(q * 100)}": round(v, 6) for q, v in h.quantiles().items()},
+            }
+            for name, h in _histograms.items()
+        }
+        counters = dict(_counters)
+    gauges = {}
+    for name, fn in _gauges.items():
+        try:
+            gauges[name] = fn()
+        except Exception:  # gauge не должен ломать экспорт
+            log.debug("gauge %s failed", name, exc_info=True)
+    return {"histograms": hist, "counters": counters, "gauges": gauges}
+
+
+def render_prometheus() -> str:
+    lines = []
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            lines.append(f"# TYPE {name} summary")
+            for q, v in h.quantiles().items():
+                lines.append(f'{name}{{quantile="{q}"}} {v:.6f}')
+            lines.append(f"{name}_sum {h.total:.6f}")
+            lines.append(f"{name}_count {h.count}")
+        for name, v in sorted(_counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {v:g}")
+    for name, value in sorted(snapshot()["gauges"].items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+async def _log_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        log.info("metrics %s", json.dumps(snapshot(), ensure_ascii=False, sort_keys=True))
+
+
+async def _serve(port: int):
+    from aiohttp import web
+
+    async def handle(_request):
+        return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    log.info("Метрики: http://0.0.0.0:%d/metrics", port)
+    return runner
+
+
+async def start_exporter(port: Optional[int] = None, log_interval: Optional[float] = None):
+    """Поднимает /metrics и/или периодический лог. Ничего не делает, если метрики выключены."""
+    if not ENABLED:
+        return None
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "0") or 0)
+    log_interval = log_interval if log_interval is not None else float(os.getenv("METRICS_LOG_INTERVAL", "60") or 0)
+    runner = await _serve(port) if port else None
+    if log_interval > 0:
+        task = asyncio.get_running_loop().create_task(_log_loop(log_interval))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+    return runner
@@ -0,0 +1,72 @@
+"""
+record_index.py
+~~~~~~~~~~~~~~~
+Индекс текущего снимка рекордов в памяти: ник → сообщения, чемпион → сообщения.
+/me и /champ отвечают из него за O(k) без Trino и без прохода по карусели.
+
+Индекс пересобирается только при смене версии снимка: версия артефакта
+карусели, а без него — mtime parquet-кэша (mybot/cache.py).
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+from . import artifact
+from .config import settings
+from .metrics import inc, timed
+from .splash import _norm
+
+
+def snapshot_version() -> str:
+    v = artifact.version()
+    if v is not None:
+        return f"artifact:{v}"
+    path = settings().parquet_file
+    return f"parquet:{path.stat().st_mtime_ns}" if path.exists() else "parquet:-"
+
+
+class RecordIndex:
+    def __init__(self, version: str, messages: List[Dict]):
+        self.version = version
+        self.by_nick: Dict[str, List[Dict]] = {}
+        self.by_champ: Dict[str, List[Dict]] = {}
+        self.nicknames: Dict[str, str] = {}  # ключ → ник как в данных
+        for m in messages:
+            nick = m.get("nickname")
+            if nick:
+                key = _norm(nick)
+                self.by_nick.setdefault(key, []).append(m)
+                self.nicknames[key] = nick
+                # "/me monty gard" без тега
+                game = _norm(nick.split("#", 1)[0])
+                if game != key:
+                    self.by_nick.setdefault(game, self.by_nick[key])
+                    self.nicknames.setdefault(game, nick)
+            champ = m.get("champion")
+            if champ:
+                self.by_champ.setdefault(_norm(champ), []).append(m)
+
+    def player(self, query: str) -> Tuple[Optional[str], List[Dict]]:
+        key = _norm(query)
+        return self.nicknames.get(key), self.by_nick.get(key, [])
+
+    def champion(self, query: str) -> List[Dict]:
+        return self.by_champ.get(_norm(query), [])
+
+
+_index: Optional[RecordIndex] = None
+
+
+@timed("record_index_seconds")
+def record_index() -> RecordIndex:
+    """Индекс текущего снимка; пересборка — только если версия изменилась."""
+    global _index
+    if _index is not None and _index.version == snapshot_version():
+        return _index
+    from .dialogs import current_messages
+
+    msgs = current_messages()
+    # версию берём после чтения: первое обращение могло загрузить артефакт или кэш
+    _index = RecordIndex(snapshot_version(), msgs)
+    inc("record_index_rebuild_total")
+    return _index
@@ -0,0 +1,60 @@
+"""
+regions.py
+~~~~~~~~~~
+Регион матча и игрока для ссылок на leagueofgraphs.
+
+* match-id Riot начинается с платформы: RU_123 → /match/ru/123, EUW1_456 → /match/euw/456;
+* платформа игрока — из снимка: сообщения рекордов несут region (платформу из
+  match-id, та же, что в колонке region сырой таблицы), learn() запоминает её
+  для ника; до первого снимка — NICK_PLATFORMS из ростера, затем DEFAULT_PLATFORM.
+"""
+
+from __future__ import annotations
+from typing import Dict, Iterable, Tuple
+from urllib.parse import quote
+
+from .config import DEFAULT_PLATFORM, NICK_PLATFORMS
+
+# платформа Riot → раздел сайта
+LOG_REGIONS = {
+    "br1": "br", "eun1": "eune", "euw1": "euw", "jp1": "jp", "kr": "kr",
+    "la1": "lan", "la2": "las", "me1": "me", "na1": "na", "oc1": "oce",
+    "ph2": "ph", "ru": "ru", "ru1": "ru", "sg2": "sg", "th2": "th",
+    "tr1": "tr", "tw2": "tw", "vn2": "vn",
+}
+BASE = "https://www.leagueofgraphs.com"
+
+_seen: Dict[str, str] = {}  # ник → платформа по последнему снимку
+
+
+def log_region(platform: str) -> str:
+    return LOG_REGIONS.get(platform.lower(), LOG_REGIONS[DEFAULT_PLATFORM])
+
+
+def split_match_id(match_id: str) -> Tuple[str, str]:
+    """"EUW1_456" → ("euw1", "456"); без префикса — DEFAULT_PLATFORM."""
+    platform, sep, num = match_id.partition("_")
+    if not sep:
+        return DEFAULT_PLATFORM, match_id
+    return platform.lower(), num
+
+
+def match_url(match_id: str) -> str:
+    platform, num = split_match_id(match_id)
+    return f"{BASE}/match/{log_region(platform)}/{num}"
+
+
+def learn(messages: Iterable[Dict]) -> None:
+    """Платформы игроков из сообщений снимка (ключи nickname и region)."""
+    for m in messages:
+        if m.get("nickname") and m.get("region"):
+            _seen[m["nickname"]] = m["region"]
+
+
+def player_platform(nickname: str) -> str:
+    return _seen.get(nickname) or NICK_PLATFORMS.get(nickname, DEFAULT_PLATFORM)
+
+
+def summoner_url(nickname: str) -> str:
+    platform = player_platform(nickname)
+    return f"{BASE}/summoner/{log_region(platform)}/{quote(nickname)}"
@@ -1,7 +1,8 @@
 import asyncio
-from nats_trigger import setup_nats_trigger_and_bind
 
+from .config import settings
 from .dialogs import push_daily_carousel
+from .metrics import timed
 
 
 NATS_HANDLE = None
@@ -10,11 +11,15 @@ NATS_HANDLE = None
 def setup_scheduler(loop, timezone: str, bot, registry, chat_id: int):
     async def _bind():
         global NATS_HANDLE
+        from nats_trigger import setup_nats_trigger_and_bind  # nats-py грузим только здесь
+        from .storage import delivered_versions
+
         NATS_HANDLE = await setup_nats_trigger_and_bind(
             bot=bot,
             registry=registry,
             chat_id=chat_id,
-            push_daily_carousel=push_daily_carousel,
+            push_daily_carousel=timed("nats_handle_seconds")(push_daily_carousel),
+            delivered=delivered_versions(settings().data_dir / "delivered_versions.json"),
         )
 
     loop.create_task(_bind())
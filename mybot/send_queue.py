@@ -0,0 +1,183 @@
+"""
+send_queue.py
+~~~~~~~~~~~~~
+Исходящая очередь Telegram с лимитами: ~30 сообщений/с на бота и ~1/с на чат
+(в группах — 20 в минуту). Подключается middleware сессии aiogram, поэтому
+через неё идут все отправки — хэндлеры, диалоги, пуш карусели.
+
+* send*/copy*/forward*/edit* с chat_id ждут токен чата, затем общий токен;
+  остальные методы (getUpdates, answerCallbackQuery, …) идут мимо;
+* сообщения одного чата уходят строго по очереди, разные чаты — параллельно;
+* TelegramRetryAfter: ждём retry_after и повторяем (чат остаётся занят,
+  порядок не ломается), не больше SEND_MAX_RETRIES раз.
+
+Метрики: tg_send_queue_depth (ждущие и идущие отправки), tg_send_wait_seconds
+(ожидание в очереди), tg_send_seconds (вместе с отправкой), tg_retry_after_total.
+
+Лимиты: SEND_GLOBAL_RATE=30, SEND_CHAT_RATE=1, SEND_GROUP_RATE=0.33, SEND_CHAT_BURST=3.
+"""
+
+from __future__ import annotations
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from .config import logger
+from .metrics import gauge, inc, observe
+
+_LIMITED = ("send", "copy", "forward", "edit")
+_EXEMPT = {"sendChatAction"}
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше burst про запас."""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def ready(self) -> None:
+        """Дождаться токена, не забирая его."""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def acquire(self) -> None:
+        await self.ready()
+        self.tokens -= 1
+
+    def drain(self, seconds: float) -> None:
+        """После flood-wait: следующий токен не раньше чем через seconds."""
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class _Chat:
+    __slots__ = ("bucket", "lock", "last_used")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.lock = asyncio.Lock()  # FIFO: порядок сообщений чата сохраняется
+        self.last_used = time.monotonic()
+
+
+class SendQueue(BaseRequestMiddleware):
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20 / 60,
+        chat_burst: float = 3.0,
+        max_retries: int = 5,
+    ):
+        # burst 1: в любом окне в секунду не больше global_rate отправок
+        self.global_bucket = TokenBucket(global_rate, burst=1)
+        self._global_lock = asyncio.Lock()  # общий токен — строго в порядке очереди
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chats: Dict[object, _Chat] = {}
+        self.waiting = 0
+        gauge("tg_send_queue_depth", lambda: self.waiting)
+
+    @classmethod
+    def from_env(cls) -> "SendQueue":
+        return cls(
+            global_rate=float(os.getenv("SEND_GLOBAL_RATE", "30")),
+            chat_rate=float(os.getenv("SEND_CHAT_RATE", "1")),
+            group_rate=float(os.getenv("SEND_GROUP_RATE", str(20 / 60))),
+            chat_burst=float(os.getenv("SEND_CHAT_BURST", "3")),
+            max_retries=int(os.getenv("SEND_MAX_RETRIES", "5")),
+        )
+
+    def _chat(self, chat_id) -> _Chat:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) > 1000:
+                self._prune()
+            group = isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+            if group:
+                bucket = TokenBucket(self.group_rate, burst=1)
+            else:
+                bucket = TokenBucket(self.chat_rate, burst=self.chat_burst)
+            chat = self._chats[chat_id] = _Chat(bucket)
+        chat.last_used = time.monotonic()
+        return chat
+
+    def _prune(self) -> None:
+        """Забываем чаты, которые давно молчат (их ведро всё равно полное)."""
+        cutoff = time.monotonic() - 60
+        for cid, chat in list(self._chats.items()):
+            if chat.last_used < cutoff and not chat.lock.locked() and chat.bucket.idle:
+                del self._chats[cid]
+
+    async def __call__(self, make_request, bot, method):
+        name = getattr(method, "__api_method__", "")
+        chat_id = getattr(method, "chat_id", None)
+        if not name.startswith(_LIMITED) or name in _EXEMPT:
+            return await make_request(bot, method)
+
+        t0 = time.perf_counter()
+        self.waiting += 1
+        chat = self._chat(chat_id) if chat_id is not None else None
+        try:
+            if chat is None:
+                await self._global()
+                observe("tg_send_wait_seconds", time.perf_counter() - t0)
+                return await self._send(make_request, bot, method, None)
+            async with chat.lock:
+                # токен чата забираем только вместе с общим: иначе ожидание общего
+                # сдвинуло бы отправку и интервал в чате сократился бы
+                await chat.bucket.ready()
+                await self._global()
+                await chat.bucket.acquire()
+                observe("tg_send_wait_seconds", time.perf_counter() - t0)
+                return await self._send(make_request, bot, method, chat)
+        finally:
+            self.waiting -= 1
+            observe("tg_send_seconds", time.perf_counter() - t0)
+
+    async def _global(self) -> None:
+        async with self._global_lock:
+            await self.global_bucket.acquire()
+
+    async def _send(self, make_request, bot, method, chat: Optional[_Chat]):
+        attempt = 0
+        while True:
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                inc("tg_retry_after_total")
+                if attempt > self.max_retries:
+                    raise
+                logger.warning("Flood wait %ss для %s (%s), попытка %d",
+                               e.retry_after, getattr(method, "chat_id", "—"),
+                               method.__api_method__, attempt)
+                if chat is not None:
+                    chat.bucket.drain(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+                if chat is not None:
+                    await chat.bucket.ready()
+                await self._global()
+                if chat is not None:
+                    await chat.bucket.acquire()
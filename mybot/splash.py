@@ -7,7 +7,7 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional
 
-from .config import SPLASH_DIR
+from .config import settings
 
 def _norm(name: str) -> str:
     # нормализуем: без пробелов/подчёркиваний/дефисов, в нижний регистр
@@ -16,7 +16,8 @@ def _norm(name: str) -> str:
 @lru_cache(maxsize=1)
 def _manifest_map() -> Dict[str, List[str]]:
     """Читает manifest.json один раз и строит индекс champ->список абсолютных путей."""
-    path = SPLASH_DIR / "manifest.json"
+    splash_dir = settings().splash_dir
+    path = splash_dir / "manifest.json"
     if not path.exists():
         return {}
 
@@ -29,7 +30,7 @@ def _manifest_map() -> Dict[str, List[str]]:
         if not isinstance(files, list):
             continue
         norm_key = _norm(str(champion))
-        abs_files = [str((SPLASH_DIR / fn).resolve()) for fn in files]
+        abs_files = [str((splash_dir / fn).resolve()) for fn in files]
         idx[norm_key] = abs_files
     return idx
 
@@ -0,0 +1,129 @@
+"""
+storage.py
+~~~~~~~~~~
+Общее хранилище состояния бота — чтобы несколько реплик обслуживали одни и те
+же диалоги без sticky-сессий.
+
+STORAGE_URL:
+* пусто               — всё в памяти процесса (одна реплика, как раньше);
+* redis://host:6379/0 — Redis или совместимый сервер (Valkey, KeyDB, Dragonfly);
+* fakeredis://        — fakeredis в процессе: тот же код, что с Redis, без сервера
+                        (локальная проверка, нужен пакет fakeredis).
+
+В хранилище лежат:
+* FSM/состояние aiogram_dialog (RedisStorage, ключи с destiny) и блокировки
+  событий (RedisEventIsolation) — апдейт одного чата не обрабатывают две реплики разом;
+* карусели пользователей (бывший USER_MESSAGES) — CAROUSEL_TTL секунд;
+* доставленные версии данных для NATS-триггера (DeliveredVersions).
+
+Апдейты Telegram реплики делят через webhook, триггеры NATS — через queue group.
+"""
+
+from __future__ import annotations
+import json
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List
+
+from .config import logger
+
+PREFIX = "mybot"
+
+
+def storage_url() -> str:
+    return os.getenv("STORAGE_URL", "").strip()
+
+
+@lru_cache(maxsize=1)
+def redis_client():
+    """Асинхронный клиент redis-py (или fakeredis) по STORAGE_URL."""
+    url = storage_url()
+    if url.startswith("fakeredis://"):
+        from fakeredis import FakeAsyncRedis
+
+        return FakeAsyncRedis()
+    from redis.asyncio import Redis
+
+    return Redis.from_url(url)
+
+
+def fsm_storage():
+    """Хранилище FSM для Dispatcher."""
+    if not storage_url():
+        from aiogram.fsm.storage.memory import MemoryStorage
+
+        return MemoryStorage()
+    from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+    logger.info("FSM и диалоги в общем хранилище %s", storage_url().split("@")[-1])
+    # aiogram_dialog хранит стек и контексты под разными destiny
+    return RedisStorage(redis_client(), key_builder=DefaultKeyBuilder(with_destiny=True))
+
+
+def events_isolation():
+    """Блокировка событий одного чата между репликами (None — по умолчанию aiogram)."""
+    if not storage_url():
+        return None
+    from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisEventIsolation
+
+    return RedisEventIsolation(redis_client(), key_builder=DefaultKeyBuilder(with_destiny=True))
+
+
+# ────────────────── карусели пользователей ──────────────────
+class CarouselStore:
+    """user_id → подготовленные сообщения карусели (в памяти процесса)."""
+
+    def __init__(self):
+        self._data: Dict[int, List[Dict]] = {}
+
+    async def get(self, user_id: int) -> List[Dict]:
+        return self._data.get(user_id, [])
+
+    async def set(self, user_id: int, msgs: List[Dict]) -> None:
+        self._data[user_id] = msgs
+
+
+class RedisCarouselStore(CarouselStore):
+    def __init__(self, redis, ttl: int):
+        self.redis = redis
+        self.ttl = ttl
+
+    async def get(self, user_id: int) -> List[Dict]:
+        raw = await self.redis.get(f"{PREFIX}:carousel:{user_id}")
+        return json.loads(raw) if raw else []
+
+    async def set(self, user_id: int, msgs: List[Dict]) -> None:
+        await self.redis.set(f"{PREFIX}:carousel:{user_id}",
+                             json.dumps(msgs, ensure_ascii=False), ex=self.ttl)
+
+
+@lru_cache(maxsize=1)
+def carousel_store() -> CarouselStore:
+    if not storage_url():
+        return CarouselStore()
+    return RedisCarouselStore(redis_client(), ttl=int(os.getenv("CAROUSEL_TTL", str(2 * 86400))))
+
+
+# ────────────────── доставленные версии ──────────────────
+class RedisDeliveredVersions:
+    """То же, что nats_trigger.DeliveredVersions, но общее для реплик; ключи живут ttl секунд."""
+
+    def __init__(self, redis, ttl: int = 30 * 86400):
+        self.redis = redis
+        self.ttl = ttl
+
+    async def seen(self, key: str) -> bool:
+        return bool(await self.redis.exists(f"{PREFIX}:delivered:{key}"))
+
+    async def mark(self, key: str) -> None:
+        await self.redis.set(f"{PREFIX}:delivered:{key}", time.time(), ex=self.ttl)
+
+
+def delivered_versions(path: Path):
+    if not storage_url():
+        from nats_trigger import DeliveredVersions
+
+        return DeliveredVersions(path)
+    return RedisDeliveredVersions(redis_client())
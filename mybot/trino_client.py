@@ -1,48 +1,74 @@
 """
 trino_client.py
 ~~~~~~~~~~~~~~~
-Единая точка работы с Trino.  
+Единая точка работы с Trino.
 Скрывает детали аутентификации и TLS-настроек.
+
+trino, pandas и urllib3 импортируются при первом запросе, параметры
+подключения читаются тогда же — импорт модуля ничего не проверяет.
+
+Кэш результатов: ключ — нормализованный SQL + snapshot_id каждой упомянутой
+Iceberg-таблицы (из "<table>$snapshots"). Пока dbt не пересобрал таблицу,
+повторный запрос стоит одного запроса к метаданным; результат лежит в
+DATA_DIR/query_cache/*.parquet, старые файлы вытесняются по QUERY_CACHE_MB.
 """
 
 from __future__ import annotations
+import hashlib
 import os
+import re
+import tempfile
 from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from dotenv import load_dotenv
-from trino import dbapi
-from trino.auth import BasicAuthentication
-import urllib3
+from .config import logger, settings
+from .metrics import inc, timed
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from trino import dbapi
 
 __all__ = ["get_connection", "query_df"]
 
-import pandas as pd
 
 # ────────────────── init ──────────────────
-load_dotenv()
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+@lru_cache(maxsize=1)
+def _params() -> Dict:
+    """Параметры подключения из окружения (после config.configure())."""
+    settings()
+    password = os.getenv("TRINO_PASSWORD", "").strip()
+    if not password:
+        raise RuntimeError("TRINO_PASSWORD не задан (export или .env)")
 
-_TRINO_HOST = os.getenv("TRINO_HOST", "5.129.208.115")
-_TRINO_PORT = int(os.getenv("TRINO_PORT", 8443))
-_TRINO_USER = os.getenv("TRINO_USER", "admin")
-_TRINO_PASSWORD = os.getenv("TRINO_PASSWORD", "").strip()
-_TRINO_CATALOG = os.getenv("TRINO_CATALOG", "iceberg")
-_TRINO_SCHEMA = os.getenv("TRINO_SCHEMA", "dbt_model")
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    return {
+        "host": os.getenv("TRINO_HOST", "5.129.208.115"),
+        "port": int(os.getenv("TRINO_PORT", 8443)),
+        "user": os.getenv("TRINO_USER", "admin"),
+        "password": password,
+        "catalog": os.getenv("TRINO_CATALOG", "iceberg"),
+        "schema": os.getenv("TRINO_SCHEMA", "dbt_model"),
+    }
 
-if not _TRINO_PASSWORD:
-    raise RuntimeError("TRINO_PASSWORD не задан (export или .env)")
 
 # ────────────────── helpers ──────────────────
-def _connect() -> dbapi.Connection:
+def _connect() -> "dbapi.Connection":
     """Создаёт и возвращает подключение к Trino (без fetch’а)."""
+    from trino import dbapi
+    from trino.auth import BasicAuthentication
+
+    p = _params()
     return dbapi.connect(
-        host=_TRINO_HOST,
-        port=_TRINO_PORT,
-        user=_TRINO_USER,
-        catalog=_TRINO_CATALOG,
-        schema=_TRINO_SCHEMA,
+        host=p["host"],
+        port=p["port"],
+        user=p["user"],
+        catalog=p["catalog"],
+        schema=p["schema"],
         http_scheme="https",
-        auth=BasicAuthentication(_TRINO_USER, _TRINO_PASSWORD),
+        auth=BasicAuthentication(p["user"], p["password"]),
         verify=False,  # отключаем проверку сертификата
     )
 
@@ -55,11 +81,140 @@ def get_connection():
     finally:
         conn.close()
 
-def query_df(sql: str) -> pd.DataFrame:
-    """Выполняет запрос и сразу отдаёт результат в виде DataFrame."""
+def _fetch_df(cur, sql: str) -> "pd.DataFrame":
+    import pandas as pd
+
+    cur.execute(sql)
+    rows = cur.fetchall()
+    cols = [d[0] for d in cur.description]
+    return pd.DataFrame(rows, columns=cols)
+
+
+# ────────────────── кэш результатов ──────────────────
+_TABLE_REF = re.compile(r'\b(?:from|join)\s+((?:"?[\w$]+"?\.){0,2}"?[\w$]+"?)', re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
+def referenced_tables(sql: str) -> List[str]:
+    """Полные имена catalog.schema.table после FROM/JOIN (без подзапросов и CTE-имён)."""
+    p = _params()
+    ctes = {m.lower() for m in re.findall(r'(?:with|,)\s+"?(\w+)"?\s+as\s*\(', sql, re.IGNORECASE)}
+    out = []
+    for ref in _TABLE_REF.findall(sql):
+        parts = [x.strip('"') for x in ref.split(".")]
+        if len(parts) == 1 and parts[0].lower() in ctes:
+            continue
+        parts = [p["catalog"], p["schema"]][: 3 - len(parts)] + parts
+        name = ".".join(parts)
+        if name not in out:
+            out.append(name)
+    return sorted(out)
+
+
+def _snapshot_id(cur, table: str) -> Optional[int]:
+    catalog, schema, name = table.split(".")
+    cur.execute(
+        f'SELECT snapshot_id FROM {catalog}.{schema}."{name}$snapshots" '
+        f"ORDER BY committed_at DESC LIMIT 1"
+    )
+    rows = cur.fetchall()
+    return rows[0][0] if rows else None
+
+
+class ResultCache:
+    """parquet-файлы результатов в каталоге; вытеснение самых давно использованных по размеру."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.dir = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(sql: str, snapshots: Dict[str, int]) -> str:
+        parts = [normalize_sql(sql)] + [f"{t}@{s}" for t, s in sorted(snapshots.items())]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:32]
+
+    def get(self, key: str) -> Optional["pd.DataFrame"]:
+        import pandas as pd
+
+        path = self.dir / f"{key}.parquet"
+        if not path.exists():
+            return None
+        try:
+            df = pd.read_parquet(path, engine="pyarrow")
+        except Exception:
+            logger.warning("Повреждённый кэш %s — удаляю", path.name)
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)  # отметка использования для LRU
+        except FileNotFoundError:  # вытеснен параллельным evict()
+            pass
+        return df
+
+    def put(self, key: str, df: "pd.DataFrame") -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / f"{key}.parquet"
+        # уникальный tmp: один и тот же запрос могут кэшировать несколько потоков
+        fd, tmp = tempfile.mkstemp(dir=self.dir, prefix=path.name + ".", suffix=".tmp")
+        os.close(fd)
+        try:
+            df.to_parquet(tmp, engine="pyarrow", index=False, compression="zstd")
+            os.replace(tmp, path)
+        except Exception as e:  # смешанные типы в object-колонках и т.п.
+            logger.info("Результат не кэшируется: %s", e)
+            Path(tmp).unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        files = []
+        for f in self.dir.glob("*.parquet"):
+            try:
+                st = f.stat()
+            except FileNotFoundError:  # уже удалён другим потоком
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+        files.sort(key=lambda x: x[0])
+        total = sum(size for _, size, _ in files)
+        while files and total > self.max_bytes:
+            _, size, f = files.pop(0)
+            total -= size
+            f.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=1)
+def _result_cache() -> Optional[ResultCache]:
+    max_mb = float(os.getenv("QUERY_CACHE_MB", "256") or 0)
+    if max_mb <= 0:
+        return None
+    return ResultCache(settings().data_dir / "query_cache", int(max_mb * 2**20))
+
+
+@timed("trino_query_seconds")
+def query_df(sql: str, use_cache: bool = True) -> "pd.DataFrame":
+    """Выполняет запрос и отдаёт результат в виде DataFrame.
+    Если все таблицы запроса — Iceberg и их снапшоты не менялись, результат берётся из кэша."""
+    cache = _result_cache() if use_cache else None
     with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute(sql)
-        rows = cur.fetchall()
-        cols = [d[0] for d in cur.description]
-    return pd.DataFrame(rows, columns=cols)
+        key = None
+        if cache is not None:
+            try:
+                snapshots = {t: _snapshot_id(cur, t) for t in referenced_tables(sql)}
+            except Exception as e:  # не Iceberg / нет прав на метаданные
+                logger.debug("Снапшоты недоступны, запрос без кэша: %s", e)
+                snapshots = {}
+            if snapshots and all(v is not None for v in snapshots.values()):
+                key = ResultCache.key(sql, snapshots)
+                df = cache.get(key)
+                if df is not None:
+                    inc("trino_cache_hit_total")
+                    return df
+                inc("trino_cache_miss_total")
+        df = _fetch_df(cur, sql)
+    if key is not None:
+        cache.put(key, df)
+    return df
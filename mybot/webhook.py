@@ -0,0 +1,189 @@
+"""
+webhook.py
+~~~~~~~~~~
+Режим webhook (BOT_MODE=webhook) вместо long polling: aiohttp-сервер принимает
+апдейты от Telegram и обрабатывает их в фоне, не больше WEBHOOK_CONCURRENCY
+одновременно. При насыщении ответ Telegram задерживается — он сам держит не
+больше max_connections запросов, это и есть backpressure. Несколько реплик за
+балансировщиком делят апдейты между собой (состояние — в mybot/storage.py).
+
+    WEBHOOK_URL=https://bot.example.com   внешний адрес; пусто — setWebhook не вызываем
+    WEBHOOK_PATH=/tg/webhook
+    WEBHOOK_SECRET=…                      X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_HOST=0.0.0.0  WEBHOOK_PORT=8080
+    WEBHOOK_CONCURRENCY=32                апдейтов в обработке на реплику
+    WEBHOOK_MAX_CONNECTIONS=40            для setWebhook
+
+Проверка без Telegram — синтетические апдейты:
+
+    python -m mybot.webhook post --url http://localhost:8080/tg/webhook --count 200 --text /check
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any
+
+from .config import logger
+from .metrics import gauge, inc, observe
+
+
+def _handler_class():
+    from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+    class LimitedRequestHandler(SimpleRequestHandler):
+        """SimpleRequestHandler в фоновом режиме с ограничением параллельных апдейтов."""
+
+        def __init__(self, dispatcher, bot, concurrency: int, **kwargs: Any):
+            super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+            self.concurrency = concurrency
+            self._sem = asyncio.Semaphore(concurrency)
+            gauge("webhook_inflight", lambda: len(self._background_feed_update_tasks))
+
+        async def _handle_request_background(self, bot, request):
+            await self._sem.acquire()
+            try:
+                return await super()._handle_request_background(bot, request)
+            except BaseException:
+                self._sem.release()
+                raise
+
+        async def _background_feed_update(self, bot, update):
+            t0 = time.perf_counter()
+            try:
+                await super()._background_feed_update(bot, update)
+            except Exception:
+                logger.exception("Ошибка обработки апдейта %s", update.get("update_id"))
+            finally:
+                self._sem.release()
+                inc("webhook_updates_total")
+                observe("webhook_update_seconds", time.perf_counter() - t0)
+
+        async def close(self) -> None:
+            # дожидаемся начатых апдейтов, затем закрываем сессию бота
+            if self._background_feed_update_tasks:
+                await asyncio.gather(*self._background_feed_update_tasks, return_exceptions=True)
+            await super().close()
+
+    return LimitedRequestHandler
+
+
+def build_app(dp, bot, path: str, secret: str = "", concurrency: int = 32):
+    """aiohttp-приложение: POST <path> — апдейты, GET /healthz — проверка живости."""
+    from aiohttp import web
+    from aiogram.webhook.aiohttp_server import setup_application
+
+    app = web.Application()
+    handler = _handler_class()(dp, bot, concurrency, secret_token=secret or None)
+    handler.register(app, path=path)
+
+    async def healthz(_request):
+        return web.Response(text="ok")
+
+    app.router.add_get("/healthz", healthz)
+    setup_application(app, dp, bot=bot)  # startup/shutdown диспетчера
+    return app
+
+
+async def run_webhook(dp, bot) -> None:
+    from aiohttp import web
+
+    path = os.getenv("WEBHOOK_PATH", "/tg/webhook")
+    secret = os.getenv("WEBHOOK_SECRET", "")
+    concurrency = int(os.getenv("WEBHOOK_CONCURRENCY", "32"))
+    host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    port = int(os.getenv("WEBHOOK_PORT", "8080"))
+    public_url = os.getenv("WEBHOOK_URL", "").rstrip("/")
+
+    app = build_app(dp, bot, path, secret, concurrency)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Webhook: http://%s:%d%s, параллельно до %d апдейтов", host, port, path, concurrency)
+
+    if public_url:
+        await bot.set_webhook(
+            public_url + path,
+            secret_token=secret or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40")),
+        )
+        logger.info("setWebhook → %s%s", public_url, path)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+# ────────────────── синтетические апдейты ──────────────────
+def synthetic_update(update_id: int, user_id: int, text: str) -> dict:
+    now = int(time.time())
+    user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+    entities = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}] if text.startswith("/") else []
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": now,
+            "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text,
+            "entities": entities,
+        },
+    }
+
+
+async def post_synthetic(url: str, count: int, users: int, text: str, secret: str,
+                         concurrency: int) -> dict:
+    """POST count апдейтов от users пользователей; время ответа сервера на каждый."""
+    import aiohttp
+
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+
+    async with aiohttp.ClientSession() as session:
+        async def one(i: int):
+            async with sem:
+                t0 = time.perf_counter()
+                async with session.post(url, json=synthetic_update(i + 1, 1000 + i % users, text),
+                                        headers=headers) as resp:
+                    await resp.read()
+                    resp.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(count)))
+        total = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "updates": count,
+        "seconds": round(total, 3),
+        "updates_per_s": round(count / total, 1) if total else None,
+        "p50_ms": round(1000 * latencies[len(latencies) // 2], 2),
+        "p99_ms": round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Синтетические апдейты в webhook бота")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    post = sub.add_parser("post")
+    post.add_argument("--url", default=f"http://localhost:{os.getenv('WEBHOOK_PORT', '8080')}"
+                                      f"{os.getenv('WEBHOOK_PATH', '/tg/webhook')}")
+    post.add_argument("--count", type=int, default=100)
+    post.add_argument("--users", type=int, default=10)
+    post.add_argument("--text", default="/check")
+    post.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", ""))
+    post.add_argument("--concurrency", type=int, default=20)
+    args = p.parse_args()
+    stats = asyncio.run(post_synthetic(args.url, args.count, args.users, args.text,
+                                       args.secret, args.concurrency))
+    print(json.dumps(stats, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
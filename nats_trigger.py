@@ -1,9 +1,14 @@
 import os
 import json
 import asyncio
+import concurrent.futures
+import inspect
 import logging
+import threading
+import time
 import uuid
-from typing import Optional, Callable
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Tuple
 
 import nats
 from nats.js.api import (
@@ -13,6 +18,7 @@ from nats.js.api import (
     ConsumerConfig,
     AckPolicy,
 )
+from nats.js.errors import NotFoundError
 
 log = logging.getLogger("nats-trigger")
 
@@ -23,27 +29,115 @@ def _sec_to_ns(v: Optional[int]) -> Optional[int]:
     return int(v * 1_000_000_000)
 
 
+# Окно дедупликации по Nats-Msg-Id (по умолчанию у JetStream — 2 минуты)
+DUPLICATE_WINDOW_S = float(os.getenv("NATS_DUPLICATE_WINDOW", str(24 * 3600)))
+
+
+def trigger_msg_id(payload: Optional[dict], default_type: str = "daily") -> str:
+    """Nats-Msg-Id по содержимому: тип триггера + версия данных.
+    Повтор триггера той же версии попадает в окно дедупликации JetStream.
+    Без data_version id случайный: пустой пейлоад cron'а одинаков каждый день,
+    и при окне в сутки следующий запуск (или ручной перезапуск) был бы отброшен."""
+    payload = payload or {}
+    kind = payload.get("type") or default_type
+    version = payload.get("data_version")
+    if not version:
+        return f"{kind}:{uuid.uuid4()}"
+    return f"{kind}:{version}"
+
+
+class DeliveredVersions:
+    """Версии данных, уже доставленные в чат: JSON-файл {ключ: время}, не больше max_items.
+    Триггер с такой версией подтверждается сразу — без Trino и повторного пуша."""
+
+    def __init__(self, path: Path, max_items: int = 500):
+        self.path = path
+        self.max_items = max_items
+        try:
+            self._seen = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._seen = {}
+
+    def seen(self, key: str) -> bool:
+        return key in self._seen
+
+    def mark(self, key: str) -> None:
+        self._seen[key] = time.time()
+        if len(self._seen) > self.max_items:
+            newest = sorted(self._seen.items(), key=lambda kv: kv[1])[-self.max_items:]
+            self._seen = dict(newest)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._seen), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+async def _maybe_await(value):
+    """DeliveredVersions — синхронный (файл), общие хранилища бота — асинхронные."""
+    return await value if inspect.isawaitable(value) else value
+
+
+def _subject_matches(subject: str, pattern: str) -> bool:
+    """Подпадает ли subject под шаблон NATS (* — один токен, > — хвост)."""
+    tokens, parts = subject.split("."), pattern.split(".")
+    for i, part in enumerate(parts):
+        if part == ">":
+            return len(tokens) > i
+        if i >= len(tokens) or (part != "*" and part != tokens[i]):
+            return False
+    return len(tokens) == len(parts)
+
+
 async def ensure_stream(js, stream: str, subject: str):
-    cfg = StreamConfig(
-        name=stream,
-        subjects=[subject],
-        retention=RetentionPolicy.WorkQueue,
-        storage=StorageType.File,
-        max_age=0,
-    )
+    """Создаёт stream или приводит существующий к нужному: добавляет subject,
+    если он не покрыт, и расширяет окно дедупликации до DUPLICATE_WINDOW_S
+    (add_stream на существующем stream конфиг не меняет)."""
+    try:
+        info = await js.stream_info(stream)
+    except NotFoundError:
+        cfg = StreamConfig(
+            name=stream,
+            subjects=[subject],
+            retention=RetentionPolicy.WORK_QUEUE,
+            storage=StorageType.FILE,
+            max_age=0,
+            duplicate_window=DUPLICATE_WINDOW_S,
+        )
+        try:
+            await js.add_stream(cfg)
+            log.info("Создан stream %s с subject %s", stream, subject)
+        except Exception as e:
+            log.debug("ensure_stream: %s", e)  # создан параллельно другим процессом
+        return
+    except Exception as e:
+        log.warning("ensure_stream %s: %s", stream, e)
+        return
+
+    cfg = info.config
+    changed = []
+    if not any(_subject_matches(subject, p) for p in cfg.subjects or []):
+        cfg.subjects = [*(cfg.subjects or []), subject]
+        changed.append(f"subject {subject}")
+    if (cfg.duplicate_window or 0) < DUPLICATE_WINDOW_S:
+        cfg.duplicate_window = DUPLICATE_WINDOW_S
+        changed.append(f"duplicate_window {DUPLICATE_WINDOW_S:.0f}s")
+    if not changed:
+        return
     try:
-        await js.add_stream(cfg)
-        log.info("Создан stream %s с subject %s", stream, subject)
+        await js.update_stream(cfg)
+        log.info("Обновлён stream %s: %s", stream, ", ".join(changed))
     except Exception as e:
-        log.debug("ensure_stream: %s", e)
+        log.warning("Не удалось обновить stream %s (%s): %s", stream, ", ".join(changed), e)
 
 
-async def ensure_consumer(js, stream: str, durable: str, ack_wait_s: int, max_deliver: int):
+async def ensure_consumer(js, stream: str, durable: str, ack_wait_s: int, max_deliver: int,
+                          filter_subject: Optional[str] = None):
     cfg = ConsumerConfig(
         durable_name=durable,
-        ack_policy=AckPolicy.Explicit,
+        ack_policy=AckPolicy.EXPLICIT,
         ack_wait=_sec_to_ns(ack_wait_s),
         max_deliver=max_deliver,
+        filter_subject=filter_subject,
     )
     try:
         await js.add_consumer(stream, cfg)
@@ -135,6 +229,7 @@ async def setup_nats_trigger_and_bind(
     ack_wait_s: int = 300,
     max_deliver: int = 10,
     nak_delay_s: int = 300,
+    delivered: Optional[DeliveredVersions] = None,
 ) -> NatsTrigger:
     nats_url = nats_url or os.getenv("NATS_URL", "nats://localhost:4222")
     stream = stream or os.getenv("NATS_STREAM", "TRIGGERS")
@@ -156,8 +251,20 @@ async def setup_nats_trigger_and_bind(
 
     async def _handle(msg):
         try:
-            await push_daily_carousel(bot, registry, chat_id)
+            payload = json.loads(msg.data or b"{}")
+        except ValueError:
+            payload = {}
+        data_version = payload.get("data_version") if isinstance(payload, dict) else None
+        key = f"{chat_id}:{data_version}" if data_version else None
+        if key and delivered is not None and await _maybe_await(delivered.seen(key)):
             await trigger.ack(msg)
+            log.info("Версия %s уже доставлена в %s — ack без пуша", data_version, chat_id)
+            return
+        try:
+            await push_daily_carousel(bot, registry, chat_id, data_version=data_version)
+            await trigger.ack(msg)
+            if key and delivered is not None:
+                await _maybe_await(delivered.mark(key))
             log.info("Отчёт отправлен. Ack.")
         except Exception as e:
             log.warning("Не удалось отправить отчёт: %s — запросим редоставку", e)
@@ -167,27 +274,160 @@ async def setup_nats_trigger_and_bind(
     return trigger
 
 
+class NatsPublisher:
+    """Публикация в JetStream через одно долгоживущее соединение.
+
+    Существование stream проверяется один раз на (stream, subject), а не на каждое
+    сообщение. publish_many() отправляет пачку, не дожидаясь ack каждого сообщения
+    по очереди: до max_inflight публикаций в полёте, ack собираются конвейером.
+    """
+
+    def __init__(
+        self,
+        nats_url: Optional[str] = None,
+        stream: Optional[str] = None,
+        name: str = "report-publisher",
+        max_inflight: int = 256,
+        ack_timeout_s: float = 10.0,
+    ):
+        self.nats_url = nats_url or os.getenv("NATS_URL", "nats://localhost:4222")
+        self.stream = stream or os.getenv("NATS_STREAM", "TRIGGERS")
+        self.name = name
+        self.max_inflight = max_inflight
+        self.ack_timeout_s = ack_timeout_s
+
+        self.nc: Optional[nats.NATS] = None
+        self.js = None
+        self._ensured: set = set()
+        self._lock = asyncio.Lock()
+
+    async def connect(self):
+        async with self._lock:
+            if self.nc is None or self.nc.is_closed:
+                self.nc = await nats.connect(self.nats_url, name=self.name)
+                self.js = self.nc.jetstream()
+                self._ensured.clear()
+        return self
+
+    async def _ensure(self, stream: str, subject: str):
+        if (stream, subject) not in self._ensured:
+            await ensure_stream(self.js, stream, subject)
+            self._ensured.add((stream, subject))
+
+    async def publish(
+        self,
+        subject: str,
+        payload: Optional[dict] = None,
+        msg_id: Optional[str] = None,
+        stream: Optional[str] = None,
+    ):
+        """Одно сообщение; msg_id → Nats-Msg-Id (окно дедупликации JetStream)."""
+        if self.js is None:
+            await self.connect()
+        stream = stream or self.stream
+        await self._ensure(stream, subject)
+        headers = {"Nats-Msg-Id": msg_id or str(uuid.uuid4())}
+        data = json.dumps(payload or {}, ensure_ascii=False).encode()
+        # повтор в окне дедупликации: ack с duplicate=True, сообщение не сохраняется
+        return await self.js.publish(subject, data, timeout=self.ack_timeout_s, stream=stream, headers=headers)
+
+    async def publish_many(
+        self,
+        items: Iterable[Tuple[str, Optional[dict], Optional[str]]],
+        stream: Optional[str] = None,
+    ) -> List[Any]:
+        """[(subject, payload, msg_id)] → PubAck (или исключение) в том же порядке."""
+        if self.js is None:
+            await self.connect()
+        items = list(items)
+        # stream проверяем до gather: иначе первая пачка шлёт add_stream на каждое сообщение
+        for subject in dict.fromkeys(it[0] for it in items):
+            await self._ensure(stream or self.stream, subject)
+        sem = asyncio.Semaphore(self.max_inflight)
+
+        async def _one(subject, payload, msg_id):
+            async with sem:
+                return await self.publish(subject, payload, msg_id, stream)
+
+        return await asyncio.gather(*(_one(*it) for it in items), return_exceptions=True)
+
+    async def close(self):
+        if self.nc:
+            try:
+                await self.nc.drain()
+            except Exception:
+                await self.nc.close()
+            finally:
+                self.nc = None
+                self.js = None
+
+    async def __aenter__(self) -> "NatsPublisher":
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class BackgroundPublisher:
+    """NatsPublisher для синхронного кода (load.py): свой event loop в фоновом потоке.
+
+    publish() не блокирует и возвращает concurrent.futures.Future с PubAck;
+    flush() дожидается всех отправленных, close() — flush + закрытие соединения.
+    """
+
+    def __init__(self, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="nats-publisher", daemon=True)
+        self._thread.start()
+        self._pub = NatsPublisher(**kwargs)
+        self._pending: List[concurrent.futures.Future] = []
+
+    def publish(self, subject: str, payload: Optional[dict] = None,
+                msg_id: Optional[str] = None) -> concurrent.futures.Future:
+        fut = asyncio.run_coroutine_threadsafe(self._pub.publish(subject, payload, msg_id), self._loop)
+        self._pending = [f for f in self._pending if not f.done()]
+        self._pending.append(fut)
+        return fut
+
+    def flush(self, timeout: Optional[float] = None) -> int:
+        """Ждёт отправленные сообщения; возвращает число неудачных."""
+        pending, self._pending = self._pending, []
+        failed = 0
+        for fut in pending:
+            try:
+                fut.result(timeout=timeout)
+            except Exception as e:
+                failed += 1
+                log.warning("Публикация не подтверждена: %s", e)
+        return failed
+
+    def close(self) -> int:
+        failed = self.flush()
+        asyncio.run_coroutine_threadsafe(self._pub.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        return failed
+
+
 async def publish_trigger(
     nats_url: Optional[str] = None,
     stream: Optional[str] = None,
     subject: Optional[str] = None,
     payload: Optional[dict] = None,
+    publisher: Optional[NatsPublisher] = None,
 ):
-    nats_url = nats_url or os.getenv("NATS_URL", "nats://localhost:4222")
-    stream = stream or os.getenv("NATS_STREAM", "TRIGGERS")
+    """Разовый триггер. С publisher — через его соединение, без connect/drain на сообщение.
+    Nats-Msg-Id — по версии данных (trigger_msg_id): дубль той же версии отбросит сам JetStream."""
     subject = subject or os.getenv("NATS_SUBJECT", "triggers.daily")
 
-    nc = await nats.connect(nats_url, name="report-publisher")
-    js = nc.jetstream()
-    await ensure_stream(js, stream, subject)
-
-    headers = {"Nats-Msg-Id": str(uuid.uuid4())}
-    data = json.dumps(payload or {}).encode()
-
-    ack = await js.publish(subject, data=data, headers=headers)
-    logging.getLogger("nats-trigger").info(
-        "Опубликован триггер: stream=%s subject=%s seq=%s", stream, subject, getattr(ack, "seq", None)
-    )
-
-    await nc.drain()
-
+    own = publisher is None
+    pub = publisher or NatsPublisher(nats_url=nats_url, stream=stream)
+    try:
+        ack = await pub.publish(subject, payload, msg_id=trigger_msg_id(payload), stream=stream)
+        log.info("Опубликован триггер: stream=%s subject=%s seq=%s duplicate=%s",
+                 stream or pub.stream, subject, getattr(ack, "seq", None), getattr(ack, "duplicate", None))
+        return ack
+    finally:
+        if own:
+            await pub.close()
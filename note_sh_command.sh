@@ -11,6 +11,9 @@ docker run --rm -it \
   -v "$(pwd)/lol_dbt_project:/workspace" \
   dbt dbt run --project-dir /workspace
 
+# после dbt run — готовый артефакт карусели для бота (без Trino на стороне бота)
+docker compose run --rm --entrypoint python mybot -m mybot.artifact publish
+
 docker build --no-cache --pull -f Dockerfile.splashes -t lol-splashes .
 docker run --rm -v /home/modernDE/bot/data/splashes:/data/splashes -w /app lol-splashes
 
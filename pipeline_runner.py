@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+pipeline_runner.py
+~~~~~~~~~~~~~~~~~~
+Цепочка load → dbt → bot по событиям NATS вместо трёх независимых расписаний.
+
+1. load.py --events публикует «данные легли» на каждый (игрок, день):
+   subject pipeline.landed, payload {riot_id, day, s3_key}.
+2. Раннер копит события, пока поток не затихнет на --debounce секунд, и
+   собирает только затронутые модели: <модели игроков>+ и общие модели,
+   читающие сырую таблицу напрямую (avg_weekly_kda, record_history).
+3. После успешного dbt build (и, если задан CAROUSEL_ARTIFACT, публикации
+   артефакта) боту уходит triggers.daily с версией данных в payload.
+   События ack-аются только после этого; при ошибке сборки или публикации —
+   nak с задержкой, раннер продолжает работу.
+
+    python pipeline_runner.py --project-dir lol_dbt_project
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shlex
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from nats_trigger import NatsPublisher, NatsTrigger, trigger_msg_id
+
+log = logging.getLogger("pipeline-runner")
+
+LANDED_STREAM = os.getenv("LANDED_STREAM", "PIPELINE")
+LANDED_SUBJECT = os.getenv("LANDED_SUBJECT", "pipeline.landed")
+RAW_SOURCE = "source:lol_raw.data_api_mining"
+_NICKNAME = re.compile(r"""\{%-?\s*set\s+nickname\s*=\s*['"]([^'"]+)['"]\s*-?%\}""")
+_SOURCE = re.compile(r"""source\(\s*['"]lol_raw['"]\s*,\s*['"]data_api_mining['"]\s*\)""")
+
+
+def model_map(project_dir: Path):
+    """(nickname → модель игрока, общие модели на сырой таблице) по SQL-файлам проекта."""
+    per_player: Dict[str, str] = {}
+    shared: List[str] = []
+    for path in sorted((project_dir / "models").rglob("*.sql")):
+        sql = path.read_text(encoding="utf-8")
+        if not _SOURCE.search(sql):
+            continue
+        m = _NICKNAME.search(sql)
+        if m:
+            per_player[m.group(1)] = path.stem
+        else:
+            shared.append(path.stem)
+    return per_player, shared
+
+
+def _game_name(riot_id: str) -> str:
+    return riot_id.split("#", 1)[0].strip().lower()
+
+
+def select_models(riot_ids: Set[str], per_player: Dict[str, str], shared: List[str]) -> List[str]:
+    """--select для dbt: модели затронутых игроков с потомками + общие модели.
+    Игрок без своей модели → вся цепочка от сырой таблицы."""
+    by_name = {_game_name(n): model for n, model in per_player.items()}
+    selected: List[str] = []
+    for riot_id in sorted(riot_ids):
+        model = per_player.get(riot_id) or by_name.get(_game_name(riot_id))
+        if model is None:
+            log.info("Для %s нет модели игрока — строим всё от %s", riot_id, RAW_SOURCE)
+            return [f"{RAW_SOURCE}+"]
+        selected.append(f"{model}+")
+    return sorted(set(selected)) + [f"{m}+" for m in shared]
+
+
+def data_version(events: List[dict]) -> str:
+    """Версия данных: последний день + хэш набора легших файлов (детерминированно)."""
+    keys = sorted({f"{e.get('riot_id')}|{e.get('day')}|{e.get('s3_key')}" for e in events})
+    last_day = max((e.get("day") or "" for e in events), default="")
+    return f"{last_day}-{hashlib.sha1(chr(10).join(keys).encode()).hexdigest()[:10]}"
+
+
+class PipelineRunner:
+    def __init__(
+        self,
+        project_dir: Path,
+        dbt_cmd: str,
+        debounce_s: float,
+        trigger_subject: str,
+        publish_artifact: bool,
+        publisher: NatsPublisher,
+    ):
+        self.project_dir = project_dir
+        self.dbt_cmd = shlex.split(dbt_cmd)
+        self.debounce_s = debounce_s
+        self.trigger_subject = trigger_subject
+        self.publish_artifact = publish_artifact
+        self.publisher = publisher
+        self._pending: List = []  # (msg, event)
+        self._wake = asyncio.Event()
+        self._trigger: Optional[NatsTrigger] = None
+
+    async def on_landed(self, msg):
+        try:
+            event = json.loads(msg.data or b"{}")
+        except ValueError:
+            log.warning("Некорректное событие %r — ack", msg.data[:200])
+            await msg.ack()
+            return
+        self._pending.append((msg, event))
+        self._wake.set()
+
+    async def _run(self, *args: str) -> int:
+        log.info("▶ %s", " ".join(args))
+        proc = await asyncio.create_subprocess_exec(*args)
+        return await proc.wait()
+
+    async def build(self, events: List[dict]) -> bool:
+        per_player, shared = model_map(self.project_dir)
+        riot_ids = {e["riot_id"] for e in events if e.get("riot_id")}
+        select = select_models(riot_ids, per_player, shared)
+        rc = await self._run(*self.dbt_cmd, "--project-dir", str(self.project_dir), "--select", *select)
+        if rc != 0:
+            log.error("dbt завершился с кодом %s", rc)
+            return False
+        if self.publish_artifact:
+            rc = await self._run(sys.executable, "-m", "mybot.artifact", "publish")
+            if rc != 0:
+                log.warning("Артефакт карусели не опубликован (код %s) — бот возьмёт данные из Trino", rc)
+        return True
+
+    async def loop(self):
+        while True:
+            await self._wake.wait()
+            # ждём, пока поток событий затихнет
+            while True:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.debounce_s)
+                except asyncio.TimeoutError:
+                    break
+            batch, self._pending = self._pending, []
+            events = [e for _, e in batch]
+            days = sorted({e.get("day") for e in events if e.get("day")})
+            log.info("📦 %d событий, дни %s", len(events), ", ".join(days))
+            try:
+                ok = await self.build(events)
+                if ok:
+                    version = data_version(events)
+                    payload = {"type": "daily", "data_version": version, "days": days}
+                    await self.publisher.publish(self.trigger_subject, payload, msg_id=trigger_msg_id(payload))
+                    log.info("🔔 Бот уведомлён, data_version=%s", version)
+            except Exception:
+                log.exception("Сборка или уведомление бота упали")
+                ok = False
+            await self._settle(batch, ok)
+
+    async def _settle(self, batch: List, ok: bool):
+        """ack пачки после успеха, иначе nak с задержкой; ошибка NATS не останавливает цикл —
+        неподтверждённое событие вернётся само по ack_wait."""
+        for msg, _ in batch:
+            try:
+                if ok:
+                    await msg.ack()
+                else:
+                    await self._trigger.nak(msg)
+            except Exception:
+                log.exception("Не удалось %s событие", "подтвердить" if ok else "вернуть")
+
+    async def start(self, nats_url: str, durable: str):
+        self._trigger = NatsTrigger(
+            nats_url=nats_url,
+            stream=LANDED_STREAM,
+            subject=LANDED_SUBJECT,
+            durable=durable,
+            queue=durable,
+            ack_wait_s=int(os.getenv("RUNNER_ACK_WAIT", "3600")),
+            nak_delay_s=int(os.getenv("RUNNER_NAK_DELAY", "600")),
+        )
+        await self._trigger.subscribe(self.on_landed)
+        try:
+            await self.loop()
+        finally:
+            await self._trigger.close()
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="load → dbt → bot по событиям NATS")
+    p.add_argument("--project-dir", type=Path, default=Path("lol_dbt_project"))
+    p.add_argument("--dbt", default=os.getenv("DBT_CMD", "dbt build"), help="команда dbt без --select")
+    p.add_argument("--debounce", type=float, default=float(os.getenv("RUNNER_DEBOUNCE", "120")),
+                   help="секунд тишины после последнего события перед сборкой")
+    p.add_argument("--nats", dest="nats_url", default=os.getenv("NATS_URL", "nats://localhost:4222"))
+    p.add_argument("--durable", default=os.getenv("RUNNER_DURABLE", "dbt-runner"))
+    p.add_argument("--trigger-subject", default=os.getenv("NATS_SUBJECT", "triggers.daily"))
+    p.add_argument("--publish-artifact", action="store_true",
+                   default=bool(os.getenv("CAROUSEL_ARTIFACT")),
+                   help="после dbt опубликовать артефакт карусели (python -m mybot.artifact publish)")
+    return p.parse_args()
+
+
+async def main():
+    args = parse_args()
+    publisher = NatsPublisher(nats_url=args.nats_url, name="dbt-runner")
+    runner = PipelineRunner(args.project_dir, args.dbt, args.debounce, args.trigger_subject,
+                            args.publish_artifact, publisher)
+    try:
+        await runner.start(args.nats_url, args.durable)
+    finally:
+        await publisher.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)-8s  %(message)s")
+    asyncio.run(main())
@@ -2,7 +2,8 @@ import argparse
 import asyncio
 import json
 import logging
-from nats_trigger import publish_trigger
+import os
+from nats_trigger import NatsPublisher, publish_trigger, trigger_msg_id
 
 logging.basicConfig(level=logging.INFO)
 
@@ -13,16 +14,27 @@ def parse_args():
     p.add_argument("--stream", default=None)
     p.add_argument("--subject", default=None)
     p.add_argument("--json", dest="payload", default=None, help="JSON-пейлоад (опционально)")
+    p.add_argument("--jsonl", default=None,
+                   help="файл с пейлоадами по строке — одной пачкой через одно соединение")
     return p.parse_args()
 
 
 async def main():
     args = parse_args()
+    subject = args.subject or os.getenv("NATS_SUBJECT", "triggers.daily")
+    if args.jsonl:
+        with open(args.jsonl, encoding="utf-8") as f:
+            payloads = [json.loads(line) for line in f if line.strip()]
+        async with NatsPublisher(nats_url=args.nats_url, stream=args.stream) as pub:
+            acks = await pub.publish_many((subject, p, trigger_msg_id(p)) for p in payloads)
+        failed = [a for a in acks if isinstance(a, Exception)]
+        logging.info("Опубликовано %d/%d триггеров", len(acks) - len(failed), len(acks))
+        return
     payload = json.loads(args.payload) if args.payload else None
     await publish_trigger(
         nats_url=args.nats_url,
         stream=args.stream,
-        subject=args.subject,
+        subject=subject,
         payload=payload,
     )
 
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+raw_archive.py
+~~~~~~~~~~~~~~
+Архив сырых ответов match-v5: NDJSON со сжатием zstd, append-only, по дням.
+
+    <root>/<YYYY-MM-DD>/<safe_riot_id>/<HHMMSS>-<pid>-<n>.ndjson.zst
+
+Каждая запись загрузчика — новый сегмент; существующие файлы не переписываются,
+при чтении матчи дедуплицируются по matchId. Корень задаётся RAW_ARCHIVE:
+локальный каталог или s3://bucket/prefix (пусто — архив выключен).
+Сжатие — zstd из pyarrow, отдельная зависимость не нужна (сегмент читается и `zstd -dc`).
+
+Пересборка parquet из архива без обращений к Riot:
+
+    python raw_archive.py replay --start 2024-01-01 --end 2024-01-31 --out data/replay
+    python raw_archive.py replay --start 2024-01-01 --end 2024-01-31 --upload
+
+--upload пишет parquet в S3 в новый подкаталог партиции (<день>/<игрок>/replay-<время>/)
+и регистрирует его в Iceberg (как load.py): зарегистрированные ключи не перезаписываются.
+Строки этих дней, уже лежащие в таблице, нужно предварительно удалить.
+"""
+
+from __future__ import annotations
+import argparse
+import datetime as dt
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+
+SUFFIX = ".ndjson.zst"
+CODEC = "zstd"
+
+_seq = itertools.count()
+
+
+def safe_id(riot_id_clean: str) -> str:
+    return riot_id_clean.replace("#", "_")
+
+
+def riot_id_from_safe(safe_riot_id: str) -> str:
+    """Обратное к safe_id: тег Riot не содержит «_», поэтому режем по последнему."""
+    name, _, tag = safe_riot_id.rpartition("_")
+    return f"{name}#{tag}" if name else safe_riot_id
+
+
+def encode(matches: Iterable[Dict[str, Any]]) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.CompressedOutputStream(sink, CODEC) as out:
+        for m in matches:
+            out.write(json.dumps(m, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            out.write(b"\n")
+    return sink.getvalue().to_pybytes()
+
+
+def decode(data: bytes) -> Iterator[Dict[str, Any]]:
+    with pa.input_stream(pa.py_buffer(data), compression=CODEC) as src:
+        for line in src.read().splitlines():
+            if line:
+                yield json.loads(line)
+
+
+# ────────────────── хранилища ──────────────────
+class LocalStore:
+    def __init__(self, root: Path):
+        self.root = root
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def get(self, key: str) -> bytes:
+        return (self.root / key).read_bytes()
+
+    def list(self, prefix: str) -> List[str]:
+        base = self.root / prefix
+        if not base.is_dir():
+            return []
+        return sorted(p.relative_to(self.root).as_posix() for p in base.rglob(f"*{SUFFIX}"))
+
+
+class S3Store:
+    def __init__(self, s3, bucket: str, prefix: str):
+        self.bucket = s3.Bucket(bucket)
+        self.prefix = prefix.strip("/")
+
+    def _full(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, key: str, data: bytes) -> None:
+        self.bucket.put_object(Key=self._full(key), Body=data)
+
+    def get(self, key: str) -> bytes:
+        return self.bucket.Object(self._full(key)).get()["Body"].read()
+
+    def list(self, prefix: str) -> List[str]:
+        cut = len(self.prefix) + 1 if self.prefix else 0
+        return sorted(o.key[cut:] for o in self.bucket.objects.filter(Prefix=self._full(prefix))
+                      if o.key.endswith(SUFFIX))
+
+
+# ────────────────── архив ──────────────────
+class RawArchive:
+    def __init__(self, store):
+        self.store = store
+
+    @classmethod
+    def from_uri(cls, uri: str, s3_factory: Optional[Callable[[], Any]] = None) -> "RawArchive":
+        """Локальный путь либо s3://bucket/prefix (s3_factory() → boto3 resource)."""
+        if uri.startswith("s3://"):
+            if s3_factory is None:
+                raise ValueError("s3:// архив требует s3_factory")
+            bucket, _, prefix = uri[len("s3://"):].partition("/")
+            return cls(S3Store(s3_factory(), bucket, prefix))
+        return cls(LocalStore(Path(uri)))
+
+    def append(self, riot_id_clean: str, day: dt.date, matches: List[Dict[str, Any]]) -> Optional[str]:
+        """Новый сегмент с матчами (игрок, день); None, если писать нечего."""
+        if not matches:
+            return None
+        key = (f"{day.isoformat()}/{safe_id(riot_id_clean)}/"
+               f"{time.strftime('%H%M%S')}-{os.getpid()}-{next(_seq)}{SUFFIX}")
+        self.store.put(key, encode(matches))
+        return key
+
+    def partitions(self, day: dt.date) -> Dict[str, List[str]]:
+        """safe_riot_id → сегменты за день."""
+        out: Dict[str, List[str]] = {}
+        for key in self.store.list(f"{day.isoformat()}/"):
+            out.setdefault(key.split("/")[1], []).append(key)
+        return out
+
+    def read(self, segments: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        seen = set()
+        for key in segments:
+            for m in decode(self.store.get(key)):
+                mid = m.get("metadata", {}).get("matchId")
+                if mid in seen:
+                    continue
+                seen.add(mid)
+                yield m
+
+    def iter_units(self, start: dt.date, end: dt.date,
+                   players: Optional[List[str]] = None) -> Iterator[Tuple[str, dt.date, List[Dict[str, Any]]]]:
+        """(riot_id, день, матчи) по всем партициям диапазона."""
+        wanted = {safe_id(p) for p in players} if players else None
+        for i in range((end - start).days + 1):
+            day = start + dt.timedelta(days=i)
+            for safe, segments in sorted(self.partitions(day).items()):
+                if wanted is None or safe in wanted:
+                    yield riot_id_from_safe(safe), day, list(self.read(segments))
+
+
+# ────────────────── replay ──────────────────
+def replay(
+    archive: RawArchive,
+    start: dt.date,
+    end: dt.date,
+    *,
+    players: Optional[List[str]] = None,
+    out_dir: Optional[Path] = None,
+    upload: bool = False,
+    workers: int = 0,
+) -> Dict[str, int]:
+    """Архив → parquet (локально в out_dir и/или в S3 + add_files через load.store_day)."""
+    import load
+
+    stats = {"units": 0, "matches": 0, "rows": 0}
+    s3 = load._s3_resource() if upload else None
+    pool = load.NormalizePool(workers) if (upload and workers > 0) else None
+    version = f"replay-{dt.datetime.now():%Y%m%dT%H%M%S}"
+    try:
+        for riot_id, day, matches in archive.iter_units(start, end, players):
+            stats["units"] += 1
+            stats["matches"] += len(matches)
+            # платформа игрока — из префикса match-id (в архиве её нет)
+            region = next(filter(None, (load.match_platform(m.get("metadata", {}).get("matchId") or "")
+                                        for m in matches)), None)
+            if out_dir is not None:
+                parts = load.match_rows(matches)
+                if parts:
+                    df = load.build_frame(parts, riot_id, region)
+                    stats["rows"] += len(df)
+                    path = out_dir / day.isoformat() / f"{safe_id(riot_id)}_{day}_{day}.parquet"
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_bytes(load.to_parquet_buffer(df).getbuffer())
+            if upload:
+                load.store_day(s3, riot_id, day, matches, pool=pool, keep_raw=False, version=version,
+                               region=region)
+            logging.info("♻️  %s %s: %d matches replayed", day, riot_id, len(matches))
+    finally:
+        if pool:
+            pool.close()
+    return stats
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Архив сырых матчей Riot (NDJSON + zstd)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("replay", help="пересобрать parquet из архива без запросов к Riot")
+    r.add_argument("--archive", default=os.getenv("RAW_ARCHIVE", ""), help="каталог или s3://bucket/prefix")
+    r.add_argument("--start", type=dt.date.fromisoformat, required=True)
+    r.add_argument("--end", type=dt.date.fromisoformat, required=True)
+    r.add_argument("--players", nargs="+", default=None, help="только эти Riot ID")
+    r.add_argument("--out", type=Path, default=None, help="каталог для локальных parquet")
+    r.add_argument("--upload", action="store_true", help="загрузить в S3 и зарегистрировать в Iceberg")
+    r.add_argument("--workers", type=int, default=0, help="см. load.py --workers")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if not args.archive:
+        raise SystemExit("Не задан архив (--archive или RAW_ARCHIVE)")
+    if not (args.out or args.upload):
+        raise SystemExit("Нужен --out и/или --upload")
+    s3_factory = None
+    if args.archive.startswith("s3://"):
+        import load
+        s3_factory = load._s3_resource
+    archive = RawArchive.from_uri(args.archive, s3_factory)
+    t0 = time.perf_counter()
+    stats = replay(archive, args.start, args.end, players=args.players,
+                   out_dir=args.out, upload=args.upload, workers=args.workers)
+    logging.info("🏁 Replay: %s за %.1fs", stats, time.perf_counter() - t0)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)-8s  %(message)s")
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+schema_registry.py
+~~~~~~~~~~~~~~~~~~
+Выравнивание батчей load.py по текущей схеме Iceberg-таблицы и её эволюция.
+
+* `load_schema()`  — схема таблицы из information_schema → pyarrow.Schema;
+* `align(df, schema)` — батч в порядке и типах таблицы: отсутствующие колонки
+  становятся типизированными null, значения приводятся к типу колонки
+  (dict → MAP/ROW, лишние поля ROW отбрасываются). Колонки, которых нет
+  в таблице, дописываются в конец и возвращаются как {имя: тип Trino};
+* `SchemaRegistry.evolve(new)` — все новые колонки батча одной серией
+  ADD COLUMN перед add_files, схема перечитывается один раз.
+
+Вложенные поля существующих ROW не эволюционируют — только колонки верхнего уровня.
+"""
+
+from __future__ import annotations
+import logging
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+log = logging.getLogger(__name__)
+
+# ────────────────── Trino type ↔ Arrow ──────────────────
+_SCALARS = {
+    "bigint": pa.int64(),
+    "integer": pa.int32(),
+    "smallint": pa.int16(),
+    "tinyint": pa.int8(),
+    "double": pa.float64(),
+    "real": pa.float32(),
+    "boolean": pa.bool_(),
+    "varchar": pa.string(),
+    "date": pa.date32(),
+    "varbinary": pa.binary(),
+}
+_TOKEN = re.compile(r'\s*(?:"((?:[^"]|"")*)"|([A-Za-z_][\w]*)|(\d+)|(.))')
+
+
+class _Parser:
+    """Рекурсивный разбор строк типов Trino: row("a" bigint, b array(varchar)), map(k, v)…"""
+
+    def __init__(self, text: str):
+        self.tokens: List[Tuple[str, str]] = []
+        for quoted, word, num, sym in _TOKEN.findall(text):
+            if quoted:
+                self.tokens.append(("name", quoted.replace('""', '"')))
+            elif word:
+                self.tokens.append(("word", word))
+            elif num:
+                self.tokens.append(("num", num))
+            elif sym.strip():
+                self.tokens.append(("sym", sym))
+        self.pos = 0
+
+    def _peek(self) -> Tuple[str, str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ("eof", "")
+
+    def _take(self, sym: Optional[str] = None) -> Tuple[str, str]:
+        tok = self._peek()
+        if sym is not None and tok != ("sym", sym):
+            raise ValueError(f"ожидался {sym!r}, получено {tok[1]!r}")
+        self.pos += 1
+        return tok
+
+    def _skip_params(self) -> None:
+        if self._peek() == ("sym", "("):
+            depth = 0
+            while True:
+                _, v = self._take()
+                depth += v == "("
+                depth -= v == ")"
+                if depth == 0:
+                    break
+
+    def parse(self) -> pa.DataType:
+        kind, word = self._take()
+        name = word.lower()
+        if name == "array":
+            self._take("(")
+            item = self.parse()
+            self._take(")")
+            return pa.list_(item)
+        if name == "map":
+            self._take("(")
+            key = self.parse()
+            self._take(",")
+            value = self.parse()
+            self._take(")")
+            return pa.map_(key, value)
+        if name == "row":
+            self._take("(")
+            fields = []
+            while True:
+                _, fname = self._take()
+                fields.append(pa.field(fname, self.parse()))
+                if self._take()[1] == ")":
+                    break
+            return pa.struct(fields)
+        if name == "timestamp":
+            self._skip_params()
+            if self._peek()[1].lower() == "with":
+                self.pos += 3  # with time zone
+                return pa.timestamp("us", tz="UTC")
+            return pa.timestamp("us")
+        if name in ("varchar", "char", "decimal"):
+            self._skip_params()
+            return pa.string() if name != "decimal" else pa.float64()
+        if name in _SCALARS:
+            return _SCALARS[name]
+        raise ValueError(f"неизвестный тип Trino: {word}")
+
+
+def trino_to_arrow(type_str: str) -> pa.DataType:
+    return _Parser(type_str).parse()
+
+
+def arrow_to_trino(t: pa.DataType) -> Optional[str]:
+    """Тип Trino для новой колонки; None — тип ещё не определить (все значения null)."""
+    if pa.types.is_null(t):
+        return None
+    if pa.types.is_boolean(t):
+        return "BOOLEAN"
+    if pa.types.is_integer(t):
+        return "BIGINT"
+    if pa.types.is_floating(t):
+        return "DOUBLE"
+    if pa.types.is_string(t) or pa.types.is_large_string(t):
+        return "VARCHAR"
+    if pa.types.is_list(t) or pa.types.is_large_list(t):
+        item = arrow_to_trino(t.value_type)
+        return f"ARRAY({item})" if item else None
+    if pa.types.is_map(t):
+        key, value = arrow_to_trino(t.key_type), arrow_to_trino(t.item_type)
+        return f"MAP({key}, {value})" if key and value else None
+    if pa.types.is_struct(t):
+        fields = []
+        for f in t:
+            ft = arrow_to_trino(f.type)
+            if ft:
+                fields.append(f'"{f.name}" {ft}')
+        return f"ROW({', '.join(fields)})" if fields else None
+    return None
+
+
+# ────────────────── выравнивание ──────────────────
+def _is_missing(v: Any) -> bool:
+    return v is None or (isinstance(v, float) and math.isnan(v))
+
+
+def _coerce(v: Any, t: pa.DataType) -> Any:
+    """Значение → Python-объект, который pyarrow примет как тип t; иначе None."""
+    if _is_missing(v):
+        return None
+    try:
+        if pa.types.is_map(t):
+            items = v.items() if isinstance(v, dict) else v
+            return [(_coerce(k, t.key_type), _coerce(x, t.item_type)) for k, x in items]
+        if pa.types.is_struct(t):
+            if not isinstance(v, dict):
+                return None
+            return {f.name: _coerce(v.get(f.name), f.type) for f in t}
+        if pa.types.is_list(t):
+            return [_coerce(x, t.value_type) for x in v]
+        if pa.types.is_boolean(t):
+            return bool(v)
+        if pa.types.is_integer(t):
+            return int(v)
+        if pa.types.is_floating(t):
+            return float(v)
+        if pa.types.is_string(t):
+            return v if isinstance(v, str) else str(v)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return v
+
+
+def _column(values: pd.Series, t: pa.DataType) -> pa.Array:
+    try:
+        return pa.array(values, type=t, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+        return pa.array([_coerce(v, t) for v in values], type=t)
+
+
+def align(df: pd.DataFrame, schema: pa.Schema) -> Tuple[pa.Table, Dict[str, str]]:
+    """Батч → таблица Arrow в порядке и типах schema + новые колонки {имя: тип Trino}.
+    Имена сравниваются без учёта регистра: information_schema Trino отдаёт
+    metadata.matchid, а в батче metadata.matchId. Колонки батча получают имена
+    таблицы, новые — в нижнем регистре, как их сохранит Trino."""
+    n = len(df)
+    by_lower: Dict[str, str] = {}
+    for name in df.columns:
+        by_lower.setdefault(name.lower(), name)
+    df = df[list(by_lower.values())].rename(columns={v: k for k, v in by_lower.items()})
+
+    arrays, fields = [], []
+    for field in schema:
+        if field.name.lower() in df.columns:
+            arrays.append(_column(df[field.name.lower()], field.type))
+        else:
+            arrays.append(pa.nulls(n, type=field.type))
+        fields.append(field)
+
+    known = {name.lower() for name in schema.names}
+    new: Dict[str, str] = {}
+    for name in df.columns:
+        if name in known:
+            continue
+        try:
+            arr = pa.array(df[name], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            log.warning("Колонка %s: не удалось вывести тип, пропускаем", name)
+            continue
+        if pa.types.is_floating(arr.type):
+            # целое поле, отсутствующее у части участников, pandas превращает в float с NaN
+            try:
+                arr = arr.cast(pa.int64())
+            except pa.ArrowInvalid:
+                pass
+        trino_type = arrow_to_trino(arr.type)
+        if trino_type is None:
+            continue  # пока только null — тип станет известен в следующих батчах
+        new[name] = trino_type
+        arrays.append(arr)
+        fields.append(pa.field(name, arr.type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields)), new
+
+
+# ────────────────── реестр ──────────────────
+class SchemaRegistry:
+    """Текущая схема таблицы; эволюция одной серией ALTER на батч."""
+
+    def __init__(self, connect: Callable[[], Any], catalog: str, schema: str, table: str):
+        self._connect = connect
+        self.catalog, self.schema_name, self.table = catalog, schema, table
+        self.schema: Optional[pa.Schema] = None
+
+    @property
+    def fqn(self) -> str:
+        return f"{self.catalog}.{self.schema_name}.{self.table}"
+
+    def load_schema(self) -> pa.Schema:
+        sql = f"""
+            SELECT column_name, data_type
+            FROM {self.catalog}.information_schema.columns
+            WHERE table_schema = '{self.schema_name}' AND table_name = '{self.table}'
+            ORDER BY ordinal_position
+        """
+        with self._connect() as conn:
+            cur = conn.cursor()
+            cur.execute(sql.strip())
+            rows = cur.fetchall()
+        if not rows:
+            raise LookupError(f"Таблица {self.fqn} не найдена")
+        self.schema = pa.schema([pa.field(name, trino_to_arrow(t)) for name, t in rows])
+        return self.schema
+
+    def evolve(self, new_columns: Dict[str, str]) -> List[str]:
+        """ADD COLUMN для колонок, которых ещё нет в схеме; возвращает добавленные."""
+        if self.schema is None:
+            self.load_schema()
+        known = {name.lower() for name in self.schema.names}
+        todo = {k: v for k, v in new_columns.items() if k.lower() not in known}
+        if not todo:
+            return []
+        with self._connect() as conn:
+            cur = conn.cursor()
+            for name, trino_type in todo.items():
+                quoted = name.replace('"', '""')
+                cur.execute(f'ALTER TABLE {self.fqn} ADD COLUMN IF NOT EXISTS "{quoted}" {trino_type}')
+                cur.fetchall()
+        log.info("🧬 %s: добавлены колонки %s", self.fqn, ", ".join(f"{k} {v}" for k, v in todo.items()))
+        self.load_schema()
+        return list(todo)
@@ -0,0 +1,38 @@
+"""
+conftest.py
+~~~~~~~~~~~
+load.py и mybot проверяют окружение при импорте — даём фиктивные значения
+до импорта модулей; сетевые клиенты в тестах не создаются.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_DUMMY_ENV = {
+    "RIOT_API_KEY": "test",
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "S3_BUCKET_NAME": "test",
+    "TRINO_HOST": "localhost",
+    "TRINO_PORT": "8443",
+    "TRINO_USER": "test",
+    "TRINO_PASSWORD": "test",
+    "TRINO_CATALOG": "iceberg",
+    "TRINO_SCHEMA": "lol_raw",
+    "TRINO_TABLE": "data_api_mining",
+    "BOT_TOKEN": "0:test",
+    "PLATFORM_ROUTING": "ru1",
+    "REGIONAL_ROUTING": "europe",
+}
+
+os.environ.update(_DUMMY_ENV)
+# каталоги данных всегда временные, чтобы не задеть настоящий кэш бота
+_workdir = Path(tempfile.mkdtemp(prefix="modernde-tests-"))
+os.environ["DATA_DIR"] = str(_workdir / "data")
+os.environ["SPLASH_DIR"] = str(_workdir / "splashes")
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
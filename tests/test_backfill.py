@@ -0,0 +1,32 @@
+import pytest
+
+from backfill import Checkpoint
+
+PLAN = {"players": ["Player#RU1"], "start": "2024-01-01", "end": "2024-01-07"}
+
+
+def test_checkpoint_roundtrip(tmp_path):
+    path = tmp_path / "cp.json"
+    cp = Checkpoint.open(path, PLAN)
+    cp.mark("Player#RU1|2024-01-01", "done", s3_key="k1")
+    cp.mark("Player#RU1|2024-01-02", "empty")
+
+    again = Checkpoint.open(path)
+    assert again.plan == PLAN
+    assert again.status("Player#RU1|2024-01-01") == "done"
+    assert again.units["Player#RU1|2024-01-01"]["s3_key"] == "k1"
+    assert again.status("Player#RU1|2024-01-03") is None
+    assert again.summary() == {"done": 1, "empty": 1}
+    assert [p.name for p in tmp_path.iterdir()] == ["cp.json"]
+
+
+def test_checkpoint_other_plan(tmp_path):
+    path = tmp_path / "cp.json"
+    Checkpoint.open(path, PLAN).save()
+    with pytest.raises(SystemExit):
+        Checkpoint.open(path, {**PLAN, "end": "2024-01-31"})
+
+
+def test_checkpoint_missing(tmp_path):
+    with pytest.raises(SystemExit):
+        Checkpoint.open(tmp_path / "nope.json")
@@ -0,0 +1,26 @@
+import datetime as dt
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+from mybot.local_engine import LocalEngine  # noqa: E402
+
+TODAY = dt.date(2024, 1, 8)
+
+
+@pytest.mark.parametrize("sub", ["empty", "missing"])
+def test_empty_root(tmp_path, sub):
+    root = tmp_path / sub
+    if sub == "empty":
+        root.mkdir()
+    eng = LocalEngine(str(root))
+    assert len(eng.records(TODAY)) == 0
+    assert len(eng.weekly_kda(TODAY)) == 0
+    assert eng.raw() is None
+
+
+def test_days_outside_window(tmp_path):
+    (tmp_path / "2020-01-01").mkdir()
+    eng = LocalEngine(str(tmp_path))
+    assert len(eng.records(TODAY)) == 0
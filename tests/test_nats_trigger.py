@@ -0,0 +1,31 @@
+from nats_trigger import DeliveredVersions, trigger_msg_id
+
+
+def test_trigger_msg_id_by_version():
+    payload = {"type": "daily", "data_version": "2024-01-07-abc"}
+    assert trigger_msg_id(payload) == "daily:2024-01-07-abc"
+    assert trigger_msg_id({"data_version": "v1"}, default_type="weekly") == "weekly:v1"
+
+
+def test_trigger_msg_id_without_version_is_unique():
+    # пустой пейлоад cron'а не должен попадать в окно дедупликации
+    assert trigger_msg_id(None) != trigger_msg_id(None)
+    assert trigger_msg_id({}).startswith("daily:")
+
+
+def test_delivered_versions(tmp_path):
+    path = tmp_path / "delivered.json"
+    dv = DeliveredVersions(path, max_items=2)
+    for key in ("v1", "v2", "v3"):
+        dv.mark(key)
+    assert not dv.seen("v1")
+    assert dv.seen("v3")
+
+    again = DeliveredVersions(path)
+    assert again.seen("v2") and again.seen("v3") and not again.seen("v1")
+
+
+def test_delivered_versions_broken_file(tmp_path):
+    path = tmp_path / "delivered.json"
+    path.write_text("{", encoding="utf-8")
+    assert not DeliveredVersions(path).seen("v1")
@@ -0,0 +1,24 @@
+from mybot.record_index import RecordIndex
+
+MESSAGES = [
+    {"nickname": "Monty Gard#RU1", "champion": "Lee Sin", "text": "a"},
+    {"nickname": "Monty Gard#RU1", "champion": "Ahri", "text": "b"},
+    {"nickname": "Other#EUW", "champion": "Lee Sin", "text": "c"},
+    {"text": "без ника и чемпиона"},
+]
+
+
+def test_player_lookup():
+    idx = RecordIndex("v1", MESSAGES)
+    nick, msgs = idx.player("monty_gard#ru1")
+    assert nick == "Monty Gard#RU1"
+    assert [m["text"] for m in msgs] == ["a", "b"]
+    # без тега
+    assert idx.player("Monty Gard") == ("Monty Gard#RU1", msgs)
+    assert idx.player("nobody") == (None, [])
+
+
+def test_champion_lookup():
+    idx = RecordIndex("v1", MESSAGES)
+    assert [m["text"] for m in idx.champion("leesin")] == ["a", "c"]
+    assert idx.champion("Teemo") == []
@@ -0,0 +1,24 @@
+import load
+
+
+def test_platform_id():
+    assert load.platform_id("EUW1") == "euw1"
+    assert load.platform_id(" ru1 ") == "ru"
+    assert load.platform_id("kr") == "kr"
+
+
+def test_split_player():
+    assert load.split_player("Name#TAG@EUW1") == ("Name#TAG", "euw1")
+    assert load.split_player("Name#TAG") == ("Name#TAG", "ru")
+    assert load.split_player("\u2066Name#TAG\u2069@na1") == ("Name#TAG", "na1")
+
+
+def test_match_platform_and_routing():
+    assert load.match_platform("EUW1_7001") == "euw1"
+    assert load.match_platform("7001") is None
+    assert load.match_routing("NA1_42") == "americas"
+    assert load.match_routing("KR_42") == "asia"
+    assert load.match_routing("RU_42") == "europe"
+    # без префикса и с неизвестной платформой — REGIONAL_ROUTING
+    assert load.match_routing("42") == load.REGIONAL_ROUTING
+    assert load.match_routing("XX9_42") == load.REGIONAL_ROUTING
@@ -0,0 +1,32 @@
+import pandas as pd
+import pyarrow as pa
+
+from schema_registry import align
+
+SCHEMA = pa.schema([
+    pa.field("metadata.matchid", pa.string()),
+    pa.field("participant.kills", pa.int64()),
+    pa.field("participant.win", pa.bool_()),
+])
+
+
+def test_align_case_insensitive_and_missing():
+    df = pd.DataFrame({"metadata.matchId": ["RU_1", "RU_2"], "participant.kills": [3, 7]})
+    table, new = align(df, SCHEMA)
+    assert new == {}
+    assert table.schema == SCHEMA
+    assert table.column("metadata.matchid").to_pylist() == ["RU_1", "RU_2"]
+    assert table.column("participant.win").to_pylist() == [None, None]
+
+
+def test_align_new_columns():
+    df = pd.DataFrame({
+        "metadata.matchId": ["RU_1", "RU_2"],
+        "participant.newStat": [1.0, float("nan")],
+        "participant.empty": [None, None],
+    })
+    table, new = align(df, SCHEMA)
+    # целое с пропусками возвращается из float в BIGINT; колонка из одних null ждёт типа
+    assert new == {"participant.newstat": "BIGINT"}
+    assert table.schema.names == SCHEMA.names + ["participant.newstat"]
+    assert table.column("participant.newstat").to_pylist() == [1, None]